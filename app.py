@@ -3,22 +3,28 @@ Flask application for the Discord bot dashboard.
 Provides a web interface for managing bot settings and viewing statistics.
 """
 import os
+import base64
+import hmac
+import json
 import logging
+from datetime import datetime
 
-from flask import Flask, render_template, jsonify, request, redirect, url_for, flash, session
+import sys
+import click
+from flask import Flask, Response, g, render_template, jsonify, request, redirect, url_for, flash, session, stream_with_context
+from utils import metrics
 from utils.config import Config
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.orm import DeclarativeBase
+from utils.export import FORMATS, export_conversations, iter_gzip
+from utils.logger import request_id_var, reset_request_id, set_request_id, setup_logger
+from sqlalchemy import and_, inspect, or_, text
+from sqlalchemy.orm import load_only
 from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
+from database import db
+from models import User, Server, Conversation, ShardStatus, MetricsSnapshot
 
-# Setup the base class for SQLAlchemy models
-class Base(DeclarativeBase):
-    pass
-
-# Initialize Flask application and SQLAlchemy
-db = SQLAlchemy(model_class=Base)
+# Initialize Flask application
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", os.urandom(24).hex())
 app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
@@ -29,6 +35,12 @@ app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
     "pool_recycle": 300,
     "pool_pre_ping": True,
 }
+if (Config.get_database_url() or "").startswith("postgres"):
+    # Size the pool per worker process; SQLite uses its own pool implementation
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"].update({
+        "pool_size": Config.get_db_pool_size(),
+        "max_overflow": Config.get_db_max_overflow(),
+    })
 
 # Initialize the database with the app
 db.init_app(app)
@@ -38,14 +50,90 @@ login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
 
-# Setup logging
-logging.basicConfig(level=logging.DEBUG)
+# Logging is configured by the entry point (wsgi.py, bot.py or main.py) with utils.logger.setup_logger
 logger = logging.getLogger(__name__)
 
-# Import models after db initialization to avoid circular imports
-with app.app_context():
-    from models import User, Server, Conversation
-    db.create_all()
+# Columns added to tables after they were first released, with the SQL
+# default existing rows get. create_all never alters an existing table, so
+# migrate adds these to databases created by older versions.
+_ADDED_COLUMNS = (
+    (Server, 'updated_at', None),
+    (Server, 'response_cache_enabled', 'FALSE'),
+)
+
+def _add_missing_columns(connection):
+    """
+    Add the columns in _ADDED_COLUMNS that an existing table does not have yet.
+    
+    Args:
+        connection: The database connection to alter the tables with
+    """
+    inspector = inspect(connection)
+    quote = connection.dialect.identifier_preparer.quote
+    for model, name, default in _ADDED_COLUMNS:
+        table = model.__table__
+        if name in {column['name'] for column in inspector.get_columns(table.name)}:
+            continue
+        column_type = table.c[name].type.compile(dialect=connection.dialect)
+        ddl = f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(name)} {column_type}"
+        if default is not None:
+            ddl += f" DEFAULT {default}"
+        connection.execute(text(ddl))
+        logger.info(f"Added column {table.name}.{name}")
+
+def _create_missing_indexes(connection):
+    """
+    Create the models' indexes that an existing table does not have yet.
+    
+    create_all skips the indexes of tables that already exist, such as the
+    conversation index the API's keyset pagination relies on.
+    
+    Args:
+        connection: The database connection to create the indexes with
+    """
+    inspector = inspect(connection)
+    for table in db.metadata.sorted_tables:
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(connection)
+                logger.info(f"Created index {index.name}")
+
+def migrate():
+    """
+    Create any database tables that do not exist yet and bring existing
+    ones up to date.
+    
+    This runs as an explicit deploy step (python main.py --migrate, or
+    flask --app app migrate) rather than on import, so importing the app or
+    the models never touches the database. Every step checks the schema
+    first, so running it again is harmless.
+    """
+    with app.app_context():
+        db.create_all()
+        with db.engine.begin() as connection:
+            _add_missing_columns(connection)
+            _create_missing_indexes(connection)
+
+@app.before_request
+def assign_request_id():
+    """Tag this request's log lines with the proxy's X-Request-ID, or a new ID."""
+    incoming = request.headers.get("X-Request-ID", "")
+    valid = 0 < len(incoming) <= 64 and incoming.replace("-", "").isalnum()
+    g.request_id_token = set_request_id(incoming if valid else None)
+
+@app.after_request
+def add_request_id_header(response):
+    """Return the request ID so a log line can be matched to a response."""
+    response.headers["X-Request-ID"] = request_id_var.get() or ""
+    return response
+
+@app.teardown_request
+def clear_request_id(exc):
+    """Drop the request ID once the request is done."""
+    token = g.pop("request_id_token", None)
+    if token is not None:
+        reset_request_id(token)
 
 @login_manager.user_loader
 def load_user(user_id):
@@ -71,16 +159,194 @@ def get_servers():
     servers = Server.query.filter_by(user_id=current_user.id).all()
     return jsonify([server.to_dict() for server in servers])
 
+@app.route('/api/servers/<server_id>', methods=['PATCH'])
+@login_required
+def update_server(server_id):
+    """API endpoint to update a server's bot settings."""
+    server = Server.query.filter_by(id=server_id, user_id=current_user.id).first()
+    if not server:
+        return jsonify({"error": "Server not found"}), 404
+    
+    data = request.get_json(silent=True) or {}
+    if 'prefix' in data:
+        prefix = str(data['prefix']).strip()
+        if not prefix or len(prefix) > 10:
+            return jsonify({"error": "Prefix must be between 1 and 10 characters"}), 400
+        server.prefix = prefix
+    if 'ai_enabled' in data:
+        server.ai_enabled = bool(data['ai_enabled'])
+    if 'response_cache_enabled' in data:
+        server.response_cache_enabled = bool(data['response_cache_enabled'])
+    
+    # Bumping updated_at lets the bot's server cache pick up the change
+    server.updated_at = datetime.utcnow()
+    db.session.commit()
+    return jsonify(server.to_dict())
+
+@app.route('/api/shards', methods=['GET'])
+@login_required
+def get_shards():
+    """API endpoint to get the latest status reported by each bot shard."""
+    shards = ShardStatus.query.order_by(ShardStatus.shard_id).all()
+    return jsonify([shard.to_dict() for shard in shards])
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Prometheus scrape endpoint with the metrics of every running bot process.
+    
+    Bot processes save their metrics to the database periodically (see
+    utils.metrics.SnapshotReporter); snapshots of processes that stopped
+    reporting have expired and are left out. The metrics name guilds, so
+    scrapers must send METRICS_TOKEN as a bearer token; without a token
+    configured the route does not exist. Each process's samples carry a
+    "process" label, leaving "instance" to Prometheus.
+    """
+    token = Config.get_metrics_token()
+    if not token:
+        return Response("Not Found\n", status=404, mimetype="text/plain")
+    if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return Response("Unauthorized\n", status=401, mimetype="text/plain")
+    
+    snapshots = []
+    rows = MetricsSnapshot.query.filter(MetricsSnapshot.expires_at >= datetime.utcnow()).order_by(MetricsSnapshot.instance).all()
+    for row in rows:
+        snapshots.append(({"process": row.instance}, json.loads(row.payload)))
+    
+    return Response(metrics.render(snapshots), mimetype="text/plain; version=0.0.4")
+
+def _encode_cursor(conversation):
+    """Encode a conversation's position in the (timestamp, id) ordering as an opaque cursor."""
+    raw = f"{conversation.timestamp.isoformat()}|{conversation.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_cursor(cursor):
+    """Decode a cursor produced by _encode_cursor into (timestamp, id)."""
+    timestamp, conversation_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+    return datetime.fromisoformat(timestamp), int(conversation_id)
+
+def _parse_time(value):
+    """Parse an optional ISO 8601 query parameter."""
+    return datetime.fromisoformat(value) if value else None
+
+def _filtered_conversations(server_id, args):
+    """
+    Build a conversation query for a server from optional request filters.
+    
+    Supported filters are channel_id, user_id, since and until (ISO 8601).
+    """
+    query = Conversation.query.filter(Conversation.server_id == server_id)
+    if args.get('channel_id'):
+        query = query.filter(Conversation.channel_id == args['channel_id'])
+    if args.get('user_id'):
+        query = query.filter(Conversation.user_id == args['user_id'])
+    
+    since = _parse_time(args.get('since'))
+    until = _parse_time(args.get('until'))
+    if since:
+        query = query.filter(Conversation.timestamp >= since)
+    if until:
+        query = query.filter(Conversation.timestamp < until)
+    return query
+
 @app.route('/api/conversations/<server_id>', methods=['GET'])
 @login_required
 def get_conversations(server_id):
-    """API endpoint to get conversations for a server."""
+    """
+    API endpoint to get a page of conversations for a server, newest first.
+    
+    Query parameters: limit, cursor (from the previous page's next_cursor),
+    channel_id, user_id, since, until and fields (comma-separated).
+    """
     server = Server.query.filter_by(id=server_id, user_id=current_user.id).first()
     if not server:
         return jsonify({"error": "Server not found"}), 404
     
-    conversations = Conversation.query.filter_by(server_id=server_id).all()
-    return jsonify([conv.to_dict() for conv in conversations])
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+    
+    fields = None
+    if request.args.get('fields'):
+        fields = [field.strip() for field in request.args['fields'].split(',') if field.strip()]
+        unknown = set(fields) - set(Conversation.FIELDS)
+        if unknown:
+            return jsonify({"error": f"Unknown fields: {', '.join(sorted(unknown))}"}), 400
+    
+    try:
+        query = _filtered_conversations(server.id, request.args)
+        if request.args.get('cursor'):
+            timestamp, conversation_id = _decode_cursor(request.args['cursor'])
+            query = query.filter(or_(
+                Conversation.timestamp < timestamp,
+                and_(Conversation.timestamp == timestamp, Conversation.id < conversation_id)
+            ))
+    except ValueError:
+        return jsonify({"error": "Invalid cursor or time filter"}), 400
+    
+    if fields:
+        # Only load the requested columns, plus the ones the cursor needs
+        columns = set(fields) | {'id', 'timestamp'}
+        query = query.options(load_only(*(getattr(Conversation, column) for column in columns)))
+    
+    conversations = (
+        query
+        .order_by(Conversation.timestamp.desc(), Conversation.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    
+    next_cursor = None
+    if len(conversations) > limit:
+        conversations = conversations[:limit]
+        next_cursor = _encode_cursor(conversations[-1])
+    
+    return jsonify({
+        "conversations": [conv.to_dict(fields) for conv in conversations],
+        "next_cursor": next_cursor
+    })
+
+@app.route('/api/conversations/<server_id>/export', methods=['GET'])
+@login_required
+def export_server_conversations(server_id):
+    """
+    API endpoint to stream a server's full conversation history, oldest first.
+    
+    Query parameters: format (ndjson or csv), gzip (1 to compress),
+    channel_id, user_id, since, until and fields (comma-separated).
+    """
+    server = Server.query.filter_by(id=server_id, user_id=current_user.id).first()
+    if not server:
+        return jsonify({"error": "Server not found"}), 404
+    
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in FORMATS:
+        return jsonify({"error": f"Format must be one of: {', '.join(FORMATS)}"}), 400
+    
+    fields = list(Conversation.FIELDS)
+    if request.args.get('fields'):
+        fields = [field.strip() for field in request.args['fields'].split(',') if field.strip()]
+        unknown = set(fields) - set(Conversation.FIELDS)
+        if unknown:
+            return jsonify({"error": f"Unknown fields: {', '.join(sorted(unknown))}"}), 400
+    
+    try:
+        query = _filtered_conversations(server.id, request.args)
+    except ValueError:
+        return jsonify({"error": "Invalid time filter"}), 400
+    
+    body = export_conversations(query, fields, fmt)
+    filename = f"conversations-{server.discord_server_id}.{fmt}"
+    mimetype = FORMATS[fmt]
+    if request.args.get('gzip') in ('1', 'true', 'yes'):
+        body = iter_gzip(body)
+        filename += ".gz"
+        mimetype = "application/gzip"
+    
+    # stream_with_context keeps the session open while the cursor is consumed
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -140,5 +406,48 @@ def server_error(e):
     logger.error(f"Server error: {e}")
     return render_template('500.html'), 500
 
+@app.cli.command("migrate")
+def migrate_command():
+    """Create any database tables that do not exist yet."""
+    migrate()
+    click.echo("Database tables are up to date.")
+
+@app.cli.command("export-conversations")
+@click.argument("discord_server_id")
+@click.option("--format", "fmt", type=click.Choice(list(FORMATS)), default="ndjson", help="Output format.")
+@click.option("--gzip", "compress", is_flag=True, help="Gzip the output.")
+@click.option("--output", "-o", type=click.Path(dir_okay=False), default="-", help="Output file (default: stdout).")
+@click.option("--channel-id", help="Only export this channel.")
+@click.option("--user-id", help="Only export this user's messages.")
+@click.option("--since", help="Only export conversations at or after this ISO 8601 time.")
+@click.option("--until", help="Only export conversations before this ISO 8601 time.")
+@click.option("--batch-size", type=int, default=1000, show_default=True, help="Rows fetched per round trip.")
+def export_conversations_command(discord_server_id, fmt, compress, output, channel_id, user_id, since, until, batch_size):
+    """Stream a server's conversation history to a file or stdout."""
+    server = Server.query.filter_by(discord_server_id=discord_server_id).first()
+    if not server:
+        raise click.ClickException(f"Server {discord_server_id} not found")
+    
+    filters = {"channel_id": channel_id, "user_id": user_id, "since": since, "until": until}
+    try:
+        query = _filtered_conversations(server.id, filters)
+    except ValueError as e:
+        raise click.ClickException(f"Invalid time filter: {e}")
+    
+    chunks = export_conversations(query, Conversation.FIELDS, fmt, batch_size)
+    if compress:
+        chunks = iter_gzip(chunks)
+    else:
+        chunks = (chunk.encode("utf-8") for chunk in chunks)
+    
+    stream = sys.stdout.buffer if output == "-" else open(output, "wb")
+    try:
+        for chunk in chunks:
+            stream.write(chunk)
+    finally:
+        if stream is not sys.stdout.buffer:
+            stream.close()
+
 if __name__ == "__main__":
+    setup_logger()
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -14,19 +14,85 @@ from utils.logger import setup_logger
 setup_logger()
 logger = logging.getLogger("discord_bot")
 
+def build_intents():
+    """
+    Build the gateway intents the bot needs.
+    
+    Only guilds and messages (with their content) are requested, which keeps
+    typing, reaction, presence and similar events off the gateway. The
+    privileged members intent is opt-in; guild.member_count works without it.
+    
+    Returns:
+        discord.Intents: The intents
+    """
+    intents = discord.Intents.none()
+    intents.guilds = True
+    intents.messages = True
+    intents.message_content = True
+    intents.members = Config.is_members_intent_enabled()
+    return intents
+
+def build_cache_options(intents):
+    """
+    Build the member and message cache options for the bot.
+    
+    Args:
+        intents: The bot's gateway intents
+    
+    Returns:
+        Dict: Keyword arguments for the bot constructor
+    """
+    if intents.members:
+        member_cache_flags = discord.MemberCacheFlags.from_intents(intents)
+    else:
+        # Only the bot's own member is kept
+        member_cache_flags = discord.MemberCacheFlags.none()
+    return {
+        "max_messages": Config.get_max_messages(),
+        "member_cache_flags": member_cache_flags,
+        "chunk_guilds_at_startup": intents.members and Config.is_guild_chunking_enabled(),
+    }
+
 # Set up the Discord bot with intents
-intents = discord.Intents.default()
-intents.message_content = True
-intents.members = True
+intents = build_intents()
+
+def create_bot():
+    """
+    Create the bot, sharded if BOT_SHARDING is on.
+    
+    With sharding on, SHARD_COUNT sets the total number of shards (Discord's
+    recommendation if unset) and SHARD_IDS limits this process to some of them,
+    so one bot can be spread over several processes or hosts.
+    
+    Returns:
+        commands.Bot: The bot instance
+    """
+    if Config.is_sharding_enabled():
+        shard_count = Config.get_shard_count()
+        shard_ids = Config.get_shard_ids()
+        if shard_ids is not None and shard_count is None:
+            logger.error("SHARD_IDS requires SHARD_COUNT; running every shard instead")
+            shard_ids = None
+        logger.info(f"Starting sharded bot (shards: {shard_ids or 'all'} of {shard_count or 'recommended'})")
+        return commands.AutoShardedBot(
+            command_prefix=Config.get_command_prefix(),
+            intents=intents,
+            shard_count=shard_count,
+            shard_ids=shard_ids,
+            **build_cache_options(intents)
+        )
+    return commands.Bot(command_prefix=Config.get_command_prefix(), intents=intents, **build_cache_options(intents))
 
 # Create the bot instance with a command prefix from config
-bot = commands.Bot(command_prefix=Config.get_command_prefix(), intents=intents)
+bot = create_bot()
 
 @bot.event
 async def on_ready():
     """Event triggered when the bot is ready and connected to Discord."""
     logger.info(f"Bot connected as {bot.user.name} (ID: {bot.user.id})")
     logger.info(f"Connected to {len(bot.guilds)} servers")
+    if bot.shard_count:
+        logger.info(f"Running {len(bot.shards)} of {bot.shard_count} shards")
     
     # Set the bot's activity
     activity = discord.Activity(type=discord.ActivityType.listening, name=f"{Config.get_command_prefix()}help")
@@ -37,6 +103,16 @@ async def on_ready():
     
     logger.info("Bot is fully ready!")
 
+@bot.event
+async def on_shard_ready(shard_id):
+    """Event triggered when a shard has connected and received its guilds."""
+    logger.info(f"Shard {shard_id} is ready")
+
+@bot.event
+async def on_shard_disconnect(shard_id):
+    """Event triggered when a shard loses its gateway connection."""
+    logger.warning(f"Shard {shard_id} disconnected")
+
 @bot.event
 async def on_guild_join(guild):
     """Event triggered when the bot joins a new Discord server."""
@@ -109,4 +185,5 @@ if __name__ == "__main__":
         logger.error("Discord token not found in environment variables")
         exit(1)
     
-    bot.run(discord_token)
+    # Logging is already set up, so discord.py must not add its own handler
+    bot.run(discord_token, log_handler=None)
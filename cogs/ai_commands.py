@@ -8,39 +8,154 @@ import asyncio
 import re
 from datetime import datetime
 
-from utils.google_ai_helper import generate_ai_response, generate_image
+from utils import ai_provider, async_db, resilience
 from utils.config import Config
-from models import Conversation, Server
-from app import db
+from utils.metrics import REGISTRY, StageTimer
+from utils.streaming import StreamingReply
+from utils.chunking import send_long_message
+from utils.write_behind import ConversationWriter
+from utils.server_cache import ServerCache
+from utils.conversation_history import ConversationHistory, estimate_tokens
+from utils.logger import reset_request_id, set_request_id
+from utils.rate_limiter import AdmissionController, RateLimited
+from utils.response_cache import response_cache
 
 logger = logging.getLogger("discord_bot")
 
+_stage_seconds = REGISTRY.histogram("stage_seconds", "Time spent in each stage of answering an AI request")
+_response_seconds = REGISTRY.histogram("ai_response_seconds", "Time to answer an AI request, from admission to the reply being sent")
+_requests = REGISTRY.counter("ai_requests_total", "Answered AI requests, by guild and outcome")
+_guild_tokens = REGISTRY.counter("ai_guild_tokens_total", "Estimated tokens sent and received, by guild")
+_requests_in_flight = REGISTRY.gauge("ai_requests_in_flight", "AI requests currently being answered")
+
 class AICommands(commands.Cog):
     """Cog containing AI-related commands."""
     
     def __init__(self, bot):
         self.bot = bot
         self.typing_tasks = {}
+        self.conversation_writer = ConversationWriter(
+            max_queue=Config.get_conversation_queue_size(),
+            batch_size=Config.get_conversation_batch_size(),
+            flush_interval=Config.get_conversation_flush_interval()
+        )
+        self.server_cache = ServerCache(refresh_interval=Config.get_server_cache_refresh_interval())
+        # Summaries are only ever read as history context, so without history they would be wasted calls
+        summarize = Config.is_history_enabled() and Config.is_summary_enabled()
+        self.conversation_history = ConversationHistory(
+            max_turns=Config.get_history_max_turns(),
+            summarizer=ai_provider.summarize_conversation if summarize else None,
+            summary_threshold=Config.get_summary_threshold_turns(),
+            keep_recent=Config.get_summary_keep_turns()
+        )
+        self.admission = None
+        if Config.is_rate_limit_enabled():
+            user_rate, user_burst = Config.get_rate_limit_user()
+            guild_rate, guild_burst = Config.get_rate_limit_guild()
+            provider_rate, provider_burst = Config.get_rate_limit_provider()
+            self.admission = AdmissionController(
+                user_rate / 60, user_burst,
+                guild_rate / 60, guild_burst,
+                provider_rate / 60, provider_burst,
+                mode=Config.get_rate_limit_mode(),
+                max_queue=Config.get_rate_limit_queue_size(),
+                queue_timeout=Config.get_rate_limit_queue_timeout(),
+                weights=Config.get_rate_limit_guild_weights()
+            )
+        
+        # Built once the bot user is known; see _build_mention_matcher
+        self._mention_pattern = None
+        self._mention_id = None
+        
+        # Guilds with their own label on per-guild metrics; see _guild_label
+        self._labelled_guilds = set()
+        self._register_stats()
+    
+    async def cog_load(self):
+        """Warm the server cache and start background workers when the cog is loaded."""
+        if self.bot.user:
+            self._build_mention_matcher()
+        try:
+            await self.server_cache.preload()
+        except Exception as e:
+            logger.error(f"Failed to preload the server cache: {e}")
+        self.server_cache.start()
+        self.conversation_writer.start()
+    
+    async def cog_unload(self):
+        """Flush queued conversations and summaries and close database connections before the cog is unloaded."""
+        await self.server_cache.stop()
+        if self.admission:
+            await self.admission.close()
+        await self.conversation_history.close()
+        await self.conversation_writer.close()
+        await async_db.dispose()
+        for name in ("conversation_writer", "admission", "server_cache", "history", "response_cache", "router", "circuit", "db_pool"):
+            REGISTRY.unregister_stats(name)
+    
+    @commands.Cog.listener()
+    async def on_guild_join(self, guild):
+        """Add a newly joined guild to the server cache."""
+        try:
+            await self.server_cache.guild_joined(guild)
+        except Exception as e:
+            logger.error(f"Failed to record joined server {guild.id}: {e}")
+    
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        """Drop a guild the bot left from the server cache."""
+        try:
+            await self.server_cache.guild_removed(guild)
+        except Exception as e:
+            logger.error(f"Failed to record removed server {guild.id}: {e}")
+    
+    @commands.Cog.listener()
+    async def on_ready(self):
+        """Rebuild the mention matcher for the connected bot user."""
+        self._build_mention_matcher()
     
     @commands.Cog.listener()
     async def on_message(self, message):
         """
         Listen for messages that mention the bot and respond with AI.
+        
+        This runs for every message the bot can see, so messages that neither
+        contain the bot's ID nor reply to another message are rejected before
+        anything else is looked at.
         """
         # Don't respond to bot messages
         if message.author.bot:
             return
         
-        # Check if the message mentions the bot or starts with @bot
+        if self._mention_id is None:
+            if not self.bot.user:
+                return
+            self._build_mention_matcher()
+        
+        # A mention always puts the bot's ID in the content; only replies can ping without it
+        reference = message.reference
+        if reference is None and self._mention_id not in message.content:
+            return
+        
+        # Check if the message mentions the bot or replies to one of its messages
         is_mention = self.bot.user in message.mentions
-        is_reply = message.reference and message.reference.resolved and message.reference.resolved.author.id == self.bot.user.id
+        if not is_mention:
+            resolved = reference.resolved if reference else None
+            author = getattr(resolved, "author", None)
+            if author is None or author.id != self.bot.user.id:
+                return
         
-        if is_mention or is_reply:
-            # Extract the actual message content without the mention
-            content = re.sub(f'<@!?{self.bot.user.id}>', '', message.content).strip()
-            
-            if content:  # Only process if there's actual content
-                await self._process_ai_response(message, content)
+        # Skip guilds that turned AI responses off; uncached guilds are new and default to on
+        if message.guild:
+            server = self.server_cache.get(str(message.guild.id))
+            if server is not None and not server["ai_enabled"]:
+                return
+        
+        # Extract the actual message content without the mention
+        content = self._mention_pattern.sub('', message.content).strip()
+        
+        if content:  # Only process if there's actual content
+            await self._process_ai_response(message, content)
     
     @commands.command(name="ai")
     async def ai_command(self, ctx, *, message=None):
@@ -73,7 +188,7 @@ class AICommands(commands.Cog):
                 await ctx.send("Generating image... This may take a moment.")
                 
                 # Generate the image
-                result = generate_image(prompt)
+                result = await ai_provider.generate_image(prompt)
                 
                 if result and "url" in result:
                     # Create an embed for the image
@@ -106,61 +221,213 @@ class AICommands(commands.Cog):
     
     async def _process_ai_response(self, message, content):
         """
-        Process an AI response to a message.
+        Process an AI response to a message, recording its latency and outcome.
+        
+        Args:
+            message: The Discord message
+            content: The content to process
+        """
+        guild = self._guild_label(message.guild)
+        timer = StageTimer(_stage_seconds)
+        # Every log line about this request carries the triggering message's ID
+        request_id = set_request_id(str(message.id))
+        try:
+            with _requests_in_flight.track():
+                outcome = await self._answer(message, content, guild, timer)
+        finally:
+            reset_request_id(request_id)
+        if outcome != "rate_limited":
+            _response_seconds.observe(timer.elapsed())
+        _requests.inc(guild=guild, outcome=outcome)
+    
+    async def _answer(self, message, content, guild, timer):
+        """
+        Generate and send an AI response to a message.
         
         Args:
             message: The Discord message
             content: The content to process
+            guild: The message's guild label for per-guild metrics
+            timer: Times each stage of the response
+        
+        Returns:
+            str: The outcome: "ok", "rate_limited" or "error"
         """
+        # Admit the request through the per-user, per-guild and per-provider limits;
+        # in router mode the provider limit is the one of the provider the router picks
+        if self.admission:
+            guild_id = str(message.guild.id) if message.guild else "DM"
+            try:
+                waited = await self.admission.acquire(
+                    str(message.author.id), guild_id, ai_provider.resolve_provider()
+                )
+            except RateLimited as e:
+                logger.info(f"Rejected AI request from {message.author.id} in {guild_id}: {e}")
+                await message.channel.send(
+                    f"I'm getting a lot of requests right now. Please try again in {max(1, round(e.retry_after))} seconds."
+                )
+                return "rate_limited"
+            if waited:
+                logger.debug("AI request from %s waited %.2fs for admission", message.author.id, waited)
+        timer.mark("admission")
+        
         # Start typing indicator
         typing_task = asyncio.create_task(self._continue_typing(message.channel))
         self.typing_tasks[message.channel.id] = typing_task
         
         try:
-            # Generate AI response
-            response = await asyncio.to_thread(generate_ai_response, content, message.author.name)
-            
-            # Save conversation to database
+            # Look up the server's settings
             try:
                 server = await self._get_or_create_server(message.guild)
-                
-                conversation = Conversation(
-                    server_id=server.id,
-                    channel_id=str(message.channel.id),
-                    user_id=str(message.author.id),
-                    username=message.author.name,
-                    message=content,
-                    response=response,
-                    timestamp=datetime.utcnow()
-                )
-                
-                db.session.add(conversation)
-                db.session.commit()
             except Exception as db_error:
                 logger.error(f"Database error: {db_error}")
+                server = None
+            timer.mark("server_lookup")
             
-            # Cancel typing
-            if message.channel.id in self.typing_tasks:
-                self.typing_tasks[message.channel.id].cancel()
-                del self.typing_tasks[message.channel.id]
+            # Guilds opt in to answering repeated prompts from the response cache
+            use_cache = Config.is_response_cache_enabled() and server is not None and bool(server["response_cache_enabled"])
             
-            # Split response if it's too long
-            if len(response) > 2000:
-                chunks = [response[i:i+2000] for i in range(0, len(response), 2000)]
-                for chunk in chunks:
-                    await message.channel.send(chunk)
+            # Recent turns in this channel, trimmed to the token budget
+            channel_id = str(message.channel.id)
+            history = []
+            if Config.is_history_enabled():
+                history = await self.conversation_history.get_context(channel_id, Config.get_history_token_budget())
+            timer.mark("history")
+            
+            streamed = Config.is_streaming_enabled()
+            if streamed:
+                # Post the response progressively while it is generated
+                response = await self._stream_ai_response(message, content, use_cache, history)
             else:
-                await message.channel.send(response)
+                # Generate AI response
+                response = await ai_provider.generate_response(
+                    content, message.author.name, use_cache=use_cache, history=history
+                )
+            # Streamed responses include sending, which happens as the text arrives
+            timer.mark("generate_stream" if streamed else "generate")
+            
+            sent_tokens = estimate_tokens(content) + sum(estimate_tokens(turn["content"]) for turn in history)
+            _guild_tokens.inc(sent_tokens, guild=guild, direction="input")
+            _guild_tokens.inc(estimate_tokens(response), guild=guild, direction="output")
+            
+            timestamp = datetime.utcnow()
+            if Config.is_history_enabled():
+                self.conversation_history.add(channel_id, message.author.name, content, response, timestamp)
+            
+            # Queue the conversation for the background database writer
+            if server is not None:
+                await self.conversation_writer.put({
+                    "server_id": server["id"],
+                    "channel_id": channel_id,
+                    "user_id": str(message.author.id),
+                    "username": message.author.name,
+                    "message": content,
+                    "response": response,
+                    "timestamp": timestamp
+                })
+            timer.mark("db_enqueue")
+            
+            # Cancel typing
+            self._stop_typing(message.channel.id)
+            
+            # Streamed responses have already been posted
+            if not streamed:
+                # Long responses are split at natural boundaries, or sent as embeds or a file
+                await send_long_message(
+                    message.channel, response,
+                    mode=Config.get_long_response_mode(),
+                    attachment_threshold=Config.get_attachment_threshold()
+                )
+                timer.mark("send")
+            return "ok"
         
         except Exception as e:
             logger.error(f"Error processing AI response: {e}")
             
             # Cancel typing
-            if message.channel.id in self.typing_tasks:
-                self.typing_tasks[message.channel.id].cancel()
-                del self.typing_tasks[message.channel.id]
+            self._stop_typing(message.channel.id)
             
             await message.channel.send(f"Sorry, I encountered an error: {str(e)}")
+            return "error"
+    
+    async def _stream_ai_response(self, message, content, use_cache=False, history=None):
+        """
+        Stream an AI response into the channel, editing it as text arrives.
+        
+        Args:
+            message: The Discord message
+            content: The content to process
+            use_cache: Whether to use the response cache
+            history: Earlier chat messages to send as context
+            
+        Returns:
+            str: The full AI-generated response
+        """
+        reply = StreamingReply(
+            message.channel,
+            edit_interval=Config.get_stream_edit_interval(),
+            on_first_send=lambda: self._stop_typing(message.channel.id)
+        )
+        
+        async for piece in ai_provider.stream_response(
+            content, message.author.name, use_cache=use_cache, history=history
+        ):
+            await reply.feed(piece)
+        
+        response = await reply.finish()
+        if not reply.messages:
+            raise Exception("The AI returned an empty response")
+        return response
+    
+    def _guild_label(self, guild):
+        """
+        Get the label a guild's requests are counted under on per-guild metrics.
+        
+        The first METRICS_MAX_GUILDS guilds seen get their own label and the
+        rest share "other", so the number of series stays bounded.
+        
+        Args:
+            guild: The Discord guild, or None for direct messages
+        
+        Returns:
+            str: The guild ID, "DM" or "other"
+        """
+        if guild is None:
+            return "DM"
+        guild_id = str(guild.id)
+        if guild_id not in self._labelled_guilds:
+            if len(self._labelled_guilds) >= Config.get_metrics_max_guilds():
+                return "other"
+            self._labelled_guilds.add(guild_id)
+        return guild_id
+    
+    def _register_stats(self):
+        """Expose the counters of the cog's components on /metrics."""
+        REGISTRY.register_stats("conversation_writer", self.conversation_writer.stats)
+        if self.admission:
+            REGISTRY.register_stats("admission", self.admission.stats)
+        REGISTRY.register_stats("server_cache", lambda: {"size": len(self.server_cache)})
+        REGISTRY.register_stats("history", lambda: {"channels": len(self.conversation_history)})
+        REGISTRY.register_stats("response_cache", response_cache.stats)
+        REGISTRY.register_stats("router", lambda: ai_provider.get_router().stats())
+        REGISTRY.register_stats("circuit", lambda: {"breaker": resilience.breaker_stats()})
+        REGISTRY.register_stats("db_pool", async_db.pool_stats)
+    
+    def _build_mention_matcher(self):
+        """Compile the pattern that strips mentions of the bot from message content."""
+        self._mention_id = str(self.bot.user.id)
+        self._mention_pattern = re.compile(f'<@!?{self._mention_id}>')
+    
+    def _stop_typing(self, channel_id):
+        """
+        Cancel the typing indicator for a channel, if one is running.
+        
+        Args:
+            channel_id: The Discord channel ID
+        """
+        typing_task = self.typing_tasks.pop(channel_id, None)
+        if typing_task:
+            typing_task.cancel()
     
     async def _continue_typing(self, channel):
         """
@@ -181,45 +448,19 @@ class AICommands(commands.Cog):
     
     async def _get_or_create_server(self, guild):
         """
-        Get or create a server record in the database.
+        Get or create a server record, served from the in-memory server cache.
         
         Args:
             guild: The Discord guild (server)
             
         Returns:
-            Server: The server record
+            Dict: The server record's fields
         """
         if not guild:
-            # This might be a DM, so we'll create a special server for DMs
-            server = Server.query.filter_by(discord_server_id="DM").first()
-            if not server:
-                server = Server(
-                    discord_server_id="DM",
-                    name="Direct Messages",
-                    user_id=1,  # Assuming admin user ID is 1
-                    prefix=Config.get_command_prefix(),
-                    ai_enabled=True
-                )
-                db.session.add(server)
-                db.session.commit()
-            return server
-        
-        # Look up the server in the database
-        server = Server.query.filter_by(discord_server_id=str(guild.id)).first()
-        
-        # If the server doesn't exist, create it
-        if not server:
-            server = Server(
-                discord_server_id=str(guild.id),
-                name=guild.name,
-                user_id=1,  # Assuming admin user ID is 1
-                prefix=Config.get_command_prefix(),
-                ai_enabled=True
-            )
-            db.session.add(server)
-            db.session.commit()
+            # This might be a DM, so we'll use a special server for DMs
+            return await self.server_cache.get_or_create("DM", "Direct Messages")
         
-        return server
+        return await self.server_cache.get_or_create(str(guild.id), guild.name)
 
 async def setup(bot):
     """Add the cog to the bot."""
@@ -10,15 +10,41 @@ import asyncio
 from datetime import datetime
 
 from utils.config import Config
+from utils.metrics import REGISTRY, LoopLagProbe, SnapshotReporter
+from utils.shard_monitor import ShardMonitor
 
 logger = logging.getLogger("discord_bot")
 
+# Discord's maximum embed field value length
+EMBED_FIELD_LIMIT = 1024
+
 class GeneralCommands(commands.Cog):
     """Cog containing general bot commands."""
     
     def __init__(self, bot):
         self.bot = bot
         self.start_time = datetime.utcnow()
+        self.shard_monitor = ShardMonitor(bot, report_interval=Config.get_shard_status_interval())
+        self.loop_lag = LoopLagProbe(interval=Config.get_metrics_loop_lag_interval())
+        self.metrics_reporter = SnapshotReporter("bot", interval=Config.get_metrics_snapshot_interval())
+    
+    async def cog_load(self):
+        """Start reporting shard status and metrics when the cog is loaded."""
+        self.shard_monitor.start()
+        if Config.is_metrics_enabled():
+            self.loop_lag.start()
+            self.metrics_reporter.start()
+    
+    async def cog_unload(self):
+        """Stop reporting shard status and metrics when the cog is unloaded."""
+        await self.shard_monitor.stop()
+        await self.loop_lag.stop()
+        await self.metrics_reporter.stop()
+    
+    @commands.Cog.listener()
+    async def on_message(self, message):
+        """Count messages towards their shard's event rate."""
+        self.shard_monitor.record_event(message.guild)
     
     @commands.command(name="commands")
     async def help_command(self, ctx, command=None):
@@ -115,11 +141,68 @@ class GeneralCommands(commands.Cog):
         embed.add_field(name="Commands", value=str(len(self.bot.commands)), inline=True)
         embed.add_field(name="Prefix", value=Config.get_command_prefix(), inline=True)
         
+        # What discord.py keeps in memory, to compare against the memory usage above
+        max_messages = Config.get_max_messages()
+        cached_members = sum(len(guild.members) for guild in self.bot.guilds)
+        embed.add_field(
+            name="Cache",
+            value=(
+                f"{len(self.bot.users)} users, {cached_members} members, "
+                f"{len(self.bot.cached_messages)}/{max_messages or 0} messages\n"
+                f"Members intent: {'on' if self.bot.intents.members else 'off'}"
+            ),
+            inline=False
+        )
+        
+        # One line per shard run by this process, up to 20 and the field's length limit
+        shards = self.shard_monitor.snapshot()
+        lines = []
+        length = 0
+        for index, shard in enumerate(shards):
+            latency = f"{shard['latency_ms']:.0f}ms" if shard["latency_ms"] is not None else "connecting"
+            line = f"#{shard['shard_id']}: {latency}, {shard['guild_count']} servers, {shard['event_rate']:.1f} msg/s"
+            if not shard["is_connected"]:
+                line += " (disconnected)"
+            # Leave room for the "...and N more" line
+            if index >= 20 or length + len(line) + 1 > EMBED_FIELD_LIMIT - 32:
+                lines.append(f"...and {len(shards) - index} more")
+                break
+            lines.append(line)
+            length += len(line) + 1
+        embed.add_field(name=f"Shards ({len(shards)} of {shards[0]['shard_count']})", value="\n".join(lines), inline=False)
+        
+        embed.add_field(name="Performance", value=self._performance_summary(), inline=False)
+        
         embed.set_thumbnail(url=self.bot.user.avatar.url if self.bot.user.avatar else None)
         embed.set_footer(text="Thanks for using the bot!")
         
         await ctx.send(embed=embed)
     
+    def _performance_summary(self):
+        """
+        Summarize AI request latency and event-loop lag from this process's metrics.
+        
+        Returns:
+            str: A few lines for the info embed
+        """
+        def ms(seconds):
+            return f"{seconds * 1000:.0f}ms" if seconds is not None else "n/a"
+        
+        lines = []
+        # Recorded by the AI commands cog, if it is loaded
+        requests = REGISTRY.get("ai_requests_total")
+        response = REGISTRY.get("ai_response_seconds")
+        if requests and response:
+            errors = sum(value for _, key, value in requests.samples() if ("outcome", "error") in key)
+            in_flight = REGISTRY.get("ai_requests_in_flight").total()
+            lines.append(f"AI requests: {requests.total():.0f} ({errors:.0f} errors), {in_flight:.0f} in flight")
+            lines.append(f"Response time: p50 {ms(response.quantile(0.5))}, p95 {ms(response.quantile(0.95))}")
+        
+        if Config.is_metrics_enabled():
+            lag = self.loop_lag.histogram
+            lines.append(f"Event-loop lag: p95 {ms(lag.quantile(0.95))}, last {ms(self.loop_lag.last.total())}")
+        return "\n".join(lines) or "No metrics recorded"
+    
     @commands.command(name="invite")
     async def invite_command(self, ctx):
         """
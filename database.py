@@ -0,0 +1,15 @@
+"""
+Database object shared by the web dashboard and the Discord bot.
+
+Models are declared against it without creating the Flask application, so
+the bot can import them without the dashboard's setup; app.py binds it to
+the application with db.init_app.
+"""
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import DeclarativeBase
+
+# Setup the base class for SQLAlchemy models
+class Base(DeclarativeBase):
+    pass
+
+db = SQLAlchemy(model_class=Base)
@@ -0,0 +1,26 @@
+"""
+Gunicorn settings for the web dashboard (gunicorn -c gunicorn.conf.py wsgi:app).
+"""
+import os
+
+from utils.config import Config
+
+bind = f"0.0.0.0:{Config.get_web_port()}"
+workers = Config.get_web_workers()
+
+# Every worker, including the ones max_requests recycles, must sign session
+# cookies with the same key; app.py would otherwise give each a random one
+if not os.environ.get("SESSION_SECRET"):
+    raise RuntimeError("SESSION_SECRET must be set to serve the dashboard with gunicorn")
+
+# Conversation exports stream for as long as the download takes
+worker_class = "gthread"
+threads = 4
+timeout = 120
+graceful_timeout = 30
+
+# Recycle workers now and then so slow leaks cannot build up
+max_requests = 1000
+max_requests_jitter = 100
+
+accesslog = "-"
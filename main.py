@@ -1,77 +1,265 @@
 """
-Entry point for the Discord bot with OpenAI integration.
-This file imports the Flask app and runs the Discord bot.
+Entry point that supervises the Discord bot and the web dashboard.
+
+The bot and the dashboard run as separate processes that share state only
+through the database, so each can be scaled or restarted on its own:
+
+    python main.py              # create missing tables, then supervise the dashboard and the bot
+    python main.py --only bot   # just the bot process(es)
+    python main.py --only web   # create missing tables, then just the dashboard
+    python main.py --migrate    # just create missing tables
+    python bot.py               # a single bot process, unsupervised
+    gunicorn -c gunicorn.conf.py wsgi:app   # the dashboard, unsupervised
+
+Crashed processes are restarted with exponential backoff, and SIGTERM or
+Ctrl+C stops every child before the supervisor exits.
 """
-import asyncio
+import argparse
 import logging
-import threading
+import multiprocessing
 import os
+import secrets
+import signal
 import sys
+import time
 
-from app import app
-from bot import bot
 from utils.config import Config
-from utils.logger import setup_logger
+from utils.logger import setup_logger, stop_logging
 
 # Set up logging
 setup_logger()
 logger = logging.getLogger("discord_bot")
 
-# In Replit, we're using gunicorn for Flask, 
-# so we need to modify our approach to run the bot as a separate process
-import multiprocessing
-import time
+def run_web():
+    """Run the web dashboard with gunicorn, or Flask's server if WEB_SERVER is "flask"."""
+    if Config.get_web_server() == "flask":
+        from wsgi import app
+        app.run(host="0.0.0.0", port=Config.get_web_port())
+        return
+    
+    from gunicorn.app.wsgiapp import run
+    sys.argv = ["gunicorn", "--config", "gunicorn.conf.py", "wsgi:app"]
+    run()
 
-def run_flask():
-    """Run the Flask web interface"""
-    app.run(host="0.0.0.0", port=5000, debug=True)
+def run_bot(shard_ids=None):
+    """
+    Run the Discord bot
+    
+    Args:
+        shard_ids: The shards this process runs, or None for every shard
+    """
+    discord_token = Config.get_discord_token()
+    if not discord_token:
+        logger.error("Discord token not found in environment variables")
+        sys.exit(1)
+    
+    if shard_ids is not None:
+        # The bot reads its shards from the environment when it is created
+        os.environ["SHARD_IDS"] = ",".join(str(shard_id) for shard_id in shard_ids)
+    from bot import bot
+    
+    # Log that we're attempting to connect
+    logger.info(f"Attempting to connect to Discord with token: {discord_token[:5]}...")
+    
+    # Start the bot with the token (async); logging is already set up, so
+    # discord.py must not add its own handler
+    bot.run(discord_token, log_handler=None)
 
-def run_bot():
-    """Run the Discord bot"""
+def migrate():
+    """
+    Create any database tables that do not exist yet.
+    
+    Returns:
+        bool: True on success, False if the database could not be migrated
+    """
     try:
-        discord_token = Config.get_discord_token()
-        if not discord_token:
-            logger.error("Discord token not found in environment variables")
-            return
-        
-        # Log that we're attempting to connect
-        logger.info(f"Attempting to connect to Discord with token: {discord_token[:5]}...")
-        
-        # Start the bot with the token (async)
-        bot.run(discord_token)
+        from app import app, migrate as migrate_database
+        from database import db
+        migrate_database()
+        # The bot and dashboard are forked from this process; close the pooled
+        # connections so no child inherits a socket or SQLite handle in use here
+        with app.app_context():
+            db.engine.dispose()
     except Exception as e:
-        logger.error(f"Error starting the bot: {e}")
-        print(f"Discord Bot Error: {e}")
+        logger.error(f"Database migration failed: {e}")
+        return False
+    logger.info("Database tables are up to date")
+    return True
 
-def start_bot_process():
-    """Start the bot in a separate process"""
-    # When running with gunicorn, we'll start the bot as a separate process
-    bot_process = multiprocessing.Process(target=run_bot)
-    bot_process.daemon = True
-    bot_process.start()
-    logger.info(f"Started Discord bot process with PID: {bot_process.pid}")
-    return bot_process
+def ensure_session_secret():
+    """
+    Make sure every dashboard worker signs session cookies with the same key.
+    
+    Without SESSION_SECRET each worker would make up its own key and reject
+    logins made through the others, so one is generated here and passed to
+    the children through the environment.
+    """
+    if os.environ.get("SESSION_SECRET"):
+        return
+    os.environ["SESSION_SECRET"] = secrets.token_hex(32)
+    logger.warning("SESSION_SECRET is not set; generated one for this run, so dashboard logins end when it restarts")
 
-# If we're running this file directly
-if __name__ == "__main__":
+def plan_shard_processes():
+    """
+    Split this host's shards between the configured number of bot processes.
+    
+    Returns:
+        List: The shard IDs for each process, or [None] for a single process running every shard
+    """
+    processes = Config.get_shard_processes()
+    if not Config.is_sharding_enabled() or processes == 1:
+        return [None]
+    
+    shard_count = Config.get_shard_count()
+    if shard_count is None:
+        logger.error("SHARD_PROCESSES requires SHARD_COUNT; starting a single bot process")
+        return [None]
+    
+    shard_ids = Config.get_shard_ids() or list(range(shard_count))
+    processes = min(processes, len(shard_ids))
+    # Contiguous ranges, the first processes taking one extra shard when they don't divide evenly
+    size, extra = divmod(len(shard_ids), processes)
+    plan, start = [], 0
+    for index in range(processes):
+        end = start + size + (1 if index < extra else 0)
+        plan.append(shard_ids[start:end])
+        start = end
+    return plan
+
+def _run_child(target, args):
+    """Run a supervised function with default signal handling."""
+    # Forked children inherit the supervisor's SIGTERM handler, which would ignore terminate()
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
     try:
-        # Start the Discord bot in a separate process
-        bot_process = start_bot_process()
+        target(*args)
+    finally:
+        # multiprocessing skips atexit handlers, so write out queued log records here
+        stop_logging()
+
+class Supervisor:
+    """
+    Starts child processes and restarts them when they exit.
+    
+    A child that keeps crashing is restarted after exponentially growing
+    delays, up to max_backoff seconds; one that stayed up for stable_after
+    seconds starts again from the shortest delay.
+    """
+    
+    def __init__(self, max_backoff: float = 60.0, stable_after: float = 60.0):
+        self.max_backoff = max_backoff
+        self.stable_after = stable_after
+        self._children = {}
+        self._stopping = False
+    
+    def add(self, name, target, args=()):
+        """
+        Register a child process.
         
-        # Run the Flask app in the main thread (for development)
-        run_flask()
-    except KeyboardInterrupt:
-        logger.info("Application shutdown by user")
-        sys.exit(0)
-    except Exception as e:
-        logger.error(f"Unexpected error: {e}")
+        Args:
+            name: A name for log messages
+            target: The function the process runs
+            args: Arguments for the function
+        """
+        self._children[name] = {
+            "target": target,
+            "args": args,
+            "process": None,
+            "started_at": 0.0,
+            "restarts": 0,
+            "restart_at": 0.0,
+        }
+    
+    def run(self):
+        """Start every child and keep them running until stopped."""
+        signal.signal(signal.SIGTERM, lambda signum, frame: self.stop())
+        for name in self._children:
+            self._start(name)
+        
+        try:
+            while not self._stopping:
+                self._check()
+                time.sleep(1)
+        except KeyboardInterrupt:
+            logger.info("Application shutdown by user")
+        finally:
+            self._shutdown()
+    
+    def stop(self):
+        """Ask the supervisor to stop its children and exit."""
+        self._stopping = True
+    
+    def _start(self, name):
+        """Start a child process."""
+        child = self._children[name]
+        process = multiprocessing.Process(target=_run_child, args=(child["target"], child["args"]), name=name)
+        process.start()
+        child["process"] = process
+        child["started_at"] = time.monotonic()
+        logger.info(f"Started {name} process with PID: {process.pid}")
+    
+    def _check(self):
+        """Schedule restarts for exited children and start those that are due."""
+        now = time.monotonic()
+        for name, child in self._children.items():
+            process = child["process"]
+            if process is not None and process.is_alive():
+                continue
+            
+            if process is not None:
+                # Just exited: work out when to restart it
+                if now - child["started_at"] >= self.stable_after:
+                    child["restarts"] = 0
+                delay = min(self.max_backoff, 2 ** child["restarts"])
+                child["restarts"] += 1
+                child["restart_at"] = now + delay
+                child["process"] = None
+                logger.error(f"{name} process exited with code {process.exitcode}; restarting in {delay}s")
+            elif now >= child["restart_at"]:
+                self._start(name)
+    
+    def _shutdown(self):
+        """Terminate every child, killing those that do not exit in time."""
+        processes = [child["process"] for child in self._children.values() if child["process"] is not None]
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                logger.warning(f"{process.name} process did not stop, killing it")
+                process.kill()
+        logger.info("All processes stopped")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the Discord bot and its web dashboard.")
+    parser.add_argument("--only", choices=("bot", "web"), help="Run only the bot or only the dashboard")
+    parser.add_argument("--migrate", action="store_true", help="Create missing database tables and exit")
+    parser.add_argument("--skip-migrate", action="store_true", help="Do not create missing tables before starting")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if args.migrate:
+        sys.exit(0 if migrate() else 1)
+    
+    if args.only != "bot":
+        ensure_session_secret()
+    
+    # The dashboard's host owns the schema; bot-only hosts expect it to exist
+    if args.only != "bot" and not args.skip_migrate and not migrate():
         sys.exit(1)
-else:
-    # When imported by gunicorn, start the bot process
-    # This ensures the bot runs when the app is started with gunicorn
-    try:
-        logger.info("Starting Discord bot process from gunicorn import")
-        bot_process = start_bot_process()
-    except Exception as e:
-        logger.error(f"Failed to start Discord bot from gunicorn: {e}")
-        print(f"Discord Bot Start Error: {e}")
+    
+    supervisor = Supervisor()
+    
+    if args.only != "bot":
+        supervisor.add("web", run_web)
+    if args.only != "web":
+        plan = plan_shard_processes()
+        for shard_ids in plan:
+            name = "bot" if shard_ids is None else f"bot[{shard_ids[0]}-{shard_ids[-1]}]"
+            supervisor.add(name, run_bot, (shard_ids,))
+    
+    supervisor.run()
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,7 @@
 Database models for the Discord bot application.
 """
 from datetime import datetime
-from app import db
+from database import db
 from flask_login import UserMixin
 
 class User(UserMixin, db.Model):
@@ -35,10 +35,12 @@ class Server(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     joined_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Bot settings for this server
     prefix = db.Column(db.String(10), default='!')
     ai_enabled = db.Column(db.Boolean, default=True)
+    response_cache_enabled = db.Column(db.Boolean, default=False)
     
     # Relationships
     conversations = db.relationship('Conversation', backref='server', lazy=True)
@@ -53,11 +55,19 @@ class Server(db.Model):
             'name': self.name,
             'prefix': self.prefix,
             'ai_enabled': self.ai_enabled,
-            'joined_at': self.joined_at.isoformat()
+            'response_cache_enabled': self.response_cache_enabled,
+            'is_active': self.is_active,
+            'joined_at': self.joined_at.isoformat(),
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
 class Conversation(db.Model):
     """Stores conversation history for AI context."""
+    __table_args__ = (
+        # Supports keyset pagination of a server's conversations, newest first
+        db.Index('ix_conversation_server_timestamp_id', 'server_id', 'timestamp', 'id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     server_id = db.Column(db.Integer, db.ForeignKey('server.id'), nullable=False)
     channel_id = db.Column(db.String(64), nullable=False)
@@ -67,16 +77,76 @@ class Conversation(db.Model):
     response = db.Column(db.Text, nullable=True)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Fields that can be requested through the API
+    FIELDS = ('id', 'channel_id', 'user_id', 'username', 'message', 'response', 'timestamp')
+    
     def __repr__(self):
         return f"<Conversation {self.id} in {self.channel_id}>"
     
+    def to_dict(self, fields=None):
+        data = {}
+        for field in fields or self.FIELDS:
+            value = getattr(self, field)
+            data[field] = value.isoformat() if field == 'timestamp' else value
+        return data
+
+class ResponseCacheEntry(db.Model):
+    """Persistent tier of the AI response cache."""
+    id = db.Column(db.Integer, primary_key=True)
+    cache_key = db.Column(db.String(64), unique=True, nullable=False)
+    response = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<ResponseCacheEntry {self.cache_key[:12]}>"
+
+class ChannelSummary(db.Model):
+    """Rolling summary of a channel's older conversation history."""
+    id = db.Column(db.Integer, primary_key=True)
+    channel_id = db.Column(db.String(64), unique=True, nullable=False)
+    summary = db.Column(db.Text, nullable=False)
+    summarized_until = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<ChannelSummary {self.channel_id}>"
+
+class ShardStatus(db.Model):
+    """Latest health report of one gateway shard, written by the bot process running it."""
+    id = db.Column(db.Integer, primary_key=True)
+    shard_id = db.Column(db.Integer, unique=True, nullable=False)
+    shard_count = db.Column(db.Integer, nullable=False)
+    host = db.Column(db.String(128), nullable=True)
+    pid = db.Column(db.Integer, nullable=True)
+    is_connected = db.Column(db.Boolean, default=False)
+    latency_ms = db.Column(db.Float, nullable=True)
+    guild_count = db.Column(db.Integer, default=0)
+    event_rate = db.Column(db.Float, default=0.0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<ShardStatus {self.shard_id}/{self.shard_count}>"
+    
     def to_dict(self):
         return {
-            'id': self.id,
-            'channel_id': self.channel_id,
-            'user_id': self.user_id,
-            'username': self.username,
-            'message': self.message,
-            'response': self.response,
-            'timestamp': self.timestamp.isoformat()
+            'shard_id': self.shard_id,
+            'shard_count': self.shard_count,
+            'host': self.host,
+            'pid': self.pid,
+            'is_connected': self.is_connected,
+            'latency_ms': self.latency_ms,
+            'guild_count': self.guild_count,
+            'event_rate': self.event_rate,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+
+class MetricsSnapshot(db.Model):
+    """Latest collected metrics of one bot process, written by that process for the dashboard's /metrics route."""
+    id = db.Column(db.Integer, primary_key=True)
+    instance = db.Column(db.String(255), unique=True, nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON list of metric families
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<MetricsSnapshot {self.instance}>"
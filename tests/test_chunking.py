@@ -0,0 +1,61 @@
+"""
+Regression tests for utils.chunking and utils.streaming.
+
+Run with: python -m pytest tests
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.chunking import MESSAGE_LIMIT, split_message, take_chunk
+from utils.streaming import StreamingReply
+
+class FakeMessage:
+    def __init__(self, content):
+        self.content = content
+    
+    async def edit(self, content):
+        self.content = content
+
+class FakeChannel:
+    def __init__(self):
+        self.sent = []
+    
+    async def send(self, content):
+        message = FakeMessage(content)
+        self.sent.append(message)
+        return message
+
+def test_take_chunk_consumes_text_after_long_fence_line():
+    text = "```" + "b" * 3000
+    head, rest = take_chunk(text)
+    assert len(head) <= MESSAGE_LIMIT
+    assert len(rest) < len(text)
+
+def test_split_message_long_fence_opening_line_terminates():
+    text = "```" + "b " * 1500
+    chunks = split_message(text)
+    assert all(len(chunk) <= MESSAGE_LIMIT for chunk in chunks)
+    assert len(chunks) <= 3
+
+def test_split_message_reopens_block_with_language_tag_only():
+    text = "```python title=\"" + "a" * 500 + "\"\n" + "x = 1\n" * 600
+    chunks = split_message(text)
+    assert len(chunks) > 1
+    assert chunks[0].endswith("```")
+    assert all(chunk.startswith("```python\n") for chunk in chunks[1:])
+
+def test_streaming_reply_long_fence_opening_line_terminates():
+    channel = FakeChannel()
+    reply = StreamingReply(channel, edit_interval=0)
+    
+    async def stream():
+        await reply.feed("```" + "b " * 1500)
+        await reply.feed("b" * 3000)
+        return await reply.finish()
+    
+    text = asyncio.run(asyncio.wait_for(stream(), timeout=5))
+    assert text == "```" + "b " * 1500 + "b" * 3000
+    assert all(len(message.content) <= MESSAGE_LIMIT for message in channel.sent)
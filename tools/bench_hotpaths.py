@@ -0,0 +1,215 @@
+"""
+Micro-benchmarks for the per-message code paths of the bot.
+
+Each benchmark is timed with timeit and reported in microseconds per call.
+Results can be saved as a baseline and later runs compared against it, failing
+(exit status 1) when a benchmark is slower than the baseline by more than the
+threshold. Every run can also be appended to a JSON Lines history file so
+trends can be tracked over time.
+
+Usage:
+    python tools/bench_hotpaths.py                       # run and print
+    python tools/bench_hotpaths.py --save-baseline       # record tools/bench_baseline.json
+    python tools/bench_hotpaths.py --compare             # fail on >20% regressions
+    python tools/bench_hotpaths.py --compare --threshold 0.1 --history bench_history.jsonl
+
+Baselines are machine-specific; record one on the machine that runs the comparison.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+from datetime import datetime
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(ROOT, "tools", "bench_baseline.json")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline file (default: tools/bench_baseline.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="Write this run's results as the baseline")
+    parser.add_argument("--compare", action="store_true", help="Compare against the baseline and fail on regressions")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Allowed slowdown before a benchmark counts as a regression (default: 0.2 = 20%%)")
+    parser.add_argument("--history", help="Append this run's results to a JSON Lines file")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repeats; the fastest is kept (default: 5)")
+    parser.add_argument("--only", help="Run only benchmarks whose name contains this text")
+    return parser.parse_args()
+
+def configure_environment():
+    """Use the mock provider and a scratch database so no credentials or network are needed."""
+    os.environ.setdefault("AI_PROVIDER", "mock")
+    os.environ.setdefault("SESSION_SECRET", "bench")
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="bench-"), "bench.db")
+    sys.path.insert(0, ROOT)
+
+def run_async(loop, func, number):
+    """Time number awaits of func inside a single event-loop run."""
+    async def batch():
+        for _ in range(number):
+            await func()
+    loop.run_until_complete(batch())
+
+def build_benchmarks(loop):
+    """
+    Set up the objects each benchmark needs.
+    
+    Returns:
+        Dict: Benchmark name -> (is_async, function making one call)
+    """
+    from app import migrate
+    from models import Conversation
+    from cogs.ai_commands import AICommands
+    from utils.chunking import split_message
+    from utils.google_ai_helper import parse_sentiment
+    
+    bot_user = SimpleNamespace(id=424242424242424242, name="Bot")
+    bot = SimpleNamespace(user=bot_user)
+    migrate()
+    cog = AICommands(bot)
+    
+    async def no_op(message, content):
+        return None
+    cog._process_ai_response = no_op
+    
+    author = SimpleNamespace(id=1, name="user", bot=False)
+    guild = SimpleNamespace(id=777, name="Bench Guild")
+    plain = SimpleNamespace(
+        author=author, guild=guild, mentions=[], reference=None,
+        content="just chatting about nothing in particular, no bot involved here"
+    )
+    mention = SimpleNamespace(
+        author=author, guild=guild, mentions=[bot_user], reference=None,
+        content=f"<@{bot_user.id}> what is the capital of France?"
+    )
+    reply = SimpleNamespace(
+        author=author, guild=guild, mentions=[],
+        reference=SimpleNamespace(resolved=SimpleNamespace(author=bot_user)),
+        content="and what about Germany?"
+    )
+    
+    # Warm the server cache so the lookup is the steady-state cache hit
+    loop.run_until_complete(cog._get_or_create_server(guild))
+    
+    short_response = "Paris is the capital of France."
+    long_response = ("Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 150)[:7000]
+    
+    row = {
+        "server_id": 1,
+        "channel_id": "123456789",
+        "user_id": "987654321",
+        "username": "user",
+        "message": "what is the capital of France?",
+        "response": short_response,
+        "timestamp": datetime(2024, 1, 1, 12, 0, 0),
+    }
+    conversation = Conversation(id=1, **row)
+    
+    json_reply = '```json\n{"rating": 4, "confidence": 0.9, "mood": "happy"}\n```'
+    fallback_reply = "Sure! rating: 4, confidence: 0.85, mood: 'cheerful' - hope that helps"
+    
+    return {
+        "on_message_plain": (True, lambda: cog.on_message(plain)),
+        "on_message_mention": (True, lambda: cog.on_message(mention)),
+        "on_message_reply": (True, lambda: cog.on_message(reply)),
+        "split_message_short": (False, lambda: split_message(short_response)),
+        "split_message_long": (False, lambda: split_message(long_response)),
+        "conversation_construct": (False, lambda: Conversation(**row)),
+        "conversation_to_dict": (False, conversation.to_dict),
+        "get_or_create_server_cached": (True, lambda: cog._get_or_create_server(guild)),
+        "parse_sentiment_json": (False, lambda: parse_sentiment(json_reply)),
+        "parse_sentiment_fallback": (False, lambda: parse_sentiment(fallback_reply)),
+    }
+
+def measure(loop, is_async, func, repeat):
+    """
+    Time a benchmark.
+    
+    Returns:
+        float: The best time per call in microseconds
+    """
+    def run(number):
+        start = time.perf_counter()
+        if is_async:
+            run_async(loop, func, number)
+        else:
+            timeit.timeit(func, number=number)
+        return time.perf_counter() - start
+    
+    # Pick a call count that takes at least ~0.2s per repeat
+    number = 1
+    while run(number) < 0.2:
+        number *= 2
+    
+    return min(run(number) / number for _ in range(repeat)) * 1e6
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+def main():
+    args = parse_args()
+    configure_environment()
+    
+    import logging
+    logging.disable(logging.WARNING)
+    
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    benchmarks = build_benchmarks(loop)
+    
+    results = {}
+    for name, (is_async, func) in benchmarks.items():
+        if args.only and args.only not in name:
+            continue
+        results[name] = measure(loop, is_async, func, args.repeat)
+    
+    baseline = {}
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print(f"No baseline at {args.baseline}; run with --save-baseline first", file=sys.stderr)
+            return 2
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    
+    regressions = []
+    print(f"{'benchmark':32} {'us/call':>10} {'baseline':>10} {'change':>8}")
+    for name, value in results.items():
+        line = f"{name:32} {value:10.2f}"
+        if name in baseline:
+            change = value / baseline[name] - 1
+            flag = "  REGRESSION" if change > args.threshold else ""
+            line += f" {baseline[name]:10.2f} {change:+7.1%}{flag}"
+            if flag:
+                regressions.append(name)
+        print(line)
+    
+    record = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "revision": git_revision(),
+        "python": sys.version.split()[0],
+        "results": results,
+    }
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(record, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+    if args.history:
+        with open(args.history, "a") as f:
+            f.write(json.dumps(record) + "\n")
+    
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""
+Import-time budget for the bot's entry point.
+
+Imports the bot and its cogs in a fresh interpreter with `python -X importtime`
+and fails (exit status 1) when the total takes longer than the budget or when
+a module that the bot should only load on first use shows up: the AI provider
+SDKs are imported when a provider is first called, and the Flask dashboard is
+never imported by the bot at all. Every run can also be appended to a JSON
+Lines history file so trends can be tracked over time.
+
+Usage:
+    python tools/check_import_time.py                    # run and print
+    python tools/check_import_time.py --budget 800       # fail above 800ms
+    python tools/check_import_time.py --history import_history.jsonl
+
+Timings are machine-specific; set the budget on the machine that runs the check.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# What the bot process imports before it connects to Discord
+ENTRY_IMPORTS = "import bot; import cogs.general_commands; import cogs.ai_commands"
+
+# Modules the bot must not import at startup
+FORBIDDEN = ("app", "openai", "google.generativeai")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=1000,
+                        help="Allowed total import time in milliseconds (default: 1000)")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest modules to list (default: 15)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs; the fastest is kept (default: 3)")
+    parser.add_argument("--history", help="Append this run's results to a JSON Lines file")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    return parser.parse_args()
+
+def measure():
+    """
+    Import the entry point in a fresh interpreter.
+    
+    Returns:
+        Dict: Module name -> cumulative import time in milliseconds, for every
+        module imported
+    """
+    env = dict(os.environ)
+    env.update({
+        "AI_PROVIDER": "mock",
+        "SESSION_SECRET": "import-time",
+        "DATABASE_URL": "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="importtime-"), "import.db"),
+    })
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", ENTRY_IMPORTS],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing the entry point failed:\n{result.stderr[-2000:]}")
+    
+    # Lines look like "import time:  self [us] | cumulative | imported package"
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(cumulative) / 1000
+    return modules
+
+def total_time(modules):
+    """Sum the cumulative times of the top-level imports of the entry point."""
+    return sum(modules[name] for name in ("bot", "cogs.general_commands", "cogs.ai_commands") if name in modules)
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+def main():
+    args = parse_args()
+    
+    try:
+        runs = [measure() for _ in range(max(1, args.repeat))]
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 2
+    modules = min(runs, key=total_time)
+    total = total_time(modules)
+    forbidden = [name for name in FORBIDDEN if name in modules]
+    slowest = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:args.top]
+    
+    record = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "revision": git_revision(),
+        "python": sys.version.split()[0],
+        "total_ms": round(total, 1),
+        "budget_ms": args.budget,
+        "forbidden": forbidden,
+        "slowest": {name: round(ms, 1) for name, ms in slowest},
+    }
+    if args.json:
+        print(json.dumps(record, indent=2))
+    else:
+        print(f"{'module':48} {'cumulative ms':>14}")
+        for name, ms in slowest:
+            print(f"{name:48} {ms:14.1f}")
+        print(f"\nEntry point imports in {total:.1f}ms (budget {args.budget:.0f}ms)")
+    if args.history:
+        with open(args.history, "a") as f:
+            f.write(json.dumps(record) + "\n")
+    
+    failed = False
+    if forbidden:
+        print(f"Imported at startup but should be deferred: {', '.join(forbidden)}", file=sys.stderr)
+        failed = True
+    if total > args.budget:
+        print(f"Import time {total:.1f}ms is over the {args.budget:.0f}ms budget", file=sys.stderr)
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+"""
+Offline load test for the bot's AI message path.
+
+Drives AICommands._process_ai_response with synthetic Discord messages at a
+target rate against the mock AI provider and a throwaway SQLite database, then
+reports throughput, end-to-end latency, event-loop lag and database write rate.
+No Discord connection or API keys are needed.
+
+Usage:
+    python tools/loadtest.py --rate 50 --duration 30 --latency 0.8
+    python tools/loadtest.py --rate 200 --stream --error-rate 0.05 --json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=20.0, help="Messages per second (default: 20)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to send messages for (default: 10)")
+    parser.add_argument("--guilds", type=int, default=10, help="Number of synthetic guilds (default: 10)")
+    parser.add_argument("--channels", type=int, default=5, help="Channels per guild (default: 5)")
+    parser.add_argument("--users", type=int, default=200, help="Number of synthetic users (default: 200)")
+    parser.add_argument("--latency", type=float, default=0.8, help="Mock provider latency in seconds (default: 0.8)")
+    parser.add_argument("--distribution", default="lognormal",
+                        choices=("fixed", "uniform", "exponential", "lognormal"),
+                        help="Mock provider latency distribution (default: lognormal)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of mock calls that fail (default: 0)")
+    parser.add_argument("--stream", action="store_true", help="Stream responses instead of sending them whole")
+    parser.add_argument("--rate-limit", action="store_true", help="Keep the admission controller enabled")
+    parser.add_argument("--database-url", help="Database to write to (default: a temporary SQLite file)")
+    parser.add_argument("--seed", type=int, default=1234, help="Mock provider seed (default: 1234)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    return parser.parse_args()
+
+def configure_environment(args):
+    """Point the bot at the mock provider and a scratch database before it is imported."""
+    os.environ["AI_PROVIDER"] = "mock"
+    os.environ["MOCK_AI_LATENCY"] = str(args.latency)
+    os.environ["MOCK_AI_LATENCY_DISTRIBUTION"] = args.distribution
+    os.environ["MOCK_AI_ERROR_RATE"] = str(args.error_rate)
+    os.environ["MOCK_AI_SEED"] = str(args.seed)
+    os.environ["AI_STREAMING"] = "true" if args.stream else "false"
+    os.environ["AI_STREAM_EDIT_INTERVAL"] = os.environ.get("AI_STREAM_EDIT_INTERVAL", "0.2")
+    if not args.rate_limit:
+        os.environ["RATE_LIMIT_ENABLED"] = "false"
+    os.environ.setdefault("SESSION_SECRET", "loadtest")
+    os.environ["DATABASE_URL"] = args.database_url or "sqlite:///" + os.path.join(
+        tempfile.mkdtemp(prefix="loadtest-"), "loadtest.db"
+    )
+    sys.path.insert(0, ROOT)
+
+class FakeMessage:
+    """A sent Discord message that can be edited."""
+    
+    def __init__(self, content=None):
+        self.content = content
+    
+    async def edit(self, content=None, **kwargs):
+        self.content = content
+
+class FakeTyping:
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc):
+        return False
+
+class FakeChannel:
+    """A text channel that records what the bot sends."""
+    
+    def __init__(self, channel_id):
+        self.id = channel_id
+        self.sent = []
+    
+    async def send(self, content=None, **kwargs):
+        message = FakeMessage(content)
+        self.sent.append(message)
+        return message
+    
+    def typing(self):
+        return FakeTyping()
+
+def percentile(values, q):
+    """Get a percentile of a list of numbers (0 without values)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+async def measure_loop_lag(samples, stop, interval=0.05):
+    """Record how late the event loop wakes up from a fixed sleep."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - start - interval))
+
+async def run(args):
+    from app import app, db, migrate
+    from models import Server, User
+    from cogs.ai_commands import AICommands
+    
+    # Create the tables and seed the owner and guild records the bot expects
+    migrate()
+    with app.app_context():
+        if db.session.get(User, 1) is None:
+            db.session.add(User(id=1, username="loadtest", email="loadtest@example.com", password_hash="-"))
+            db.session.commit()
+        for guild in range(args.guilds):
+            if not Server.query.filter_by(discord_server_id=str(guild + 1)).first():
+                db.session.add(Server(discord_server_id=str(guild + 1), name=f"Guild {guild + 1}", user_id=1))
+        db.session.commit()
+    
+    bot = SimpleNamespace(user=SimpleNamespace(id=999, name="LoadTestBot"))
+    cog = AICommands(bot)
+    await cog.cog_load()
+    
+    guilds = [SimpleNamespace(id=guild + 1, name=f"Guild {guild + 1}") for guild in range(args.guilds)]
+    channels = [FakeChannel(10_000 + index) for index in range(args.guilds * args.channels)]
+    authors = [SimpleNamespace(id=100_000 + index, name=f"user{index}", bot=False) for index in range(args.users)]
+    
+    latencies = []
+    lag = []
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(lag, stop))
+    
+    async def handle(index):
+        channel_index = index % len(channels)
+        message = SimpleNamespace(
+            id=index,
+            author=authors[index % len(authors)],
+            guild=guilds[channel_index // args.channels],
+            channel=channels[channel_index],
+            content=f"Question {index % 500}: how does feature {index % 37} work?",
+        )
+        start = time.perf_counter()
+        await cog._process_ai_response(message, message.content)
+        latencies.append(time.perf_counter() - start)
+    
+    # Open-loop arrivals: messages are sent on schedule whether or not earlier ones finished
+    tasks = []
+    total = int(args.rate * args.duration)
+    started = time.perf_counter()
+    for index in range(total):
+        delay = started + index / args.rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(handle(index)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    
+    flush_started = time.perf_counter()
+    await cog.cog_unload()
+    flush_elapsed = time.perf_counter() - flush_started
+    stop.set()
+    await lag_task
+    
+    sent = [message.content or "" for channel in channels for message in channel.sent]
+    errors = sum(1 for content in sent if content.startswith("Sorry, I encountered an error"))
+    rejected = sum(1 for content in sent if content.startswith("I'm getting a lot of requests"))
+    writer = cog.conversation_writer.stats()
+    
+    from utils.metrics import REGISTRY
+    stage_seconds = REGISTRY.get("stage_seconds")
+    stages = {}
+    for stage in ("admission", "server_lookup", "history", "generate", "generate_stream", "db_enqueue", "send"):
+        if stage_seconds.count(stage=stage):
+            stages[stage] = stage_seconds.quantile(0.95, stage=stage)
+    
+    return {
+        "messages": total,
+        "completed": len(latencies),
+        "errors": errors,
+        "rate_limited": rejected,
+        "elapsed": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_p50": percentile(latencies, 0.50),
+        "latency_p99": percentile(latencies, 0.99),
+        "latency_max": max(latencies, default=0.0),
+        "loop_lag_p50": percentile(lag, 0.50),
+        "loop_lag_p99": percentile(lag, 0.99),
+        "loop_lag_max": max(lag, default=0.0),
+        "rows_written": writer["rows_written"],
+        "rows_failed": writer["rows_failed"],
+        "db_write_rate": writer["rows_written"] / (elapsed + flush_elapsed),
+        "db_flushes": writer["flushes"],
+        "db_max_flush_latency": writer["max_flush_latency"],
+        "stage_p95": stages,
+    }
+
+def print_report(report):
+    print(f"Messages:        {report['messages']} sent, {report['completed']} completed, "
+          f"{report['errors']} errors, {report['rate_limited']} rate limited")
+    print(f"Throughput:      {report['throughput']:.1f} msg/s over {report['elapsed']:.1f}s")
+    print(f"Latency:         p50 {report['latency_p50'] * 1000:.0f}ms, p99 {report['latency_p99'] * 1000:.0f}ms, "
+          f"max {report['latency_max'] * 1000:.0f}ms")
+    print(f"Event-loop lag:  p50 {report['loop_lag_p50'] * 1000:.1f}ms, p99 {report['loop_lag_p99'] * 1000:.1f}ms, "
+          f"max {report['loop_lag_max'] * 1000:.1f}ms")
+    print(f"Database writes: {report['rows_written']} rows ({report['rows_failed']} failed), "
+          f"{report['db_write_rate']:.1f} rows/s in {report['db_flushes']} flushes, "
+          f"max flush {report['db_max_flush_latency'] * 1000:.0f}ms")
+    stages = ", ".join(f"{stage} {seconds * 1000:.1f}ms" for stage, seconds in report["stage_p95"].items())
+    print(f"Stage p95:       {stages}")
+
+def main():
+    args = parse_args()
+    configure_environment(args)
+    # The async SQLite driver logs every operation at DEBUG
+    logging.getLogger("aiosqlite").setLevel(logging.WARNING)
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+"""
+Async provider interface for AI chat responses.
+
+Each provider is a helper module (e.g. utils.google_ai_helper) exposing the
+same set of functions. Calls made through this module run natively on the
+event loop and are bounded per provider, so a burst of requests waits on a
+semaphore instead of tying up OS threads. With the provider set to "auto",
+calls are spread across providers by utils.provider_router.
+"""
+import asyncio
+import importlib
+import logging
+import time
+from contextlib import asynccontextmanager
+from types import ModuleType
+from typing import AsyncIterator, Dict, List, Optional
+
+from utils.config import Config
+from utils.metrics import REGISTRY
+from utils.model_registry import format_reply_address
+from utils.provider_router import ProviderRouter
+from utils.response_cache import make_cache_key, response_cache
+from utils.singleflight import SingleFlight
+
+logger = logging.getLogger("discord_bot")
+
+# Provider name -> helper module implementing the provider interface
+PROVIDERS = {
+    "google": "utils.google_ai_helper",
+    "openai": "utils.openai_helper",
+    "mock": "utils.mock_ai_helper",
+}
+
+# Provider name that routes each call to the best available provider
+AUTO = "auto"
+
+# Providers routed between when AI_ROUTER_PROVIDERS names none that exist;
+# the mock provider is never routed to unless asked for
+ROUTED_PROVIDERS = ("google", "openai")
+
+_semaphores: Dict[str, asyncio.Semaphore] = {}
+_router: Optional[ProviderRouter] = None
+
+# Upstream calls currently in flight, keyed by request key
+_inflight = SingleFlight()
+
+_queue_seconds = REGISTRY.histogram("ai_provider_queue_seconds", "Time spent waiting for a provider concurrency slot")
+_request_seconds = REGISTRY.histogram("ai_provider_request_seconds", "Provider call latency, by operation")
+_errors = REGISTRY.counter("ai_provider_errors_total", "Failed provider calls, by operation and error type")
+_tokens = REGISTRY.counter("ai_provider_tokens_total", "Estimated tokens sent to and received from each provider")
+_in_flight = REGISTRY.gauge("ai_provider_in_flight", "Provider calls currently holding a concurrency slot")
+
+def get_provider(name: Optional[str] = None) -> ModuleType:
+    """
+    Get the helper module for an AI provider.
+    
+    Args:
+        name: The provider name (defaults to the configured provider)
+    
+    Returns:
+        ModuleType: The provider helper module
+    """
+    name = name or Config.get_ai_provider()
+    if name == AUTO:
+        # The best-ranked provider right now
+        name = get_router().rank()[0]
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown AI provider: {name}")
+    return importlib.import_module(PROVIDERS[name])
+
+def get_router() -> ProviderRouter:
+    """
+    Get the router used when the provider is "auto", creating it on first use.
+    
+    Returns:
+        ProviderRouter: The shared router
+    """
+    global _router
+    if _router is None:
+        providers = [name for name in Config.get_ai_router_providers() if name in PROVIDERS]
+        if not providers:
+            logger.warning(f"AI_ROUTER_PROVIDERS names no known provider; routing between {', '.join(ROUTED_PROVIDERS)}")
+            providers = list(ROUTED_PROVIDERS)
+        _router = ProviderRouter(
+            providers,
+            cost_weights=Config.get_ai_router_cost_weights(),
+            hedge=Config.is_ai_hedging_enabled(),
+            hedge_percentile=Config.get_ai_hedge_percentile(),
+            hedge_min_delay=Config.get_ai_hedge_min_delay()
+        )
+    return _router
+
+def resolve_provider(provider: Optional[str] = None) -> str:
+    """
+    Get the provider a request will be sent to.
+    
+    With the provider set to "auto" this is the router's best-ranked
+    provider, which is tried first; failover and hedging may still involve
+    others.
+    
+    Args:
+        provider: The provider name (defaults to the configured provider)
+    
+    Returns:
+        str: The provider name
+    """
+    name = provider or Config.get_ai_provider()
+    return get_router().rank()[0] if name == AUTO else name
+
+def _get_semaphore(name: str) -> asyncio.Semaphore:
+    """
+    Get the concurrency limiter for a provider, creating it on first use.
+    
+    Args:
+        name: The provider name
+    
+    Returns:
+        asyncio.Semaphore: The provider's semaphore
+    """
+    semaphore = _semaphores.get(name)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(Config.get_ai_max_concurrency())
+        _semaphores[name] = semaphore
+    return semaphore
+
+@asynccontextmanager
+async def _provider_slot(name: str, operation: str) -> AsyncIterator[None]:
+    """
+    Hold a provider's concurrency slot, recording queueing, latency and errors.
+    
+    Args:
+        name: The provider name
+        operation: What the call does, e.g. "generate" or "summarize"
+    """
+    queued = time.perf_counter()
+    async with _get_semaphore(name):
+        start = time.perf_counter()
+        _queue_seconds.observe(start - queued, provider=name)
+        try:
+            with _in_flight.track(provider=name):
+                yield
+        except Exception as e:
+            _errors.inc(provider=name, operation=operation, error=type(e).__name__)
+            raise
+        finally:
+            _request_seconds.observe(time.perf_counter() - start, provider=name, operation=operation)
+
+def _count_tokens(name: str, prompt: str, history: Optional[List[Dict[str, str]]], response: str):
+    """Add a call's estimated prompt and response tokens to the provider's counters."""
+    from utils.conversation_history import estimate_tokens
+    sent = estimate_tokens(prompt) + sum(estimate_tokens(message["content"]) for message in history or [])
+    _tokens.inc(sent, provider=name, direction="input")
+    _tokens.inc(estimate_tokens(response), provider=name, direction="output")
+
+def _model_name(name: str) -> str:
+    """
+    Get the model a provider name answers with, for the request key.
+    
+    Args:
+        name: The provider name, or "auto"
+        
+    Returns:
+        str: The model name, or every routed model for "auto"
+    """
+    if name == AUTO:
+        return ",".join(f"{provider}:{_model_name(provider)}" for provider in get_router().providers)
+    return get_provider(name).get_model_name()
+
+def _request_key(prompt: str, name: str) -> str:
+    """
+    Build the key identifying interchangeable requests, used by the response
+    cache and by request coalescing.
+    
+    Only requests without conversation history are interchangeable, and
+    their replies are generated without a user's name.
+    
+    Args:
+        prompt: The user's message
+        name: The provider name, or "auto"
+    
+    Returns:
+        str: The request key
+    """
+    return make_cache_key(prompt, name, _model_name(name), Config.get_bot_name())
+
+async def _generate_with(name: str, prompt: str, user_name: str,
+                         history: Optional[List[Dict[str, str]]]) -> str:
+    """Generate a response from one provider within its concurrency limit."""
+    helper = get_provider(name)
+    async with _provider_slot(name, "generate"):
+        response = await helper.generate_ai_response_async(prompt, user_name, history)
+    _count_tokens(name, prompt, history, response)
+    return response
+
+async def _call_provider(name: str, prompt: str, user_name: Optional[str],
+                         history: Optional[List[Dict[str, str]]]) -> str:
+    """Generate a response from a provider, or from the routed providers for "auto"."""
+    if name == AUTO:
+        return await get_router().call(lambda routed: _generate_with(routed, prompt, user_name, history))
+    return await _generate_with(name, prompt, user_name, history)
+
+async def generate_response(prompt: str, user_name: str = "User", provider: Optional[str] = None,
+                            use_cache: bool = False, history: Optional[List[Dict[str, str]]] = None) -> str:
+    """
+    Generate an AI response without blocking the event loop.
+    
+    Args:
+        prompt: The user's message
+        user_name: The user's name for personalization
+        provider: The provider name (defaults to the configured provider)
+        use_cache: Whether to answer from and store into the response cache
+        history: Earlier chat messages with 'role' and 'content' keys, oldest first
+    
+    Returns:
+        str: The AI-generated response
+    """
+    name = provider or Config.get_ai_provider()
+    
+    # Requests without channel history are interchangeable between users: they
+    # are answered without a user's name, which is put in front of each user's
+    # copy, so they can share a cached reply or one in-flight upstream call
+    coalesce = Config.is_request_coalescing_enabled()
+    if history or not (use_cache or coalesce):
+        return await _call_provider(name, prompt, user_name, history)
+    
+    key = _request_key(prompt, name)
+    if use_cache:
+        cached = await response_cache.get(key)
+        if cached is not None:
+            logger.debug("Response cache hit for prompt: %.50s...", prompt)
+            return format_reply_address(user_name) + cached
+    
+    if coalesce:
+        response = await _inflight.do(key, lambda: _call_provider(name, prompt, None, None))
+    else:
+        response = await _call_provider(name, prompt, None, None)
+    
+    if use_cache:
+        await response_cache.set(key, response)
+    return format_reply_address(user_name) + response
+
+async def stream_response(prompt: str, user_name: str = "User", provider: Optional[str] = None,
+                          use_cache: bool = False,
+                          history: Optional[List[Dict[str, str]]] = None) -> AsyncIterator[str]:
+    """
+    Stream an AI response piece by piece as the provider generates it.
+    
+    The provider's concurrency slot is held until the stream is exhausted
+    or closed. With the provider set to "auto" the best-ranked provider is
+    used; streams are not hedged, since text already posted cannot be
+    taken back.
+    
+    Args:
+        prompt: The user's message
+        user_name: The user's name for personalization
+        provider: The provider name (defaults to the configured provider)
+        use_cache: Whether to answer from and store into the response cache
+        history: Earlier chat messages with 'role' and 'content' keys, oldest first
+        
+    Yields:
+        str: Successive pieces of the AI-generated response
+    """
+    requested = provider or Config.get_ai_provider()
+    name = resolve_provider(requested)
+    helper = get_provider(name)
+    
+    # As in generate_response, only requests without history are cached, and
+    # their reply is generated without the user's name
+    use_cache = use_cache and not history
+    if use_cache:
+        key = _request_key(prompt, requested)
+        cached = await response_cache.get(key)
+        if cached is not None:
+            logger.debug("Response cache hit for prompt: %.50s...", prompt)
+            yield format_reply_address(user_name) + cached
+            return
+        yield format_reply_address(user_name)
+    
+    pieces = []
+    async with _provider_slot(name, "stream"):
+        try:
+            async for piece in helper.stream_ai_response(prompt, None if use_cache else user_name, history):
+                if not pieces and requested == AUTO:
+                    get_router().record_outcome(name, True)
+                pieces.append(piece)
+                yield piece
+        except Exception:
+            if requested == AUTO:
+                get_router().record_outcome(name, False)
+            raise
+    
+    if use_cache and pieces:
+        await response_cache.set(key, "".join(pieces))
+
+async def summarize_conversation(messages: List[Dict[str, str]], provider: Optional[str] = None) -> str:
+    """
+    Summarize a conversation without blocking the event loop.
+    
+    Args:
+        messages: List of message dictionaries with 'role' and 'content' keys
+        provider: The provider name (defaults to the configured provider)
+        
+    Returns:
+        str: The summary of the conversation
+    """
+    name = provider or Config.get_ai_provider()
+    
+    async def summarize_with(routed: str) -> str:
+        async with _provider_slot(routed, "summarize"):
+            return await get_provider(routed).summarize_conversation_async(messages)
+    
+    if name == AUTO:
+        # Summaries run in the background, so they fail over but are never hedged
+        return await get_router().call(summarize_with, hedge=False)
+    return await summarize_with(name)
+
+async def generate_image(prompt: str, provider: Optional[str] = None) -> Dict[str, str]:
+    """
+    Generate an image without blocking the event loop.
+    
+    With the provider set to "auto", providers are tried in ranking order
+    until one can generate images.
+    
+    Args:
+        prompt: The image generation prompt
+        provider: The provider name (defaults to the configured provider)
+        
+    Returns:
+        Dict: A dictionary with the image "url", or an "error" message
+    """
+    name = provider or Config.get_ai_provider()
+    names = get_router().rank() if name == AUTO else [name]
+    
+    result = {}
+    for routed in names:
+        try:
+            # Image helpers block, so this latency includes waiting for a worker thread
+            with _request_seconds.time(provider=routed, operation="image"):
+                result = await asyncio.to_thread(get_provider(routed).generate_image, prompt)
+        except Exception as e:
+            _errors.inc(provider=routed, operation="image", error=type(e).__name__)
+            if routed == names[-1]:
+                raise
+            logger.warning(f"Image generation with {routed} failed: {e}")
+            continue
+        if result and "url" in result:
+            break
+    return result
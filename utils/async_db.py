@@ -0,0 +1,123 @@
+"""
+Async database engine for the bot process.
+
+The dashboard uses Flask-SQLAlchemy's synchronous session; the bot talks to
+the same database through its own SQLAlchemy asyncio engine (asyncpg for
+PostgreSQL, aiosqlite for SQLite) so queries never block the gateway loop or
+need a Flask application context. Its pool is sized for the bot's background
+workers and is configured separately from the dashboard's.
+"""
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+
+from utils.config import Config
+
+logger = logging.getLogger("discord_bot")
+
+_engine: Optional[AsyncEngine] = None
+_sessionmaker: Optional[async_sessionmaker] = None
+
+def async_database_url(database_url: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    Convert a synchronous database URL to its async driver equivalent.
+    
+    Args:
+        database_url: The DATABASE_URL used by the dashboard
+    
+    Returns:
+        Tuple: The async URL and the driver's connect arguments
+    """
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    connect_args: Dict[str, Any] = {}
+    
+    if backend in ("postgres", "postgresql"):
+        query = dict(url.query)
+        # asyncpg takes the libpq sslmode as its ssl argument
+        sslmode = query.pop("sslmode", None)
+        if sslmode:
+            connect_args["ssl"] = sslmode
+        
+        cache_size = Config.get_bot_db_statement_cache_size()
+        query["prepared_statement_cache_size"] = str(cache_size)
+        connect_args["statement_cache_size"] = cache_size
+        url = url.set(drivername="postgresql+asyncpg", query=query)
+    elif backend == "sqlite":
+        url = url.set(drivername="sqlite+aiosqlite")
+    
+    return url.render_as_string(hide_password=False), connect_args
+
+def get_engine() -> AsyncEngine:
+    """
+    Get the bot's async engine, creating it on first use.
+    
+    Returns:
+        AsyncEngine: The engine
+    
+    Raises:
+        RuntimeError: If DATABASE_URL is not set
+    """
+    global _engine, _sessionmaker
+    if _engine is None:
+        database_url = Config.get_database_url()
+        if not database_url:
+            raise RuntimeError("DATABASE_URL is not set")
+        
+        url, connect_args = async_database_url(database_url)
+        options: Dict[str, Any] = {"pool_pre_ping": True, "pool_recycle": 300, "connect_args": connect_args}
+        if url.startswith("postgresql"):
+            options.update({
+                "pool_size": Config.get_bot_db_pool_size(),
+                "max_overflow": Config.get_bot_db_max_overflow(),
+                "pool_timeout": Config.get_bot_db_pool_timeout(),
+            })
+        
+        _engine = create_async_engine(url, **options)
+        _sessionmaker = async_sessionmaker(_engine, expire_on_commit=False)
+        logger.info(f"Created async database engine ({_engine.dialect.name})")
+    return _engine
+
+@asynccontextmanager
+async def session_scope() -> AsyncIterator[AsyncSession]:
+    """
+    Open a session that commits on success and rolls back on error.
+    
+    Yields:
+        AsyncSession: The session
+    """
+    get_engine()
+    async with _sessionmaker() as session:
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+
+def pool_stats() -> Dict[str, Any]:
+    """
+    Get the connection pool's state.
+    
+    Returns:
+        Dict: Pool size, checked-out connections and overflow, or an empty dict before first use
+    """
+    if _engine is None:
+        return {}
+    pool = _engine.pool
+    stats = {"status": pool.status()}
+    for name in ("size", "checkedout", "overflow"):
+        if hasattr(pool, name):
+            stats[name] = getattr(pool, name)()
+    return stats
+
+async def dispose():
+    """Close every pooled connection; the engine is recreated on next use."""
+    global _engine, _sessionmaker
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = None
+        _sessionmaker = None
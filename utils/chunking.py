@@ -0,0 +1,202 @@
+"""
+Splitting of long responses into as few Discord messages as possible.
+
+Responses are cut at paragraph, line, sentence or word boundaries, in that
+order of preference, and a fenced code block that spans a cut is closed at
+the end of one chunk and reopened (with its language tag) at the start of
+the next. Long responses can also be sent as embeds, whose descriptions
+hold 4096 characters, or as a file attachment, so they need fewer REST calls.
+"""
+import io
+import re
+from typing import List, Optional, Tuple
+
+import discord
+
+# Discord's maximum message length
+MESSAGE_LIMIT = 2000
+
+# Discord's maximum embed description length, and total embed text per message
+EMBED_LIMIT = 4096
+EMBED_TOTAL_LIMIT = 6000
+
+# Discord allows at most this many embeds per message
+MAX_EMBEDS = 10
+
+# A response posted as an attachment is previewed in a message of this length
+ATTACHMENT_PREVIEW = 1500
+
+_FENCE = "```"
+_CLOSE_FENCE = "\n" + _FENCE
+
+# The fence marker and language tag that reopen a code block; anything else
+# on the opening line is not repeated, so reopening stays short
+_FENCE_OPENING = re.compile(r"```[\w+#.-]{0,32}(?![\w+#.-])")
+
+# Sentence ends followed by whitespace
+_SENTENCE_END = re.compile(r"[.!?][)\"']?\s")
+
+def _fence_after(chunk: str, fence: Optional[str]) -> Optional[str]:
+    """
+    Track fenced code blocks through a chunk.
+    
+    Args:
+        chunk: The chunk's text
+        fence: The opening fence line still open at the start of the chunk
+    
+    Returns:
+        str: The fence marker and language tag of the code block still open
+        at the end of the chunk, or None
+    """
+    if _FENCE not in chunk:
+        return fence
+    for line in chunk.split("\n"):
+        stripped = line.strip()
+        if stripped.startswith(_FENCE):
+            if fence is not None:
+                fence = None
+            else:
+                match = _FENCE_OPENING.match(stripped)
+                fence = match.group(0) if match else _FENCE
+    return fence
+
+def _find_cut(text: str, limit: int) -> int:
+    """
+    Find where to cut text so the head fits in limit characters.
+    
+    Cuts are only taken from the second half of the window so chunks stay
+    reasonably full; without a usable boundary the text is cut at the limit.
+    
+    Args:
+        text: The text to cut, longer than limit
+        limit: The maximum length of the head
+    
+    Returns:
+        int: The index to cut at
+    """
+    window = text[:limit]
+    floor = limit // 2
+    
+    cut = window.rfind("\n\n")
+    if cut > floor:
+        return cut
+    cut = window.rfind("\n")
+    if cut > floor:
+        return cut
+    
+    best = -1
+    for match in _SENTENCE_END.finditer(window, floor):
+        best = match.end() - 1
+    if best > floor:
+        return best
+    
+    cut = window.rfind(" ")
+    if cut > floor:
+        return cut
+    return limit
+
+def take_chunk(text: str, limit: int = MESSAGE_LIMIT) -> Tuple[str, str]:
+    """
+    Split the first chunk off text, keeping code blocks intact.
+    
+    Args:
+        text: The text to split
+        limit: The maximum chunk length
+    
+    Returns:
+        Tuple: The first chunk and the remaining text, which reopens any
+        code block the chunk had to close
+    """
+    if len(text) <= limit:
+        return text, ""
+    
+    # Leave room to close a code block at the end of the chunk
+    cut = _find_cut(text, limit - len(_CLOSE_FENCE))
+    head = text[:cut].rstrip()
+    rest = text[cut:].lstrip("\n")
+    if not head:
+        head, rest = text[:limit - len(_CLOSE_FENCE)], text[limit - len(_CLOSE_FENCE):]
+    
+    fence = _fence_after(head, None)
+    if fence is not None:
+        head += _CLOSE_FENCE
+        rest = fence + "\n" + rest
+    elif rest.startswith(" "):
+        rest = rest.lstrip(" ")
+    
+    # Every call must consume text, or callers looping until the text fits never finish
+    if len(rest) >= len(text):
+        return text[:limit], text[limit:]
+    return head, rest
+
+def split_message(text: str, limit: int = MESSAGE_LIMIT) -> List[str]:
+    """
+    Split text into chunks no longer than Discord's message limit.
+    
+    Args:
+        text: The text to split
+        limit: The maximum chunk length
+    
+    Returns:
+        List: The chunks, in order
+    """
+    if len(text) <= limit:
+        return [text]
+    
+    chunks = []
+    while text:
+        chunk, text = take_chunk(text, limit)
+        if chunk.strip():
+            chunks.append(chunk)
+    return chunks
+
+def _pack_embeds(text: str) -> List[List[discord.Embed]]:
+    """
+    Split text into embed descriptions and group them into messages.
+    
+    Args:
+        text: The text to send
+    
+    Returns:
+        List: The embeds for each message, in order
+    """
+    messages: List[List[discord.Embed]] = []
+    current: List[discord.Embed] = []
+    size = 0
+    for chunk in split_message(text, EMBED_LIMIT):
+        if current and (size + len(chunk) > EMBED_TOTAL_LIMIT or len(current) >= MAX_EMBEDS):
+            messages.append(current)
+            current, size = [], 0
+        current.append(discord.Embed(description=chunk, color=discord.Color.blue()))
+        size += len(chunk)
+    if current:
+        messages.append(current)
+    return messages
+
+async def send_long_message(channel, text: str, mode: str = "messages",
+                            attachment_threshold: int = 0) -> List[discord.Message]:
+    """
+    Send a response with as few messages as possible.
+    
+    Args:
+        channel: The channel to send to
+        text: The response text
+        mode: "messages" to split into plain messages or "embed" to split into embeds
+        attachment_threshold: Responses longer than this are sent as a
+            preview plus a file attachment (0 never attaches)
+    
+    Returns:
+        List: The messages that were sent
+    """
+    if len(text) <= MESSAGE_LIMIT:
+        return [await channel.send(text)]
+    
+    if attachment_threshold and len(text) > attachment_threshold:
+        preview, _ = take_chunk(text, ATTACHMENT_PREVIEW)
+        file = discord.File(io.BytesIO(text.encode("utf-8")), filename="response.md")
+        return [await channel.send(f"{preview}\n\n*The full response is attached.*", file=file)]
+    
+    if mode == "embed":
+        return [await channel.send(embeds=embeds) for embeds in _pack_embeds(text)]
+    
+    return [await channel.send(chunk) for chunk in split_message(text)]
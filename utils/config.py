@@ -3,7 +3,7 @@ Configuration management for the Discord bot.
 """
 import os
 import logging
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 
 logger = logging.getLogger("discord_bot")
 
@@ -14,6 +14,119 @@ class Config:
     _DEFAULT_PREFIX = "!"
     _DEFAULT_BOT_NAME = "AI Assistant"
     _DEFAULT_CLIENT_ID = None
+    _DEFAULT_LOG_FORMAT = "text"
+    _DEFAULT_LOG_DEBUG_SAMPLE_EVERY = 1
+    _DEFAULT_WEB_SERVER = "gunicorn"
+    _DEFAULT_WEB_PORT = 5000
+    _DEFAULT_WEB_WORKERS = 4
+    _DEFAULT_MAX_MESSAGES = 100
+    _DEFAULT_SHARD_PROCESSES = 1
+    _DEFAULT_SHARD_STATUS_INTERVAL = 30.0
+    _DEFAULT_AI_PROVIDER = "google"
+    _DEFAULT_AI_MAX_CONCURRENCY = 32
+    _DEFAULT_STREAM_EDIT_INTERVAL = 1.0
+    _DEFAULT_LONG_RESPONSE_MODE = "messages"
+    _DEFAULT_ATTACHMENT_THRESHOLD = 6000
+    _DEFAULT_GOOGLE_MODEL = "gemini-1.5-flash"
+    # The newest OpenAI model is "gpt-4o" which was released May 13, 2024.
+    # do not change this unless explicitly requested by the user
+    _DEFAULT_OPENAI_MODEL = "gpt-4o"
+    _DEFAULT_RESPONSE_CACHE_TTL = 3600
+    _DEFAULT_RESPONSE_CACHE_SIZE = 1024
+    _DEFAULT_CONVERSATION_QUEUE_SIZE = 1000
+    _DEFAULT_CONVERSATION_BATCH_SIZE = 100
+    _DEFAULT_CONVERSATION_FLUSH_INTERVAL = 2.0
+    _DEFAULT_SERVER_CACHE_REFRESH_INTERVAL = 30.0
+    _DEFAULT_HISTORY_MAX_TURNS = 20
+    _DEFAULT_HISTORY_TOKEN_BUDGET = 1500
+    _DEFAULT_SUMMARY_THRESHOLD_TURNS = 12
+    _DEFAULT_SUMMARY_KEEP_TURNS = 6
+    _DEFAULT_DB_POOL_SIZE = 5
+    _DEFAULT_DB_MAX_OVERFLOW = 10
+    _DEFAULT_BOT_DB_POOL_SIZE = 10
+    _DEFAULT_BOT_DB_MAX_OVERFLOW = 5
+    _DEFAULT_BOT_DB_POOL_TIMEOUT = 10.0
+    _DEFAULT_BOT_DB_STATEMENT_CACHE_SIZE = 256
+    _DEFAULT_METRICS_SNAPSHOT_INTERVAL = 15.0
+    _DEFAULT_METRICS_LOOP_LAG_INTERVAL = 0.5
+    _DEFAULT_METRICS_MAX_GUILDS = 100
+    _DEFAULT_RATE_LIMIT_MODE = "queue"
+    _DEFAULT_RATE_LIMIT_USER_PER_MINUTE = 6.0
+    _DEFAULT_RATE_LIMIT_USER_BURST = 3
+    _DEFAULT_RATE_LIMIT_GUILD_PER_MINUTE = 60.0
+    _DEFAULT_RATE_LIMIT_GUILD_BURST = 20
+    _DEFAULT_RATE_LIMIT_PROVIDER_PER_MINUTE = 300.0
+    _DEFAULT_RATE_LIMIT_PROVIDER_BURST = 50
+    _DEFAULT_RATE_LIMIT_QUEUE_SIZE = 20
+    _DEFAULT_RATE_LIMIT_QUEUE_TIMEOUT = 30.0
+    _DEFAULT_AI_RETRY_ATTEMPTS = 3
+    _DEFAULT_AI_RETRY_BASE_DELAY = 0.5
+    _DEFAULT_AI_RETRY_MAX_DELAY = 8.0
+    _DEFAULT_AI_REQUEST_TIMEOUT = 30.0
+    _DEFAULT_AI_REQUEST_DEADLINE = 60.0
+    _DEFAULT_AI_BREAKER_THRESHOLD = 5
+    _DEFAULT_AI_BREAKER_RESET_TIMEOUT = 30.0
+    _DEFAULT_AI_ROUTER_PROVIDERS = "google,openai"
+    _DEFAULT_AI_HEDGE_PERCENTILE = 95.0
+    _DEFAULT_AI_HEDGE_MIN_DELAY = 0.5
+    _DEFAULT_MOCK_AI_SEED = 1234
+    _DEFAULT_MOCK_AI_LATENCY = 0.8
+    _DEFAULT_MOCK_AI_LATENCY_DISTRIBUTION = "lognormal"
+    _DEFAULT_MOCK_AI_RESPONSE_LENGTH = 400
+    _DEFAULT_MOCK_AI_STREAM_CHUNKS = 8
+    
+    @staticmethod
+    def _get_int(name: str, default: int) -> int:
+        """
+        Read an integer environment variable, falling back to a default if unset or invalid.
+        
+        Args:
+            name: The environment variable name
+            default: The default value
+        
+        Returns:
+            int: The configured value
+        """
+        try:
+            return int(os.environ.get(name, default))
+        except ValueError:
+            logger.warning(f"Invalid {name} value, using default")
+            return default
+    
+    @staticmethod
+    def _get_float(name: str, default: float) -> float:
+        """
+        Read a float environment variable, falling back to a default if unset or invalid.
+        
+        Args:
+            name: The environment variable name
+            default: The default value
+        
+        Returns:
+            float: The configured value
+        """
+        try:
+            return float(os.environ.get(name, default))
+        except ValueError:
+            logger.warning(f"Invalid {name} value, using default")
+            return default
+    
+    @staticmethod
+    def _get_bool(name: str, default: bool) -> bool:
+        """
+        Read a boolean environment variable ('1', 'true' or 'yes' mean True).
+        
+        Args:
+            name: The environment variable name
+            default: The default value
+        
+        Returns:
+            bool: The configured value
+        """
+        value = os.environ.get(name)
+        if value is None:
+            return default
+        return value.lower() in ("1", "true", "yes")
     
     @staticmethod
     def get_discord_token() -> Optional[str]:
@@ -94,6 +207,30 @@ class Config:
         """
         return os.environ.get("LOG_LEVEL", "INFO").upper()
     
+    @staticmethod
+    def get_log_format() -> str:
+        """
+        Get the log output format.
+        
+        Returns:
+            str: "text" or "json" for one JSON object per line (defaults to "text")
+        """
+        log_format = os.environ.get("LOG_FORMAT", Config._DEFAULT_LOG_FORMAT).lower()
+        if log_format not in ("text", "json"):
+            logger.warning("Invalid LOG_FORMAT value, using default")
+            return Config._DEFAULT_LOG_FORMAT
+        return log_format
+    
+    @staticmethod
+    def get_log_debug_sample_every() -> int:
+        """
+        Get the sampling of DEBUG log lines: one in every N from each call site is kept.
+        
+        Returns:
+            int: N, where 1 keeps every line (defaults to 1)
+        """
+        return max(1, Config._get_int("LOG_DEBUG_SAMPLE_EVERY", Config._DEFAULT_LOG_DEBUG_SAMPLE_EVERY))
+    
     @staticmethod
     def is_production() -> bool:
         """
@@ -103,7 +240,7 @@ class Config:
             bool: True if in production mode, False otherwise
         """
         return os.environ.get("ENVIRONMENT", "development").lower() == "production"
-        
+    
     @staticmethod
     def get_client_id() -> Optional[str]:
         """
@@ -116,3 +253,778 @@ class Config:
         if not client_id:
             logger.warning("DISCORD_CLIENT_ID not found in environment variables")
         return client_id
+    
+    @staticmethod
+    def get_web_server() -> str:
+        """
+        Get which server main.py runs the web dashboard with.
+        
+        Returns:
+            str: "gunicorn" (the default) or "flask" for Flask's development server
+        """
+        server = os.environ.get("WEB_SERVER", Config._DEFAULT_WEB_SERVER).lower()
+        if server not in ("gunicorn", "flask"):
+            logger.warning("Invalid WEB_SERVER value, using default")
+            return Config._DEFAULT_WEB_SERVER
+        return server
+    
+    @staticmethod
+    def get_web_port() -> int:
+        """
+        Get the port the web dashboard listens on.
+        
+        Returns:
+            int: The port (defaults to 5000)
+        """
+        return Config._get_int("PORT", Config._DEFAULT_WEB_PORT)
+    
+    @staticmethod
+    def get_web_workers() -> int:
+        """
+        Get the number of gunicorn worker processes serving the web dashboard.
+        
+        Returns:
+            int: The number of workers (defaults to 4)
+        """
+        return max(1, Config._get_int("WEB_WORKERS", Config._DEFAULT_WEB_WORKERS))
+    
+    @staticmethod
+    def is_members_intent_enabled() -> bool:
+        """
+        Check if the bot should request the privileged members intent and cache guild members.
+        
+        Returns:
+            bool: True if the members intent is enabled, False otherwise
+        """
+        return Config._get_bool("BOT_MEMBERS_INTENT", False)
+    
+    @staticmethod
+    def is_guild_chunking_enabled() -> bool:
+        """
+        Check if every guild's full member list should be downloaded at startup (needs the members intent).
+        
+        Returns:
+            bool: True if guilds are chunked at startup, False otherwise
+        """
+        return Config._get_bool("BOT_CHUNK_GUILDS", False)
+    
+    @staticmethod
+    def get_max_messages() -> Optional[int]:
+        """
+        Get the number of recent messages discord.py keeps in its message cache.
+        
+        Returns:
+            int: The cache size (defaults to 100), or None if BOT_MAX_MESSAGES is 0 to disable the cache
+        """
+        count = max(0, Config._get_int("BOT_MAX_MESSAGES", Config._DEFAULT_MAX_MESSAGES))
+        return count or None
+    
+    @staticmethod
+    def is_sharding_enabled() -> bool:
+        """
+        Check if the bot should run as an AutoShardedBot.
+        
+        Returns:
+            bool: True if sharding is enabled, False otherwise
+        """
+        return Config._get_bool("BOT_SHARDING", False)
+    
+    @staticmethod
+    def get_shard_count() -> Optional[int]:
+        """
+        Get the total number of shards across all processes and hosts.
+        
+        Returns:
+            int: The shard count, or None to use the count Discord recommends
+        """
+        count = Config._get_int("SHARD_COUNT", 0)
+        return count if count > 0 else None
+    
+    @staticmethod
+    def get_shard_ids() -> Optional[List[int]]:
+        """
+        Get the shards this host runs, read from SHARD_IDS as "0-3,8,9".
+        
+        Returns:
+            List: The shard IDs, or None to run every shard
+        """
+        value = os.environ.get("SHARD_IDS", "").strip()
+        if not value:
+            return None
+        
+        shard_ids = []
+        try:
+            for part in value.split(","):
+                first, _, last = part.strip().partition("-")
+                shard_ids.extend(range(int(first), int(last or first) + 1))
+        except ValueError:
+            logger.warning("Invalid SHARD_IDS value, running every shard")
+            return None
+        return sorted(set(shard_ids))
+    
+    @staticmethod
+    def get_shard_processes() -> int:
+        """
+        Get how many bot processes main.py starts to split this host's shards between.
+        
+        Returns:
+            int: The number of processes (defaults to 1)
+        """
+        return max(1, Config._get_int("SHARD_PROCESSES", Config._DEFAULT_SHARD_PROCESSES))
+    
+    @staticmethod
+    def get_shard_status_interval() -> float:
+        """
+        Get the number of seconds between saves of per-shard status for the dashboard.
+        
+        Returns:
+            float: The interval in seconds (defaults to 30)
+        """
+        return max(5.0, Config._get_float("SHARD_STATUS_INTERVAL", Config._DEFAULT_SHARD_STATUS_INTERVAL))
+    
+    @staticmethod
+    def get_ai_provider() -> str:
+        """
+        Get the name of the AI provider used for chat responses.
+        
+        Returns:
+            str: The provider name, or 'auto' to route between providers (defaults to 'google')
+        """
+        return os.environ.get("AI_PROVIDER", Config._DEFAULT_AI_PROVIDER).lower()
+    
+    @staticmethod
+    def get_ai_max_concurrency() -> int:
+        """
+        Get the maximum number of in-flight requests allowed per AI provider.
+        
+        Returns:
+            int: The concurrency limit (defaults to 32)
+        """
+        return max(1, Config._get_int("AI_MAX_CONCURRENCY", Config._DEFAULT_AI_MAX_CONCURRENCY))
+    
+    @staticmethod
+    def is_streaming_enabled() -> bool:
+        """
+        Check if AI responses should be streamed into Discord as they are generated.
+        
+        Returns:
+            bool: True if streaming is enabled, False otherwise
+        """
+        return Config._get_bool("AI_STREAMING", False)
+    
+    @staticmethod
+    def get_stream_edit_interval() -> float:
+        """
+        Get the minimum number of seconds between edits of a streamed message.
+        
+        Returns:
+            float: The edit interval in seconds (defaults to 1.0)
+        """
+        return max(0.2, Config._get_float("AI_STREAM_EDIT_INTERVAL", Config._DEFAULT_STREAM_EDIT_INTERVAL))
+    
+    @staticmethod
+    def get_long_response_mode() -> str:
+        """
+        Get how responses too long for one message are sent.
+        
+        Returns:
+            str: "messages" to split into plain messages (the default) or "embed" to split into embeds
+        """
+        mode = os.environ.get("AI_LONG_RESPONSE_MODE", Config._DEFAULT_LONG_RESPONSE_MODE).lower()
+        if mode not in ("messages", "embed"):
+            logger.warning("Invalid AI_LONG_RESPONSE_MODE value, using default")
+            return Config._DEFAULT_LONG_RESPONSE_MODE
+        return mode
+    
+    @staticmethod
+    def get_attachment_threshold() -> int:
+        """
+        Get the response length above which a response is sent as a file attachment.
+        
+        Returns:
+            int: The length in characters, or 0 to never attach (defaults to 6000)
+        """
+        return max(0, Config._get_int("AI_ATTACHMENT_THRESHOLD", Config._DEFAULT_ATTACHMENT_THRESHOLD))
+    
+    @staticmethod
+    def get_google_model() -> str:
+        """
+        Get the Google Gemini model name.
+        
+        Returns:
+            str: The model name (defaults to 'gemini-1.5-flash')
+        """
+        return os.environ.get("GOOGLE_MODEL", Config._DEFAULT_GOOGLE_MODEL)
+    
+    @staticmethod
+    def get_openai_model() -> str:
+        """
+        Get the OpenAI chat model name.
+        
+        Returns:
+            str: The model name (defaults to 'gpt-4o')
+        """
+        return os.environ.get("OPENAI_MODEL", Config._DEFAULT_OPENAI_MODEL)
+    
+    @staticmethod
+    def is_response_cache_enabled() -> bool:
+        """
+        Check if the AI response cache is available (guilds still opt in individually).
+        
+        Returns:
+            bool: True if the response cache is enabled, False otherwise
+        """
+        return Config._get_bool("RESPONSE_CACHE_ENABLED", False)
+    
+    @staticmethod
+    def get_response_cache_ttl() -> int:
+        """
+        Get how long cached AI responses stay valid.
+        
+        Returns:
+            int: The time-to-live in seconds (defaults to 3600)
+        """
+        return max(1, Config._get_int("RESPONSE_CACHE_TTL", Config._DEFAULT_RESPONSE_CACHE_TTL))
+    
+    @staticmethod
+    def get_response_cache_size() -> int:
+        """
+        Get the maximum number of responses held in the in-process cache.
+        
+        Returns:
+            int: The maximum number of entries (defaults to 1024)
+        """
+        return max(1, Config._get_int("RESPONSE_CACHE_SIZE", Config._DEFAULT_RESPONSE_CACHE_SIZE))
+    
+    @staticmethod
+    def is_response_cache_persistent() -> bool:
+        """
+        Check if the response cache should also be stored in the database.
+        
+        Returns:
+            bool: True if the database tier is enabled, False otherwise
+        """
+        return Config._get_bool("RESPONSE_CACHE_DATABASE", False)
+    
+    @staticmethod
+    def is_request_coalescing_enabled() -> bool:
+        """
+        Check if identical in-flight AI requests without channel history should share one upstream call.
+        
+        Returns:
+            bool: True if request coalescing is enabled (the default), False otherwise
+        """
+        return Config._get_bool("AI_COALESCE_REQUESTS", True)
+    
+    @staticmethod
+    def get_conversation_queue_size() -> int:
+        """
+        Get the maximum number of conversations waiting to be written to the database.
+        
+        Returns:
+            int: The queue size (defaults to 1000)
+        """
+        return max(1, Config._get_int("CONVERSATION_QUEUE_SIZE", Config._DEFAULT_CONVERSATION_QUEUE_SIZE))
+    
+    @staticmethod
+    def get_conversation_batch_size() -> int:
+        """
+        Get the number of conversations written per bulk insert.
+        
+        Returns:
+            int: The batch size (defaults to 100)
+        """
+        return max(1, Config._get_int("CONVERSATION_BATCH_SIZE", Config._DEFAULT_CONVERSATION_BATCH_SIZE))
+    
+    @staticmethod
+    def get_conversation_flush_interval() -> float:
+        """
+        Get the longest time a queued conversation waits before being written.
+        
+        Returns:
+            float: The flush interval in seconds (defaults to 2.0)
+        """
+        return max(0.1, Config._get_float("CONVERSATION_FLUSH_INTERVAL", Config._DEFAULT_CONVERSATION_FLUSH_INTERVAL))
+    
+    @staticmethod
+    def get_server_cache_refresh_interval() -> float:
+        """
+        Get how often the bot reloads server settings changed elsewhere (e.g. the dashboard).
+        
+        Returns:
+            float: The refresh interval in seconds (defaults to 30)
+        """
+        return max(1.0, Config._get_float("SERVER_CACHE_REFRESH_INTERVAL", Config._DEFAULT_SERVER_CACHE_REFRESH_INTERVAL))
+    
+    @staticmethod
+    def is_history_enabled() -> bool:
+        """
+        Check if recent channel history should be sent to the AI as context.
+        
+        Returns:
+            bool: True if conversation history is enabled (the default), False otherwise
+        """
+        return Config._get_bool("HISTORY_ENABLED", True)
+    
+    @staticmethod
+    def get_history_max_turns() -> int:
+        """
+        Get the number of recent turns kept in memory per channel.
+        
+        Returns:
+            int: The maximum number of turns (defaults to 20)
+        """
+        return max(1, Config._get_int("HISTORY_MAX_TURNS", Config._DEFAULT_HISTORY_MAX_TURNS))
+    
+    @staticmethod
+    def get_history_token_budget() -> int:
+        """
+        Get the maximum estimated tokens of history sent with each prompt.
+        
+        Returns:
+            int: The token budget (defaults to 1500)
+        """
+        return max(0, Config._get_int("HISTORY_TOKEN_BUDGET", Config._DEFAULT_HISTORY_TOKEN_BUDGET))
+    
+    @staticmethod
+    def is_summary_enabled() -> bool:
+        """
+        Check if older channel history should be compacted into a rolling summary.
+        
+        Returns:
+            bool: True if summarization is enabled (the default), False otherwise
+        """
+        return Config._get_bool("SUMMARY_ENABLED", True)
+    
+    @staticmethod
+    def get_summary_threshold_turns() -> int:
+        """
+        Get the number of buffered turns in a channel that triggers summarization.
+        
+        Returns:
+            int: The turn threshold (defaults to 12)
+        """
+        return max(2, Config._get_int("SUMMARY_THRESHOLD_TURNS", Config._DEFAULT_SUMMARY_THRESHOLD_TURNS))
+    
+    @staticmethod
+    def get_summary_keep_turns() -> int:
+        """
+        Get the number of newest turns left verbatim when a channel is summarized.
+        
+        Returns:
+            int: The number of turns kept (defaults to 6)
+        """
+        return max(1, Config._get_int("SUMMARY_KEEP_TURNS", Config._DEFAULT_SUMMARY_KEEP_TURNS))
+    
+    @staticmethod
+    def get_db_pool_size() -> int:
+        """
+        Get the number of pooled database connections kept per dashboard worker.
+        
+        Returns:
+            int: The pool size (defaults to 5)
+        """
+        return max(1, Config._get_int("DB_POOL_SIZE", Config._DEFAULT_DB_POOL_SIZE))
+    
+    @staticmethod
+    def get_db_max_overflow() -> int:
+        """
+        Get the number of extra connections a dashboard worker may open under load.
+        
+        Returns:
+            int: The maximum overflow (defaults to 10)
+        """
+        return max(0, Config._get_int("DB_MAX_OVERFLOW", Config._DEFAULT_DB_MAX_OVERFLOW))
+    
+    @staticmethod
+    def get_bot_db_pool_size() -> int:
+        """
+        Get the number of PostgreSQL connections the bot process keeps open.
+        
+        Returns:
+            int: The pool size (defaults to 10)
+        """
+        return max(1, Config._get_int("BOT_DB_POOL_SIZE", Config._DEFAULT_BOT_DB_POOL_SIZE))
+    
+    @staticmethod
+    def get_bot_db_max_overflow() -> int:
+        """
+        Get the number of extra connections the bot process may open under load.
+        
+        Returns:
+            int: The maximum overflow (defaults to 5)
+        """
+        return max(0, Config._get_int("BOT_DB_MAX_OVERFLOW", Config._DEFAULT_BOT_DB_MAX_OVERFLOW))
+    
+    @staticmethod
+    def get_bot_db_pool_timeout() -> float:
+        """
+        Get the number of seconds the bot waits for a free pooled connection before failing.
+        
+        Returns:
+            float: The timeout in seconds (defaults to 10)
+        """
+        return max(1.0, Config._get_float("BOT_DB_POOL_TIMEOUT", Config._DEFAULT_BOT_DB_POOL_TIMEOUT))
+    
+    @staticmethod
+    def get_bot_db_statement_cache_size() -> int:
+        """
+        Get the number of prepared statements cached per bot connection (0 for PgBouncer transaction pooling).
+        
+        Returns:
+            int: The cache size (defaults to 256)
+        """
+        return max(0, Config._get_int("BOT_DB_STATEMENT_CACHE_SIZE", Config._DEFAULT_BOT_DB_STATEMENT_CACHE_SIZE))
+    
+    @staticmethod
+    def is_metrics_enabled() -> bool:
+        """
+        Check if the bot should probe event-loop lag and publish its metrics for /metrics.
+        
+        Returns:
+            bool: True if metrics are enabled (the default), False otherwise
+        """
+        return Config._get_bool("METRICS_ENABLED", True)
+    
+    @staticmethod
+    def get_metrics_snapshot_interval() -> float:
+        """
+        Get how often the bot saves its metrics for the dashboard's /metrics route.
+        
+        Returns:
+            float: The interval in seconds (defaults to 15)
+        """
+        return max(1.0, Config._get_float("METRICS_SNAPSHOT_INTERVAL", Config._DEFAULT_METRICS_SNAPSHOT_INTERVAL))
+    
+    @staticmethod
+    def get_metrics_loop_lag_interval() -> float:
+        """
+        Get how often the event-loop lag probe runs.
+        
+        Returns:
+            float: The interval in seconds (defaults to 0.5)
+        """
+        return max(0.05, Config._get_float("METRICS_LOOP_LAG_INTERVAL", Config._DEFAULT_METRICS_LOOP_LAG_INTERVAL))
+    
+    @staticmethod
+    def get_metrics_max_guilds() -> int:
+        """
+        Get how many guilds get their own label on per-guild metrics; the rest are counted as "other".
+        
+        Returns:
+            int: The number of guilds (defaults to 100)
+        """
+        return max(0, Config._get_int("METRICS_MAX_GUILDS", Config._DEFAULT_METRICS_MAX_GUILDS))
+    
+    @staticmethod
+    def get_metrics_token() -> Optional[str]:
+        """
+        Get the bearer token scrapers must send to /metrics.
+        
+        Returns:
+            str: The token or None if /metrics is disabled
+        """
+        return os.environ.get("METRICS_TOKEN") or None
+    
+    @staticmethod
+    def is_rate_limit_enabled() -> bool:
+        """
+        Check if AI requests should pass through the admission controller.
+        
+        Returns:
+            bool: True if rate limiting is enabled (the default), False otherwise
+        """
+        return Config._get_bool("RATE_LIMIT_ENABLED", True)
+    
+    @staticmethod
+    def get_rate_limit_mode() -> str:
+        """
+        Get what happens to requests over a guild or provider limit.
+        
+        Returns:
+            str: "queue" to wait for capacity (the default) or "shed" to reject immediately
+        """
+        mode = os.environ.get("RATE_LIMIT_MODE", Config._DEFAULT_RATE_LIMIT_MODE).lower()
+        if mode not in ("queue", "shed"):
+            logger.warning("Invalid RATE_LIMIT_MODE value, using default")
+            return Config._DEFAULT_RATE_LIMIT_MODE
+        return mode
+    
+    @staticmethod
+    def get_rate_limit_user() -> Tuple[float, int]:
+        """
+        Get the per-user AI request limit.
+        
+        Returns:
+            Tuple: Requests per minute (defaults to 6) and burst size (defaults to 3)
+        """
+        return (
+            max(0.1, Config._get_float("RATE_LIMIT_USER_PER_MINUTE", Config._DEFAULT_RATE_LIMIT_USER_PER_MINUTE)),
+            max(1, Config._get_int("RATE_LIMIT_USER_BURST", Config._DEFAULT_RATE_LIMIT_USER_BURST))
+        )
+    
+    @staticmethod
+    def get_rate_limit_guild() -> Tuple[float, int]:
+        """
+        Get the per-guild AI request limit.
+        
+        Returns:
+            Tuple: Requests per minute (defaults to 60) and burst size (defaults to 20)
+        """
+        return (
+            max(0.1, Config._get_float("RATE_LIMIT_GUILD_PER_MINUTE", Config._DEFAULT_RATE_LIMIT_GUILD_PER_MINUTE)),
+            max(1, Config._get_int("RATE_LIMIT_GUILD_BURST", Config._DEFAULT_RATE_LIMIT_GUILD_BURST))
+        )
+    
+    @staticmethod
+    def get_rate_limit_provider() -> Tuple[float, int]:
+        """
+        Get the per-provider AI request limit, shared by every guild.
+        
+        Returns:
+            Tuple: Requests per minute (defaults to 300) and burst size (defaults to 50)
+        """
+        return (
+            max(0.1, Config._get_float("RATE_LIMIT_PROVIDER_PER_MINUTE", Config._DEFAULT_RATE_LIMIT_PROVIDER_PER_MINUTE)),
+            max(1, Config._get_int("RATE_LIMIT_PROVIDER_BURST", Config._DEFAULT_RATE_LIMIT_PROVIDER_BURST))
+        )
+    
+    @staticmethod
+    def get_rate_limit_queue_size() -> int:
+        """
+        Get the maximum number of queued AI requests per guild.
+        
+        Returns:
+            int: The queue size (defaults to 20)
+        """
+        return max(1, Config._get_int("RATE_LIMIT_QUEUE_SIZE", Config._DEFAULT_RATE_LIMIT_QUEUE_SIZE))
+    
+    @staticmethod
+    def get_rate_limit_queue_timeout() -> float:
+        """
+        Get how long a queued AI request may wait before it is rejected.
+        
+        Returns:
+            float: The timeout in seconds (defaults to 30)
+        """
+        return max(1.0, Config._get_float("RATE_LIMIT_QUEUE_TIMEOUT", Config._DEFAULT_RATE_LIMIT_QUEUE_TIMEOUT))
+    
+    @staticmethod
+    def get_rate_limit_guild_weights() -> Dict[str, int]:
+        """
+        Get the fair-queue weights of guilds that should get a larger share.
+        
+        Read from RATE_LIMIT_GUILD_WEIGHTS as "guild_id:weight,guild_id:weight".
+        
+        Returns:
+            Dict: Weights keyed by guild ID (guilds not listed have weight 1)
+        """
+        weights = {}
+        for entry in os.environ.get("RATE_LIMIT_GUILD_WEIGHTS", "").split(","):
+            if not entry.strip():
+                continue
+            try:
+                guild_id, weight = entry.split(":")
+                weights[guild_id.strip()] = max(1, int(weight))
+            except ValueError:
+                logger.warning(f"Invalid RATE_LIMIT_GUILD_WEIGHTS entry: {entry}")
+        return weights
+    
+    @staticmethod
+    def get_ai_retry_attempts() -> int:
+        """
+        Get the maximum number of attempts for an AI provider call.
+        
+        Returns:
+            int: The number of attempts, including the first (defaults to 3)
+        """
+        return max(1, Config._get_int("AI_RETRY_ATTEMPTS", Config._DEFAULT_AI_RETRY_ATTEMPTS))
+    
+    @staticmethod
+    def get_ai_retry_base_delay() -> float:
+        """
+        Get the base delay of the exponential backoff between AI provider retries.
+        
+        Returns:
+            float: The base delay in seconds (defaults to 0.5)
+        """
+        return max(0.0, Config._get_float("AI_RETRY_BASE_DELAY", Config._DEFAULT_AI_RETRY_BASE_DELAY))
+    
+    @staticmethod
+    def get_ai_retry_max_delay() -> float:
+        """
+        Get the maximum backoff between AI provider retries.
+        
+        Returns:
+            float: The maximum delay in seconds (defaults to 8)
+        """
+        return max(0.0, Config._get_float("AI_RETRY_MAX_DELAY", Config._DEFAULT_AI_RETRY_MAX_DELAY))
+    
+    @staticmethod
+    def get_ai_request_timeout() -> float:
+        """
+        Get the timeout for a single attempt at an AI provider call.
+        
+        Returns:
+            float: The timeout in seconds (defaults to 30)
+        """
+        return max(1.0, Config._get_float("AI_REQUEST_TIMEOUT", Config._DEFAULT_AI_REQUEST_TIMEOUT))
+    
+    @staticmethod
+    def get_ai_request_deadline() -> float:
+        """
+        Get the total time allowed for an AI provider call, including retries.
+        
+        Returns:
+            float: The deadline in seconds (defaults to 60)
+        """
+        return max(1.0, Config._get_float("AI_REQUEST_DEADLINE", Config._DEFAULT_AI_REQUEST_DEADLINE))
+    
+    @staticmethod
+    def get_ai_breaker_threshold() -> int:
+        """
+        Get the number of consecutive failures that opens a provider's circuit breaker.
+        
+        Returns:
+            int: The failure threshold (defaults to 5)
+        """
+        return max(1, Config._get_int("AI_BREAKER_THRESHOLD", Config._DEFAULT_AI_BREAKER_THRESHOLD))
+    
+    @staticmethod
+    def get_ai_breaker_reset_timeout() -> float:
+        """
+        Get how long an open circuit breaker waits before letting a trial call through.
+        
+        Returns:
+            float: The reset timeout in seconds (defaults to 30)
+        """
+        return max(1.0, Config._get_float("AI_BREAKER_RESET_TIMEOUT", Config._DEFAULT_AI_BREAKER_RESET_TIMEOUT))
+    
+    @staticmethod
+    def get_ai_router_providers() -> List[str]:
+        """
+        Get the providers the router may use when AI_PROVIDER is "auto".
+        
+        Returns:
+            List: Provider names in AI_ROUTER_PROVIDERS (defaults to google and openai)
+        """
+        value = os.environ.get("AI_ROUTER_PROVIDERS", Config._DEFAULT_AI_ROUTER_PROVIDERS)
+        return [name.strip().lower() for name in value.split(",") if name.strip()]
+    
+    @staticmethod
+    def get_ai_router_cost_weights() -> Dict[str, float]:
+        """
+        Get the relative cost of each provider, which scales its routing score.
+        
+        Read from AI_ROUTER_COST_WEIGHTS as "provider:weight,provider:weight".
+        
+        Returns:
+            Dict: Weights keyed by provider name (providers not listed have weight 1)
+        """
+        weights = {}
+        for entry in os.environ.get("AI_ROUTER_COST_WEIGHTS", "").split(","):
+            if not entry.strip():
+                continue
+            try:
+                name, weight = entry.split(":")
+                weights[name.strip().lower()] = max(0.01, float(weight))
+            except ValueError:
+                logger.warning(f"Invalid AI_ROUTER_COST_WEIGHTS entry: {entry}")
+        return weights
+    
+    @staticmethod
+    def is_ai_hedging_enabled() -> bool:
+        """
+        Check if slow routed requests should be hedged to a second provider.
+        
+        Returns:
+            bool: True if hedging is enabled, False otherwise (the default)
+        """
+        return Config._get_bool("AI_HEDGE_ENABLED", False)
+    
+    @staticmethod
+    def get_ai_hedge_percentile() -> float:
+        """
+        Get the latency percentile of the first provider after which a request is hedged.
+        
+        Returns:
+            float: The percentile as a fraction (defaults to 0.95)
+        """
+        percentile = Config._get_float("AI_HEDGE_PERCENTILE", Config._DEFAULT_AI_HEDGE_PERCENTILE)
+        return min(99.9, max(50.0, percentile)) / 100
+    
+    @staticmethod
+    def get_ai_hedge_min_delay() -> float:
+        """
+        Get the minimum time to wait for the first provider before hedging.
+        
+        Returns:
+            float: The delay in seconds (defaults to 0.5)
+        """
+        return max(0.0, Config._get_float("AI_HEDGE_MIN_DELAY", Config._DEFAULT_AI_HEDGE_MIN_DELAY))
+    
+    @staticmethod
+    def get_mock_ai_seed() -> int:
+        """
+        Get the random seed of the mock AI provider.
+        
+        Returns:
+            int: The seed (defaults to 1234)
+        """
+        return Config._get_int("MOCK_AI_SEED", Config._DEFAULT_MOCK_AI_SEED)
+    
+    @staticmethod
+    def get_mock_ai_latency() -> float:
+        """
+        Get the typical latency of the mock AI provider.
+        
+        Returns:
+            float: The mean (or median, for lognormal) latency in seconds (defaults to 0.8)
+        """
+        return max(0.0, Config._get_float("MOCK_AI_LATENCY", Config._DEFAULT_MOCK_AI_LATENCY))
+    
+    @staticmethod
+    def get_mock_ai_latency_distribution() -> str:
+        """
+        Get the latency distribution of the mock AI provider.
+        
+        Returns:
+            str: "fixed", "uniform", "exponential" or "lognormal" (the default)
+        """
+        distribution = os.environ.get(
+            "MOCK_AI_LATENCY_DISTRIBUTION", Config._DEFAULT_MOCK_AI_LATENCY_DISTRIBUTION
+        ).lower()
+        if distribution not in ("fixed", "uniform", "exponential", "lognormal"):
+            logger.warning("Invalid MOCK_AI_LATENCY_DISTRIBUTION value, using default")
+            return Config._DEFAULT_MOCK_AI_LATENCY_DISTRIBUTION
+        return distribution
+    
+    @staticmethod
+    def get_mock_ai_error_rate() -> float:
+        """
+        Get the fraction of mock AI calls that fail with an injected 503.
+        
+        Returns:
+            float: The error rate between 0 and 1 (defaults to 0)
+        """
+        return min(1.0, max(0.0, Config._get_float("MOCK_AI_ERROR_RATE", 0.0)))
+    
+    @staticmethod
+    def get_mock_ai_response_length() -> int:
+        """
+        Get the length of mock AI responses.
+        
+        Returns:
+            int: The response length in characters (defaults to 400)
+        """
+        return max(1, Config._get_int("MOCK_AI_RESPONSE_LENGTH", Config._DEFAULT_MOCK_AI_RESPONSE_LENGTH))
+    
+    @staticmethod
+    def get_mock_ai_stream_chunks() -> int:
+        """
+        Get how many pieces a streamed mock AI response is split into.
+        
+        Returns:
+            int: The number of chunks (defaults to 8)
+        """
+        return max(1, Config._get_int("MOCK_AI_STREAM_CHUNKS", Config._DEFAULT_MOCK_AI_STREAM_CHUNKS))
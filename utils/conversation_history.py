@@ -0,0 +1,192 @@
+"""
+Per-channel conversation history used as multi-turn AI context.
+"""
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set
+
+from utils import repositories
+from utils.model_registry import format_user_message
+from utils.singleflight import SingleFlight
+
+logger = logging.getLogger("discord_bot")
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens in a piece of text.
+    
+    Uses the common ~4 characters per token approximation, which is close
+    enough for budgeting and costs nothing compared to a real tokenizer.
+    
+    Args:
+        text: The text to measure
+    
+    Returns:
+        int: The estimated token count
+    """
+    return len(text) // 4 + 1
+
+class ConversationHistory:
+    """
+    Ring buffer of recent turns for each channel, with a rolling summary.
+    
+    Each channel keeps its last max_turns turns in memory. The first time a
+    channel is seen, its summary and the turns after it are loaded from the
+    database once; after that, context is built purely from memory. Only the
+    most recently active max_channels channels are kept.
+    
+    When a summarizer is given and a channel holds more than
+    summary_threshold turns, all but the newest keep_recent turns are folded
+    into the channel's summary by a background task, so the context sent
+    with each prompt stays roughly constant in size.
+    """
+    
+    def __init__(self, max_turns: int = 20, max_channels: int = 5000,
+                 summarizer: Optional[Callable[[List[Dict[str, str]]], Awaitable[str]]] = None,
+                 summary_threshold: int = 12, keep_recent: int = 6):
+        self.max_turns = max_turns
+        self.max_channels = max_channels
+        self.summarizer = summarizer
+        # Compaction has to start before the ring buffer overwrites old turns
+        self.summary_threshold = min(summary_threshold, max_turns - 1)
+        self.keep_recent = min(keep_recent, self.summary_threshold)
+        self._channels: "OrderedDict[str, Deque[Dict[str, Any]]]" = OrderedDict()
+        self._summaries: Dict[str, Dict[str, Any]] = {}
+        self._loading = SingleFlight()
+        self._compacting: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+    
+    def __len__(self) -> int:
+        return len(self._channels)
+    
+    async def get_context(self, channel_id: str, token_budget: int) -> List[Dict[str, str]]:
+        """
+        Get the channel's summary and the most recent turns that fit within a token budget.
+        
+        Args:
+            channel_id: The Discord channel ID
+            token_budget: The maximum estimated tokens of context to return
+        
+        Returns:
+            List: Chat messages with 'role' ('system', 'user' or 'assistant') and 'content', oldest first
+        """
+        turns = self._channels.get(channel_id)
+        if turns is None:
+            turns = await self._loading.do(channel_id, lambda: self._load(channel_id))
+        else:
+            self._channels.move_to_end(channel_id)
+        
+        summary_message = None
+        used = 0
+        summary = self._summaries.get(channel_id)
+        if summary:
+            content = f"Summary of the earlier conversation: {summary['summary']}"
+            if estimate_tokens(content) <= token_budget:
+                summary_message = {"role": "system", "content": content}
+                used = estimate_tokens(content)
+        
+        messages = []
+        for turn in reversed(turns):
+            user_content = format_user_message(turn["message"], turn["username"])
+            cost = estimate_tokens(user_content) + estimate_tokens(turn["response"])
+            if used + cost > token_budget:
+                break
+            used += cost
+            messages.append({"role": "assistant", "content": turn["response"]})
+            messages.append({"role": "user", "content": user_content})
+        
+        if summary_message:
+            messages.append(summary_message)
+        
+        messages.reverse()
+        return messages
+    
+    def add(self, channel_id: str, username: str, message: str, response: str,
+            timestamp: Optional[datetime] = None):
+        """
+        Record a completed turn for a channel, compacting older turns if due.
+        
+        Args:
+            channel_id: The Discord channel ID
+            username: The name of the user who sent the message
+            message: The user's message
+            response: The AI-generated response
+            timestamp: When the message was sent
+        """
+        turns = self._channels.get(channel_id)
+        if turns is None:
+            turns = self._store(channel_id, [])
+        else:
+            self._channels.move_to_end(channel_id)
+        turns.append({"username": username, "message": message, "response": response, "timestamp": timestamp})
+        
+        if self.summarizer and len(turns) > self.summary_threshold and channel_id not in self._compacting:
+            self._compacting.add(channel_id)
+            task = asyncio.create_task(self._compact(channel_id))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+    
+    async def close(self):
+        """Wait for in-progress summarizations to finish."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+    
+    def _store(self, channel_id: str, turns: List[Dict[str, Any]]) -> Deque[Dict[str, Any]]:
+        """Install a channel's ring buffer, evicting the least recently active channel if needed."""
+        buffer = deque(turns, maxlen=self.max_turns)
+        self._channels[channel_id] = buffer
+        self._channels.move_to_end(channel_id)
+        while len(self._channels) > self.max_channels:
+            evicted, _ = self._channels.popitem(last=False)
+            self._summaries.pop(evicted, None)
+        return buffer
+    
+    async def _load(self, channel_id: str) -> Deque[Dict[str, Any]]:
+        """Load a channel's summary and recent turns from the database (cold start)."""
+        try:
+            summary, loaded = await repositories.load_recent_turns(channel_id, self.max_turns)
+        except Exception as e:
+            logger.error(f"Failed to load conversation history for channel {channel_id}: {e}")
+            summary, loaded = None, []
+        
+        if summary and channel_id not in self._summaries:
+            self._summaries[channel_id] = summary
+        
+        # Keep any turns recorded while the load was in flight
+        existing = self._channels.get(channel_id)
+        return self._store(channel_id, loaded + list(existing or []))
+    
+    async def _compact(self, channel_id: str):
+        """Fold a channel's older turns into its rolling summary."""
+        try:
+            turns = self._channels.get(channel_id)
+            if turns is None or len(turns) <= self.keep_recent:
+                return
+            
+            older = list(turns)[:len(turns) - self.keep_recent]
+            messages = []
+            previous = self._summaries.get(channel_id)
+            if previous:
+                messages.append({"role": "Earlier summary", "content": previous["summary"]})
+            for turn in older:
+                messages.append({"role": turn["username"], "content": turn["message"]})
+                messages.append({"role": "Assistant", "content": turn["response"]})
+            
+            summary = await self.summarizer(messages)
+            
+            # Drop the summarized turns that are still at the front of the buffer
+            summarized = {id(turn) for turn in older}
+            turns = self._channels.get(channel_id)
+            while turns and id(turns[0]) in summarized:
+                turns.popleft()
+            
+            summarized_until = older[-1].get("timestamp")
+            self._summaries[channel_id] = {"summary": summary, "summarized_until": summarized_until}
+            await repositories.save_channel_summary(channel_id, summary, summarized_until)
+            logger.debug(f"Summarized {len(older)} turns in channel {channel_id}")
+        except Exception as e:
+            logger.error(f"Failed to summarize conversation history for channel {channel_id}: {e}")
+        finally:
+            self._compacting.discard(channel_id)
@@ -0,0 +1,130 @@
+"""
+Streaming export of conversation history as NDJSON or CSV.
+
+Rows are read with a server-side cursor and encoded one at a time, so memory
+use stays flat no matter how many conversations are exported.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Any, Iterable, Iterator, Sequence
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+def iter_rows(query, columns: Sequence[Any], batch_size: int = 1000) -> Iterator[Any]:
+    """
+    Stream rows for the given columns, oldest first.
+    
+    Args:
+        query: A Conversation query with any filters applied
+        columns: The Conversation columns to select
+        batch_size: How many rows to fetch from the cursor at a time
+    
+    Returns:
+        Iterator: Row tuples in (timestamp, id) order
+    """
+    from models import Conversation
+    
+    return (
+        query
+        .with_entities(*columns)
+        .order_by(Conversation.timestamp.asc(), Conversation.id.asc())
+        .yield_per(batch_size)
+    )
+
+def _encode_value(value: Any) -> Any:
+    """Convert a column value to a JSON/CSV friendly value."""
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def iter_ndjson(rows: Iterable[Any], fields: Sequence[str]) -> Iterator[str]:
+    """
+    Encode rows as newline-delimited JSON, one object per line.
+    
+    Args:
+        rows: Row tuples in the same order as fields
+        fields: The column names
+    
+    Returns:
+        Iterator: One JSON line per row
+    """
+    for row in rows:
+        record = {field: _encode_value(value) for field, value in zip(fields, row)}
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+def iter_csv(rows: Iterable[Any], fields: Sequence[str]) -> Iterator[str]:
+    """
+    Encode rows as CSV with a header line.
+    
+    Args:
+        rows: Row tuples in the same order as fields
+        fields: The column names
+    
+    Returns:
+        Iterator: The header followed by one CSV line per row
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    
+    writer.writerow(fields)
+    for row in rows:
+        writer.writerow([_encode_value(value) for value in row])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    
+    # Header only, when there are no rows
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def iter_gzip(chunks: Iterable[str], flush_every: int = 64 * 1024) -> Iterator[bytes]:
+    """
+    Gzip a stream of text chunks incrementally.
+    
+    Args:
+        chunks: The text to compress
+        flush_every: Roughly how many uncompressed bytes to buffer before emitting output
+    
+    Returns:
+        Iterator: Gzip-compressed bytes
+    """
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    pending = 0
+    for chunk in chunks:
+        data = chunk.encode("utf-8")
+        pending += len(data)
+        output = compressor.compress(data)
+        if pending >= flush_every:
+            output += compressor.flush(zlib.Z_SYNC_FLUSH)
+            pending = 0
+        if output:
+            yield output
+    yield compressor.flush()
+
+def export_conversations(query, fields: Sequence[str], fmt: str = "ndjson",
+                         batch_size: int = 1000) -> Iterator[str]:
+    """
+    Stream a conversation query in the given format.
+    
+    Args:
+        query: A Conversation query with any filters applied
+        fields: The Conversation columns to export
+        fmt: "ndjson" or "csv"
+        batch_size: How many rows to fetch from the cursor at a time
+    
+    Returns:
+        Iterator: Encoded text chunks
+    """
+    from models import Conversation
+    
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    
+    rows = iter_rows(query, [getattr(Conversation, field) for field in fields], batch_size)
+    if fmt == "csv":
+        return iter_csv(rows, fields)
+    return iter_ndjson(rows, fields)
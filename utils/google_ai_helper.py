@@ -2,61 +2,234 @@
 Helper functions for interacting with the Google AI API.
 """
 import os
+import re
 import json
 import logging
-from typing import Dict, Any, List
+from typing import TYPE_CHECKING, Dict, Any, List, AsyncIterator, Optional
 import base64
-import requests
 from io import BytesIO
 
-import google.generativeai as genai
 from utils.config import Config
+from utils.model_registry import ModelRegistry, format_user_message, get_system_instruction
+from utils.resilience import (
+    ProviderError, call_with_retry, is_retryable_status, iterate_with_timeout, parse_retry_after
+)
+
+if TYPE_CHECKING:
+    import google.generativeai as genai
 
 # Set up logging
 logger = logging.getLogger("discord_bot")
 
-# Initialize Google AI
-api_key = Config.get_google_api_key()
-genai.configure(api_key=api_key)
+# Whether the SDK has been given the API key; see _get_genai
+_configured = False
+
+def _get_genai():
+    """
+    Import and configure the Gemini SDK on first use.
+    
+    The SDK takes a while to import, so the bot only pays for it once Google
+    is actually called.
+    
+    Returns:
+        module: The google.generativeai module
+    """
+    global _configured
+    import google.generativeai as genai
+    if not _configured:
+        genai.configure(api_key=Config.get_google_api_key())
+        _configured = True
+    return genai
+
+# Gemini 1.0 models reject system instructions; for them the instruction is
+# sent at the start of the conversation instead
+_LEGACY_MODEL_PREFIXES = ("gemini-pro", "gemini-1.0")
+
+def _supports_system_instruction(model_name: str) -> bool:
+    """
+    Check if a Gemini model accepts a system instruction.
+    
+    Args:
+        model_name: The model name, with or without the "models/" prefix
+    
+    Returns:
+        bool: False for Gemini 1.0 models, True otherwise
+    """
+    return not model_name.removeprefix("models/").startswith(_LEGACY_MODEL_PREFIXES)
+
+# Configured GenerativeModel instances, reused across calls
+_models = ModelRegistry(
+    lambda model_name, instruction: _get_genai().GenerativeModel(
+        model_name, system_instruction=instruction if _supports_system_instruction(model_name) else None
+    )
+)
 
-def generate_ai_response(prompt: str, user_name: str = "User") -> str:
+def get_model_name() -> str:
+    """
+    Get the name of the Gemini model used for chat responses.
+    
+    Returns:
+        str: The model name
+    """
+    return Config.get_google_model()
+
+def _get_chat_model() -> "genai.GenerativeModel":
+    """
+    Get the chat model configured with the bot's system instruction.
+    
+    Returns:
+        genai.GenerativeModel: The configured model
+    """
+    return _models.get(Config.get_google_model(), Config.get_bot_name())
+
+def _classify_error(error: Exception) -> ProviderError:
+    """
+    Convert a Google API exception into a ProviderError.
+    
+    Args:
+        error: The exception raised by the SDK
+        
+    Returns:
+        ProviderError: The error, marked retryable for 429s, 5xxs and connection failures
+    """
+    from google.api_core import exceptions as google_exceptions
+    
+    if isinstance(error, google_exceptions.GoogleAPICallError):
+        headers = getattr(error.response, "headers", None) or {}
+        return ProviderError(
+            f"Google AI returned {error.code}: {error.message}",
+            retryable=is_retryable_status(error.code),
+            retry_after=parse_retry_after(headers.get("retry-after")),
+            status=error.code
+        )
+    if isinstance(error, (ConnectionError, google_exceptions.RetryError)):
+        return ProviderError(f"Could not reach Google AI: {error}", retryable=True)
+    return ProviderError(str(error))
+
+def _build_contents(prompt: str, user_name: str,
+                    history: Optional[List[Dict[str, str]]] = None) -> List[Dict[str, Any]]:
+    """
+    Build the Gemini contents for a prompt and its conversation history.
+    
+    Gemini has no system turns, and two user turns in a row are rejected,
+    so system messages in the history (the conversation summary) are put in
+    front of the first user turn instead.
+    
+    Args:
+        prompt: The user's message
+        user_name: The user's name for personalization
+        history: Earlier chat messages with 'role' and 'content' keys, oldest first
+        
+    Returns:
+        List: The Gemini contents
+    """
+    preamble = [message["content"] for message in history or [] if message["role"] == "system"]
+    contents = [
+        {"role": "model" if message["role"] == "assistant" else "user", "parts": [message["content"]]}
+        for message in history or [] if message["role"] != "system"
+    ]
+    contents.append({"role": "user", "parts": [format_user_message(prompt, user_name)]})
+    
+    if not _supports_system_instruction(Config.get_google_model()):
+        preamble.insert(0, get_system_instruction(Config.get_bot_name()))
+    if preamble:
+        first_user_turn = next(content for content in contents if content["role"] == "user")
+        first_user_turn["parts"][:0] = preamble
+    return contents
+
+def generate_ai_response(prompt: str, user_name: str = "User",
+                         history: Optional[List[Dict[str, str]]] = None) -> str:
     """
     Generate a response from Google Gemini based on the prompt.
     
     Args:
         prompt: The user's message
         user_name: The user's name for personalization
+        history: Earlier chat messages with 'role' and 'content' keys, oldest first
         
     Returns:
         str: The AI-generated response
     """
     try:
-        logger.debug(f"Generating AI response for prompt: {prompt[:50]}...")
-        
-        system_message = (
-            f"You are a helpful Discord bot assistant named {Config.get_bot_name()}. "
-            f"You are currently talking to {user_name} in a Discord server. "
-            f"Be friendly, helpful, and concise in your responses. "
-            f"If you don't know something, just say so. "
-            f"Don't make up information."
-        )
+        logger.debug("Generating AI response for prompt: %.50s...", prompt)
         
-        # Use Gemini-Pro model
-        model = genai.GenerativeModel('gemini-pro')
+        model = _get_chat_model()
+        response = model.generate_content(_build_contents(prompt, user_name, history))
         
-        # Combine system message and prompt
-        full_prompt = f"{system_message}\n\nUser: {prompt}"
+        result = response.text
+        logger.debug("Generated AI response: %.50s...", result)
+        return result
+    
+    except Exception as e:
+        logger.error(f"Error generating AI response: {e}")
+        raise Exception(f"Failed to generate AI response: {str(e)}")
+
+async def generate_ai_response_async(prompt: str, user_name: str = "User",
+                                     history: Optional[List[Dict[str, str]]] = None) -> str:
+    """
+    Generate a response from Google Gemini without blocking the event loop.
+    
+    Args:
+        prompt: The user's message
+        user_name: The user's name for personalization
+        history: Earlier chat messages with 'role' and 'content' keys, oldest first
+    
+    Returns:
+        str: The AI-generated response
+    """
+    try:
+        logger.debug("Generating AI response for prompt: %.50s...", prompt)
         
-        response = model.generate_content(full_prompt)
+        model = _get_chat_model()
+        contents = _build_contents(prompt, user_name, history)
+        response = await call_with_retry("google", lambda: model.generate_content_async(contents), _classify_error)
         
         result = response.text
-        logger.debug(f"Generated AI response: {result[:50]}...")
+        logger.debug("Generated AI response: %.50s...", result)
         return result
     
+    except ProviderError as e:
+        logger.error(f"Error generating AI response: {e}")
+        raise
+    
     except Exception as e:
         logger.error(f"Error generating AI response: {e}")
         raise Exception(f"Failed to generate AI response: {str(e)}")
 
+async def stream_ai_response(prompt: str, user_name: str = "User",
+                             history: Optional[List[Dict[str, str]]] = None) -> AsyncIterator[str]:
+    """
+    Stream a response from Google Gemini as it is generated.
+    
+    Args:
+        prompt: The user's message
+        user_name: The user's name for personalization
+        history: Earlier chat messages with 'role' and 'content' keys, oldest first
+        
+    Yields:
+        str: Successive pieces of the AI-generated response
+    """
+    try:
+        logger.debug("Streaming AI response for prompt: %.50s...", prompt)
+        
+        model = _get_chat_model()
+        contents = _build_contents(prompt, user_name, history)
+        # Only opening the stream is retried; text already yielded cannot be taken back
+        response = await call_with_retry(
+            "google", lambda: model.generate_content_async(contents, stream=True), _classify_error
+        )
+        async for chunk in iterate_with_timeout("google", response):
+            if chunk.parts:
+                yield chunk.text
+    
+    except ProviderError as e:
+        logger.error(f"Error streaming AI response: {e}")
+        raise
+    
+    except Exception as e:
+        logger.error(f"Error streaming AI response: {e}")
+        raise Exception(f"Failed to generate AI response: {str(e)}")
+
 def generate_image(prompt: str) -> Dict[str, str]:
     """
     Generate an image using Gemini or redirect to another source.
@@ -89,6 +262,53 @@ def generate_image(prompt: str) -> Dict[str, str]:
         logger.error(f"Error generating image: {e}")
         raise Exception(f"Failed to generate image: {str(e)}")
 
+def parse_sentiment(response_text: str) -> Dict[str, Any]:
+    """
+    Extract sentiment results from a model's reply.
+    
+    The reply should be JSON, possibly inside a markdown code block; if it
+    is not valid JSON, the values are picked out with regular expressions.
+    
+    Args:
+        response_text: The model's reply
+        
+    Returns:
+        Dict: A dictionary containing sentiment analysis results
+    """
+    # Find JSON content (assuming it might be surrounded by markdown code blocks)
+    if "```json" in response_text:
+        json_content = response_text.split("```json")[1].split("```")[0].strip()
+    elif "```" in response_text:
+        json_content = response_text.split("```")[1].split("```")[0].strip()
+    else:
+        json_content = response_text
+    
+    try:
+        result = json.loads(json_content)
+        return {
+            "rating": max(1, min(5, round(float(result.get("rating", 3))))),
+            "confidence": max(0, min(1, float(result.get("confidence", 0.5)))),
+            "mood": result.get("mood", "neutral")
+        }
+    except json.JSONDecodeError:
+        # If JSON parsing fails, try to extract numerical values
+        logger.warning(f"Failed to parse JSON from sentiment response: {response_text}")
+        if "rating" in response_text and "confidence" in response_text:
+            rating_match = re.search(r'rating["\s:]+([0-9.]+)', response_text)
+            confidence_match = re.search(r'confidence["\s:]+([0-9.]+)', response_text)
+            mood_match = re.search(r'mood["\s:]+["\']?(\w+)["\']?', response_text)
+            
+            rating = int(float(rating_match.group(1))) if rating_match else 3
+            confidence = float(confidence_match.group(1)) if confidence_match else 0.5
+            mood = mood_match.group(1) if mood_match else "neutral"
+            
+            return {
+                "rating": max(1, min(5, rating)),
+                "confidence": max(0, min(1, confidence)),
+                "mood": mood
+            }
+        return {"rating": 3, "confidence": 0.5, "mood": "neutral"}
+
 def analyze_sentiment(text: str) -> Dict[str, Any]:
     """
     Analyze the sentiment of a message using Gemini.
@@ -100,7 +320,7 @@ def analyze_sentiment(text: str) -> Dict[str, Any]:
         Dict: A dictionary containing sentiment analysis results
     """
     try:
-        model = genai.GenerativeModel('gemini-pro')
+        model = _models.get(Config.get_google_model())
         
         sentiment_prompt = (
             "Analyze the sentiment of the following text and provide a rating "
@@ -112,43 +332,7 @@ def analyze_sentiment(text: str) -> Dict[str, Any]:
         
         response = model.generate_content(sentiment_prompt)
         
-        # Extract JSON from response
-        response_text = response.text
-        
-        # Find JSON content (assuming it might be surrounded by markdown code blocks)
-        if "```json" in response_text:
-            json_content = response_text.split("```json")[1].split("```")[0].strip()
-        elif "```" in response_text:
-            json_content = response_text.split("```")[1].split("```")[0].strip()
-        else:
-            json_content = response_text
-        
-        try:
-            result = json.loads(json_content)
-            return {
-                "rating": max(1, min(5, round(float(result.get("rating", 3))))),
-                "confidence": max(0, min(1, float(result.get("confidence", 0.5)))),
-                "mood": result.get("mood", "neutral")
-            }
-        except json.JSONDecodeError:
-            # If JSON parsing fails, try to extract numerical values
-            logger.warning(f"Failed to parse JSON from sentiment response: {response_text}")
-            if "rating" in response_text and "confidence" in response_text:
-                import re
-                rating_match = re.search(r'rating["\s:]+([0-9.]+)', response_text)
-                confidence_match = re.search(r'confidence["\s:]+([0-9.]+)', response_text)
-                mood_match = re.search(r'mood["\s:]+["\']?(\w+)["\']?', response_text)
-                
-                rating = int(float(rating_match.group(1))) if rating_match else 3
-                confidence = float(confidence_match.group(1)) if confidence_match else 0.5
-                mood = mood_match.group(1) if mood_match else "neutral"
-                
-                return {
-                    "rating": max(1, min(5, rating)),
-                    "confidence": max(0, min(1, confidence)),
-                    "mood": mood
-                }
-            return {"rating": 3, "confidence": 0.5, "mood": "neutral"}
+        return parse_sentiment(response.text)
     except Exception as e:
         logger.error(f"Failed to analyze sentiment: {e}")
         return {"rating": 3, "confidence": 0, "mood": "unknown"}
@@ -168,11 +352,42 @@ def summarize_conversation(messages: List[Dict[str, str]]) -> str:
         
         prompt = f"Please summarize the following conversation concisely:\n\n{conversation_text}"
         
-        model = genai.GenerativeModel('gemini-pro')
+        model = _models.get(Config.get_google_model())
         response = model.generate_content(prompt)
         
         return response.text
     
     except Exception as e:
         logger.error(f"Error summarizing conversation: {e}")
-        return "Failed to summarize the conversation."
\ No newline at end of file
+        return "Failed to summarize the conversation."
+
+async def summarize_conversation_async(messages: List[Dict[str, str]]) -> str:
+    """
+    Summarize a conversation using the Gemini API without blocking the event loop.
+    
+    Unlike summarize_conversation, failures are raised so callers never
+    store an error message as a summary.
+    
+    Args:
+        messages: List of message dictionaries with 'role' and 'content' keys
+        
+    Returns:
+        str: The summary of the conversation
+    """
+    try:
+        conversation_text = "\n".join([f"{msg['role']}: {msg['content']}" for msg in messages])
+        
+        prompt = f"Please summarize the following conversation concisely:\n\n{conversation_text}"
+        
+        model = _models.get(Config.get_google_model())
+        response = await call_with_retry("google", lambda: model.generate_content_async(prompt), _classify_error)
+        
+        return response.text
+    
+    except ProviderError as e:
+        logger.error(f"Error summarizing conversation: {e}")
+        raise
+    
+    except Exception as e:
+        logger.error(f"Error summarizing conversation: {e}")
+        raise Exception(f"Failed to summarize the conversation: {str(e)}")
@@ -1,19 +1,181 @@
 """
 Logging configuration for the Discord bot.
+
+Log calls only put records on a queue; a background thread (a
+QueueListener) formats them and does the console and file I/O, so logging
+never blocks the event loop or a request thread on disk writes or file
+rotation. Each process writes its own file, logs/discord_bot-<pid>.log,
+since processes rotating one shared file would lose or mangle records.
 """
+import atexit
+import contextvars
+import copy
+import json
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
 import sys
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
 
 from utils.config import Config
 
+# The ID of the request being handled, attached to every record logged while handling it
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+_queue_handler: Optional[QueueHandler] = None
+_listener: Optional[QueueListener] = None
+
+# Attributes every LogRecord has; anything else was passed with extra=
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id", "taskName"}
+
+def new_request_id() -> str:
+    """Generate a short random request ID."""
+    return uuid.uuid4().hex[:12]
+
+def set_request_id(request_id: Optional[str] = None) -> contextvars.Token:
+    """
+    Set the request ID for the current context (asyncio task or thread).
+    
+    Args:
+        request_id: The ID, or None to generate one
+    
+    Returns:
+        contextvars.Token: Pass to reset_request_id when the request is done
+    """
+    return request_id_var.set(request_id or new_request_id())
+
+def reset_request_id(token: contextvars.Token):
+    """Restore the request ID that was set before set_request_id."""
+    request_id_var.reset(token)
+
+class RequestIdFilter(logging.Filter):
+    """Adds the current request ID to each record as record.request_id."""
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get() or "-"
+        return True
+
+class DebugSamplingFilter(logging.Filter):
+    """
+    Keeps one in every N DEBUG records from each logging call site.
+    
+    Records at INFO and above always pass. Counting per call site keeps one
+    chatty line from crowding out rarer ones.
+    """
+    
+    def __init__(self, every: int):
+        super().__init__()
+        self.every = every
+        self._counts = {}
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.every <= 1:
+            return True
+        site = (record.pathname, record.lineno)
+        count = self._counts.get(site, 0)
+        self._counts[site] = count + 1
+        return count % self.every == 0
+
+class _RecordQueueHandler(QueueHandler):
+    """
+    Queues records for the listener thread.
+    
+    Unlike QueueHandler, the exception is left for the output formatter
+    instead of being folded into the message, so JSON output keeps it in a
+    field of its own.
+    """
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge the arguments now; they may change before the listener formats the record
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+class JsonFormatter(logging.Formatter):
+    """Formats each record as one JSON object per line."""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+        }
+        # Fields passed with extra=, e.g. logger.info("...", extra={"guild_id": ...})
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value if isinstance(value, (str, int, float, bool, type(None))) else str(value)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+def _build_formatter() -> logging.Formatter:
+    """Get the formatter for the configured log format."""
+    if Config.get_log_format() == "json":
+        return JsonFormatter()
+    return logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s')
+
+def _build_file_handler(formatter: logging.Formatter) -> RotatingFileHandler:
+    """Get a rotating handler for this process's own log file."""
+    handler = RotatingFileHandler(
+        f"logs/discord_bot-{os.getpid()}.log",
+        maxBytes=10485760,  # 10MB
+        backupCount=5
+    )
+    handler.setFormatter(formatter)
+    return handler
+
+def _start_listener(handlers):
+    """Start a listener thread writing the queue's records to the handlers."""
+    global _listener
+    _queue_handler.queue = queue.SimpleQueue()
+    _listener = QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+def _restart_after_fork():
+    """
+    Give a forked child its own listener and log file.
+    
+    The parent's listener thread does not exist in the child, and the
+    parent's file must only be written and rotated by the parent.
+    """
+    if _listener is None:
+        return
+    handlers = []
+    for handler in _listener.handlers:
+        if isinstance(handler, RotatingFileHandler):
+            handler.close()
+            handler = _build_file_handler(handler.formatter)
+        handlers.append(handler)
+    _start_listener(handlers)
+
+def stop_logging():
+    """Write out every queued record and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
 def setup_logger():
     """
     Configure the logger for the application.
     
-    Creates a logger that writes to both console and file.
+    Records go through a queue to a background thread that writes them to
+    both console and file. Calling this again in the same process returns
+    the existing logger.
     """
+    global _queue_handler
+    logger = logging.getLogger("discord_bot")
+    if _queue_handler is not None:
+        return logger
+    
     # Create logs directory if it doesn't exist
     os.makedirs("logs", exist_ok=True)
     
@@ -21,26 +183,34 @@ def setup_logger():
     log_level_str = Config.get_log_level()
     log_level = getattr(logging, log_level_str, logging.INFO)
     
+    formatter = _build_formatter()
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(formatter)
+    handlers = [console, _build_file_handler(formatter)]
+    
+    # The filters run in the calling thread, where the request ID is known,
+    # and drop sampled-out records before they are queued
+    _queue_handler = _RecordQueueHandler(queue.SimpleQueue())
+    _queue_handler.addFilter(RequestIdFilter())
+    _queue_handler.addFilter(DebugSamplingFilter(Config.get_log_debug_sample_every()))
+    _start_listener(handlers)
+    
     # Configure root logger
-    logging.basicConfig(
-        level=log_level,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.StreamHandler(sys.stdout),
-            RotatingFileHandler(
-                "logs/discord_bot.log", 
-                maxBytes=10485760,  # 10MB
-                backupCount=5
-            )
-        ]
-    )
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(log_level)
+    
+    os.register_at_fork(after_in_child=_restart_after_fork)
+    atexit.register(stop_logging)
     
     # Set specific levels for external libraries
     logging.getLogger("discord").setLevel(logging.WARNING)
     logging.getLogger("openai").setLevel(logging.WARNING)
     logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("aiosqlite").setLevel(logging.WARNING)
     
-    logger = logging.getLogger("discord_bot")
     logger.info(f"Logger initialized with level: {log_level_str}")
     
     return logger
@@ -0,0 +1,392 @@
+"""
+In-process metrics with Prometheus text exposition.
+
+Counters, gauges and histograms live in a process-wide registry. Components
+that already keep their own counters (the conversation writer, rate limiter,
+router, caches) are registered as stats sources and read at collection time,
+so the hot path only pays for what it records directly. The bot process
+saves its collected metrics to the database every few seconds and the
+dashboard's /metrics route renders every live process's snapshot, which
+keeps the two processes independent (see SnapshotReporter).
+"""
+import asyncio
+import logging
+import math
+import os
+import socket
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger("discord_bot")
+
+# Latency buckets in seconds, from a fast cache hit to a slow LLM call
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+PREFIX = "discord_bot_"
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    """Turn a label dict into a hashable, ordered key."""
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+class Counter:
+    """A value that only goes up, per label set."""
+    
+    kind = "counter"
+    
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values: Dict[LabelKey, float] = {}
+    
+    def inc(self, amount: float = 1.0, **labels):
+        """Add to the counter for the given labels."""
+        key = _label_key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+    
+    def value(self, **labels) -> float:
+        """Get the counter's value for the given labels."""
+        return self._values.get(_label_key(labels), 0.0)
+    
+    def total(self) -> float:
+        """Get the sum over every label set."""
+        return sum(self._values.values())
+    
+    def samples(self) -> List[Tuple[str, LabelKey, float]]:
+        return [("", key, value) for key, value in self._values.items()]
+
+class Gauge(Counter):
+    """A value that can go up and down, per label set."""
+    
+    kind = "gauge"
+    
+    def set(self, value: float, **labels):
+        """Set the gauge for the given labels."""
+        self._values[_label_key(labels)] = value
+    
+    def dec(self, amount: float = 1.0, **labels):
+        """Subtract from the gauge for the given labels."""
+        self.inc(-amount, **labels)
+    
+    @contextmanager
+    def track(self, **labels) -> Iterator[None]:
+        """Count the enclosed block as in progress."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+class Histogram:
+    """Observations counted into cumulative buckets, per label set."""
+    
+    kind = "histogram"
+    
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        # Label key -> [bucket counts..., +Inf count, sum]
+        self._values: Dict[LabelKey, List[float]] = {}
+    
+    def observe(self, value: float, **labels):
+        """Record one observation for the given labels."""
+        key = _label_key(labels)
+        counts = self._values.get(key)
+        if counts is None:
+            counts = [0.0] * (len(self.buckets) + 2)
+            self._values[key] = counts
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+    
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observe how long the enclosed block takes."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+    
+    def count(self, **labels) -> float:
+        """Get the number of observations, over every label set if none are given."""
+        rows = [self._values.get(_label_key(labels))] if labels else list(self._values.values())
+        return sum(sum(row[:-1]) for row in rows if row)
+    
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        """
+        Estimate a quantile by interpolating within its bucket.
+        
+        Args:
+            q: The quantile, between 0 and 1
+            **labels: The label set, or none to merge every label set
+        
+        Returns:
+            float: The estimate in the observed unit, or None without observations
+        """
+        rows = [self._values.get(_label_key(labels))] if labels else list(self._values.values())
+        rows = [row for row in rows if row]
+        if not rows:
+            return None
+        counts = [sum(row[index] for row in rows) for index in range(len(self.buckets) + 1)]
+        total = sum(counts)
+        if not total:
+            return None
+        
+        rank = q * total
+        seen = 0.0
+        for index, count in enumerate(counts):
+            if seen + count >= rank and count:
+                if index == len(self.buckets):
+                    # Past the largest bucket; the best we know is its bound
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                return lower + (self.buckets[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+    
+    def samples(self) -> List[Tuple[str, LabelKey, float]]:
+        samples = []
+        for key, counts in self._values.items():
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else repr(bound)
+                samples.append(("_bucket", key + (("le", le),), cumulative))
+            samples.append(("_sum", key, counts[-1]))
+            samples.append(("_count", key, cumulative))
+        return samples
+
+class StageTimer:
+    """
+    Times the consecutive stages of one request into a histogram.
+    
+    Each mark() records the time since the previous mark (or since the timer
+    was created) under the given stage label.
+    """
+    
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+        self.start = self._last = time.perf_counter()
+    
+    def mark(self, stage: str, **labels):
+        """Record the time since the previous mark as a stage."""
+        now = time.perf_counter()
+        self.histogram.observe(now - self._last, stage=stage, **labels)
+        self._last = now
+    
+    def elapsed(self) -> float:
+        """Get the time since the timer was created, in seconds."""
+        return time.perf_counter() - self.start
+
+class Registry:
+    """Every metric and stats source of one process."""
+    
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._sources: Dict[str, Callable[[], Dict[str, Any]]] = {}
+    
+    def _get(self, cls, name: str, help_text: str, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = cls(PREFIX + name, help_text, **kwargs)
+            self._metrics[name] = metric
+        return metric
+    
+    def get(self, name: str) -> Optional[Any]:
+        """Get a metric by name (without the prefix), or None if nothing created it."""
+        return self._metrics.get(name)
+    
+    def counter(self, name: str, help_text: str) -> Counter:
+        """Get or create a counter."""
+        return self._get(Counter, name, help_text)
+    
+    def gauge(self, name: str, help_text: str) -> Gauge:
+        """Get or create a gauge."""
+        return self._get(Gauge, name, help_text)
+    
+    def histogram(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        """Get or create a histogram."""
+        return self._get(Histogram, name, help_text, buckets=buckets)
+    
+    def register_stats(self, name: str, source: Callable[[], Dict[str, Any]]):
+        """
+        Expose a component's stats() dict as gauges.
+        
+        Numeric values become gauges named after the source and key; nested
+        dicts (e.g. per provider) become one gauge per inner key, labelled
+        with the outer key. Other values are skipped.
+        
+        Args:
+            name: The source name, used as the gauge name prefix
+            source: Returns the component's current stats
+        """
+        self._sources[name] = source
+    
+    def unregister_stats(self, name: str):
+        """Stop exposing a stats source."""
+        self._sources.pop(name, None)
+    
+    def collect(self) -> List[Dict[str, Any]]:
+        """
+        Collect every metric as plain data.
+        
+        Returns:
+            List: One dict per metric family with its name, type, help and samples
+        """
+        families = [
+            {
+                "name": metric.name,
+                "type": metric.kind,
+                "help": metric.help,
+                "samples": [[suffix, list(key), value] for suffix, key, value in metric.samples()],
+            }
+            for metric in self._metrics.values()
+        ]
+        
+        for source_name, source in list(self._sources.items()):
+            try:
+                stats = source() or {}
+            except Exception as e:
+                logger.warning(f"Failed to collect {source_name} stats: {e}")
+                continue
+            for key, value in stats.items():
+                if isinstance(value, dict):
+                    by_inner: Dict[str, List] = {}
+                    for label, inner in value.items():
+                        if not isinstance(inner, dict):
+                            inner = {"value": inner}
+                        for inner_key, inner_value in inner.items():
+                            if _is_number(inner_value):
+                                by_inner.setdefault(inner_key, []).append(
+                                    ["", [["name", str(label)]], float(inner_value)]
+                                )
+                    for inner_key, samples in by_inner.items():
+                        families.append(_gauge_family(f"{source_name}_{key}_{inner_key}", samples))
+                elif _is_number(value):
+                    families.append(_gauge_family(f"{source_name}_{key}", [["", [], float(value)]]))
+        return families
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not (isinstance(value, float) and math.isnan(value))
+
+def _gauge_family(name: str, samples: List) -> Dict[str, Any]:
+    return {"name": PREFIX + name, "type": "gauge", "help": f"{name.replace('_', ' ')} (from stats)", "samples": samples}
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def render(snapshots: List[Tuple[Dict[str, str], List[Dict[str, Any]]]]) -> str:
+    """
+    Render collected metrics in the Prometheus text exposition format.
+    
+    Args:
+        snapshots: (extra labels, collected families) for each process, e.g. ({"process": ...}, families)
+    
+    Returns:
+        str: The exposition text
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    for extra, families in snapshots:
+        for family in families:
+            entry = merged.setdefault(family["name"], {"type": family["type"], "help": family["help"], "lines": []})
+            for suffix, labels, value in family["samples"]:
+                pairs = list(extra.items()) + [tuple(pair) for pair in labels]
+                label_text = ",".join(f'{name}="{_escape(str(label))}"' for name, label in pairs)
+                entry["lines"].append(f"{family['name']}{suffix}{{{label_text}}} {value!r}")
+    
+    lines = []
+    for name, entry in merged.items():
+        lines.append(f"# HELP {name} {entry['help']}")
+        lines.append(f"# TYPE {name} {entry['type']}")
+        lines.extend(entry["lines"])
+    return "\n".join(lines) + "\n"
+
+# Process-wide registry
+REGISTRY = Registry()
+
+def instance_name(role: str) -> str:
+    """Get a name identifying this process in saved snapshots."""
+    return f"{role}@{socket.gethostname()}:{os.getpid()}"
+
+class LoopLagProbe:
+    """
+    Measures event-loop lag: how much later than asked a short sleep wakes up.
+    
+    A busy or blocked loop delays every coroutine by the same amount, so this
+    is the first thing to check when everything is slow at once.
+    """
+    
+    def __init__(self, interval: float = 0.5, registry: Registry = REGISTRY):
+        self.interval = interval
+        self.histogram = registry.histogram(
+            "event_loop_lag_seconds", "How late the event loop woke up from a timed sleep",
+            buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+        )
+        self.last = registry.gauge("event_loop_lag_last_seconds", "Event-loop lag of the latest probe")
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        """Start probing on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop probing."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start - self.interval)
+            self.histogram.observe(lag)
+            self.last.set(lag)
+
+class SnapshotReporter:
+    """Saves this process's collected metrics to the database periodically."""
+    
+    def __init__(self, role: str = "bot", interval: float = 15.0, registry: Registry = REGISTRY):
+        self.instance = instance_name(role)
+        self.interval = interval
+        self.registry = registry
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        """Start saving snapshots on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop saving snapshots, saving a final one."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            await self.report()
+    
+    async def report(self):
+        """Save the current metrics."""
+        from utils import repositories
+        try:
+            await repositories.save_metrics_snapshot(self.instance, self.registry.collect(), self.interval * 4)
+        except Exception as e:
+            logger.error(f"Failed to save metrics snapshot: {e}")
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.report()
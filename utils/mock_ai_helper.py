@@ -0,0 +1,210 @@
+"""
+Deterministic fake AI provider for load tests and offline development.
+
+Implements the same interface as the real provider helpers without any
+network access. Latency, error rate and seed are configurable, so the bot's
+own overhead can be measured. Select it with AI_PROVIDER=mock.
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import random
+import time
+from typing import Dict, Any, List, AsyncIterator, Optional
+
+from utils.config import Config
+from utils.model_registry import format_user_message
+from utils.resilience import ProviderError, call_with_retry
+
+# Set up logging
+logger = logging.getLogger("discord_bot")
+
+# Seeded so latencies and injected errors are reproducible between runs
+_random = random.Random(Config.get_mock_ai_seed())
+
+_FILLER = (
+    "This is a simulated answer produced locally so the bot can be exercised "
+    "without calling a real model. "
+)
+
+def get_model_name() -> str:
+    """
+    Get the name of the mock model.
+    
+    Returns:
+        str: The model name
+    """
+    return "mock-1"
+
+def _sample_latency() -> float:
+    """
+    Draw a response latency from the configured distribution.
+    
+    Returns:
+        float: The latency in seconds
+    """
+    mean = Config.get_mock_ai_latency()
+    distribution = Config.get_mock_ai_latency_distribution()
+    if mean <= 0:
+        return 0.0
+    if distribution == "uniform":
+        return _random.uniform(0, 2 * mean)
+    if distribution == "exponential":
+        return _random.expovariate(1 / mean)
+    if distribution == "lognormal":
+        # Median of mean with a long right tail, like real model latencies
+        return mean * math.exp(_random.gauss(0, 0.5))
+    return mean
+
+def _maybe_fail():
+    """Raise an injected provider error at the configured rate."""
+    if _random.random() < Config.get_mock_ai_error_rate():
+        raise ProviderError("Mock provider returned 503: injected failure", retryable=True, status=503)
+
+def _classify_error(error: Exception) -> ProviderError:
+    """Pass injected ProviderErrors through and wrap anything else."""
+    if isinstance(error, ProviderError):
+        return error
+    return ProviderError(str(error))
+
+def _build_response(prompt: str, user_name: str, history: Optional[List[Dict[str, str]]] = None) -> str:
+    """
+    Build a deterministic response for a prompt.
+    
+    Args:
+        prompt: The user's message
+        user_name: The user's name for personalization
+        history: Earlier chat messages with 'role' and 'content' keys, oldest first
+    
+    Returns:
+        str: The response, padded to the configured length
+    """
+    digest = hashlib.sha256(format_user_message(prompt, user_name).encode("utf-8")).hexdigest()[:8]
+    said = f"{user_name}, you said" if user_name is not None else "You said"
+    response = f"[{digest}] {said}: {prompt[:200]} ({len(history or [])} earlier messages). "
+    length = Config.get_mock_ai_response_length()
+    while len(response) < length:
+        response += _FILLER
+    return response[:max(length, 1)]
+
+def generate_ai_response(prompt: str, user_name: str = "User",
+                         history: Optional[List[Dict[str, str]]] = None) -> str:
+    """
+    Generate a mock response, blocking for the simulated latency.
+    
+    Args:
+        prompt: The user's message
+        user_name: The user's name for personalization
+        history: Earlier chat messages with 'role' and 'content' keys, oldest first
+    
+    Returns:
+        str: The mock response
+    """
+    time.sleep(_sample_latency())
+    _maybe_fail()
+    return _build_response(prompt, user_name, history)
+
+async def generate_ai_response_async(prompt: str, user_name: str = "User",
+                                     history: Optional[List[Dict[str, str]]] = None) -> str:
+    """
+    Generate a mock response without blocking the event loop.
+    
+    Args:
+        prompt: The user's message
+        user_name: The user's name for personalization
+        history: Earlier chat messages with 'role' and 'content' keys, oldest first
+    
+    Returns:
+        str: The mock response
+    """
+    async def attempt() -> str:
+        await asyncio.sleep(_sample_latency())
+        _maybe_fail()
+        return _build_response(prompt, user_name, history)
+    
+    return await call_with_retry("mock", attempt, _classify_error)
+
+async def stream_ai_response(prompt: str, user_name: str = "User",
+                             history: Optional[List[Dict[str, str]]] = None) -> AsyncIterator[str]:
+    """
+    Stream a mock response in chunks spread over the simulated latency.
+    
+    Args:
+        prompt: The user's message
+        user_name: The user's name for personalization
+        history: Earlier chat messages with 'role' and 'content' keys, oldest first
+    
+    Yields:
+        str: Successive pieces of the mock response
+    """
+    latency = _sample_latency()
+    
+    async def open_stream() -> float:
+        # Time to first token is roughly a third of the total
+        await asyncio.sleep(latency / 3)
+        _maybe_fail()
+        return latency * 2 / 3
+    
+    remaining = await call_with_retry("mock", open_stream, _classify_error)
+    
+    response = _build_response(prompt, user_name, history)
+    chunks = max(1, Config.get_mock_ai_stream_chunks())
+    size = math.ceil(len(response) / chunks)
+    for start in range(0, len(response), size):
+        yield response[start:start + size]
+        await asyncio.sleep(remaining / chunks)
+
+def generate_image(prompt: str) -> Dict[str, str]:
+    """
+    Report that the mock provider does not generate images.
+    
+    Args:
+        prompt: The image generation prompt
+    
+    Returns:
+        Dict: A dictionary containing an error message
+    """
+    return {"error": "Image generation is not available with the mock AI provider."}
+
+def analyze_sentiment(text: str) -> Dict[str, Any]:
+    """
+    Return a neutral mock sentiment.
+    
+    Args:
+        text: The text to analyze
+    
+    Returns:
+        Dict: A dictionary containing sentiment analysis results
+    """
+    return {"rating": 3, "confidence": 1.0, "mood": "neutral"}
+
+def summarize_conversation(messages: List[Dict[str, str]]) -> str:
+    """
+    Summarize a conversation with a fixed template.
+    
+    Args:
+        messages: List of message dictionaries with 'role' and 'content' keys
+    
+    Returns:
+        str: The summary of the conversation
+    """
+    speakers = sorted({msg["role"] for msg in messages})
+    return f"Mock summary of {len(messages)} messages between {', '.join(speakers)}."
+
+async def summarize_conversation_async(messages: List[Dict[str, str]]) -> str:
+    """
+    Summarize a conversation after the simulated latency.
+    
+    Args:
+        messages: List of message dictionaries with 'role' and 'content' keys
+    
+    Returns:
+        str: The summary of the conversation
+    """
+    async def attempt() -> str:
+        await asyncio.sleep(_sample_latency())
+        _maybe_fail()
+        return summarize_conversation(messages)
+    
+    return await call_with_retry("mock", attempt, _classify_error)
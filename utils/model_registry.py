@@ -0,0 +1,102 @@
+"""
+Registry of configured AI model objects and precomputed system instructions.
+"""
+import functools
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger("discord_bot")
+
+@functools.lru_cache(maxsize=32)
+def get_system_instruction(bot_name: str) -> str:
+    """
+    Get the chat system instruction for a bot persona.
+    
+    Args:
+        bot_name: The bot's name
+    
+    Returns:
+        str: The system instruction
+    """
+    return (
+        f"You are a helpful Discord bot assistant named {bot_name}. "
+        f"You are talking to people in a Discord server; each of their messages "
+        f"starts with the name of the person talking to you. "
+        f"Be friendly, helpful, and concise in your responses. "
+        f"If you don't know something, just say so. "
+        f"Don't make up information."
+    )
+
+def format_user_message(prompt: str, user_name: Optional[str]) -> str:
+    """
+    Format a user's message the way the system instruction describes it.
+    
+    Args:
+        prompt: The user's message
+        user_name: The user's name, or None for a reply that is shared between
+            users and so must not address anyone
+    
+    Returns:
+        str: The formatted message
+    """
+    if user_name is None:
+        return prompt
+    return f"{user_name}: {prompt}"
+
+def format_reply_address(user_name: str) -> str:
+    """
+    Get the text that addresses a shared, unpersonalized reply to one user.
+    
+    Args:
+        user_name: The user's name
+    
+    Returns:
+        str: The text to put in front of the reply
+    """
+    return f"{user_name}, "
+
+class ModelRegistry:
+    """
+    Holds configured model objects keyed by (model name, bot name).
+    
+    Models are created on first use by the given factory and reused for
+    every later call, so per-request setup is limited to a dict lookup.
+    """
+    
+    def __init__(self, factory: Callable[[str, Optional[str]], Any]):
+        """
+        Args:
+            factory: Called with (model name, system instruction or None) to build a model
+        """
+        self._factory = factory
+        self._models: Dict[Tuple[str, Optional[str]], Any] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, model_name: str, bot_name: Optional[str] = None) -> Any:
+        """
+        Get a configured model, creating it on first use.
+        
+        Args:
+            model_name: The provider's model name
+            bot_name: The bot persona to build the system instruction for, or None for no instruction
+        
+        Returns:
+            Any: The configured model object
+        """
+        key = (model_name, bot_name)
+        model = self._models.get(key)
+        if model is None:
+            with self._lock:
+                model = self._models.get(key)
+                if model is None:
+                    instruction = get_system_instruction(bot_name) if bot_name else None
+                    model = self._factory(model_name, instruction)
+                    self._models[key] = model
+                    logger.debug(f"Registered model {model_name} for persona {bot_name}")
+        return model
+    
+    def clear(self):
+        """Drop all registered models so they are rebuilt on next use."""
+        with self._lock:
+            self._models.clear()
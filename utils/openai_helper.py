@@ -4,59 +4,220 @@ Helper functions for interacting with the OpenAI API.
 import os
 import json
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any, List, AsyncIterator, Optional
 
-from openai import OpenAI
 from utils.config import Config
+from utils.model_registry import get_system_instruction, format_user_message
+from utils.resilience import (
+    ProviderError, call_with_retry, is_retryable_status, iterate_with_timeout, parse_retry_after
+)
 
 # Set up logging
 logger = logging.getLogger("discord_bot")
 
-# Initialize OpenAI client
-openai = OpenAI(api_key=Config.get_openai_api_key())
+# OpenAI clients, created on first use so importing this module stays cheap
+# and does not need an API key
+_client = None
+_async_client = None
 
-def generate_ai_response(prompt: str, user_name: str = "User") -> str:
+def _get_client():
+    """
+    Get the blocking OpenAI client, creating it on first use.
+    
+    Returns:
+        OpenAI: The client
+    """
+    global _client
+    if _client is None:
+        from openai import OpenAI
+        _client = OpenAI(api_key=Config.get_openai_api_key())
+    return _client
+
+def _get_async_client():
+    """
+    Get the async OpenAI client used from the bot's event loop, creating it on first use.
+    
+    Its retries are handled by utils.resilience rather than the SDK.
+    
+    Returns:
+        AsyncOpenAI: The client
+    """
+    global _async_client
+    if _async_client is None:
+        from openai import AsyncOpenAI
+        _async_client = AsyncOpenAI(api_key=Config.get_openai_api_key(), max_retries=0)
+    return _async_client
+
+def get_model_name() -> str:
+    """
+    Get the name of the OpenAI model used for chat responses.
+    
+    Returns:
+        str: The model name
+    """
+    return Config.get_openai_model()
+
+def _classify_error(error: Exception) -> ProviderError:
+    """
+    Convert an OpenAI SDK exception into a ProviderError.
+    
+    Args:
+        error: The exception raised by the SDK
+        
+    Returns:
+        ProviderError: The error, marked retryable for 429s, 5xxs and connection failures
+    """
+    from openai import APIConnectionError, APIStatusError
+    
+    if isinstance(error, APIStatusError):
+        return ProviderError(
+            f"OpenAI returned {error.status_code}: {error.message}",
+            retryable=is_retryable_status(error.status_code),
+            retry_after=parse_retry_after(error.response.headers.get("retry-after")),
+            status=error.status_code
+        )
+    if isinstance(error, APIConnectionError):
+        return ProviderError(f"Could not reach OpenAI: {error}", retryable=True)
+    return ProviderError(str(error))
+
+def _message_text(response) -> str:
+    """
+    Get the text of a chat completion.
+    
+    Args:
+        response: The chat completion
+    
+    Returns:
+        str: The first choice's text
+    
+    Raises:
+        ProviderError: If the choice has no text, e.g. because it was filtered
+    """
+    choice = response.choices[0]
+    if choice.message.content is None:
+        raise ProviderError(f"OpenAI returned no text (finish reason: {choice.finish_reason})")
+    return choice.message.content
+
+def _build_messages(prompt: str, user_name: str,
+                    history: Optional[List[Dict[str, str]]] = None) -> List[Dict[str, str]]:
+    """
+    Build the chat messages for a prompt using the precomputed system instruction.
+    
+    Args:
+        prompt: The user's message
+        user_name: The user's name for personalization
+        history: Earlier chat messages with 'role' and 'content' keys, oldest first
+        
+    Returns:
+        List: The chat messages
+    """
+    messages = [{"role": "system", "content": get_system_instruction(Config.get_bot_name())}]
+    messages.extend(history or [])
+    messages.append({"role": "user", "content": format_user_message(prompt, user_name)})
+    return messages
+
+def generate_ai_response(prompt: str, user_name: str = "User",
+                         history: Optional[List[Dict[str, str]]] = None) -> str:
     """
     Generate a response from OpenAI based on the prompt.
     
     Args:
         prompt: The user's message
         user_name: The user's name for personalization
+        history: Earlier chat messages with 'role' and 'content' keys, oldest first
         
     Returns:
         str: The AI-generated response
     """
     try:
-        # The newest OpenAI model is "gpt-4o" which was released May 13, 2024.
-        # do not change this unless explicitly requested by the user
-        logger.debug(f"Generating AI response for prompt: {prompt[:50]}...")
-        
-        system_message = (
-            f"You are a helpful Discord bot assistant named {Config.get_bot_name()}. "
-            f"You are currently talking to {user_name} in a Discord server. "
-            f"Be friendly, helpful, and concise in your responses. "
-            f"If you don't know something, just say so. "
-            f"Don't make up information."
-        )
+        logger.debug("Generating AI response for prompt: %.50s...", prompt)
         
-        response = openai.chat.completions.create(
-            model="gpt-4o",  # Using the latest model
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": prompt}
-            ],
+        response = _get_client().chat.completions.create(
+            model=Config.get_openai_model(),
+            messages=_build_messages(prompt, user_name, history),
             temperature=0.7,
             max_tokens=500,
         )
         
-        result = response.choices[0].message.content
-        logger.debug(f"Generated AI response: {result[:50]}...")
+        result = _message_text(response)
+        logger.debug("Generated AI response: %.50s...", result)
         return result
     
     except Exception as e:
         logger.error(f"Error generating AI response: {e}")
         raise Exception(f"Failed to generate AI response: {str(e)}")
 
+async def generate_ai_response_async(prompt: str, user_name: str = "User",
+                                     history: Optional[List[Dict[str, str]]] = None) -> str:
+    """
+    Generate a response from OpenAI without blocking the event loop.
+    
+    Args:
+        prompt: The user's message
+        user_name: The user's name for personalization
+        history: Earlier chat messages with 'role' and 'content' keys, oldest first
+    
+    Returns:
+        str: The AI-generated response
+    """
+    try:
+        logger.debug("Generating AI response for prompt: %.50s...", prompt)
+        
+        response = await call_with_retry("openai", lambda: _get_async_client().chat.completions.create(
+            model=Config.get_openai_model(),
+            messages=_build_messages(prompt, user_name, history),
+            temperature=0.7,
+            max_tokens=500,
+        ), _classify_error)
+        
+        result = _message_text(response)
+        logger.debug("Generated AI response: %.50s...", result)
+        return result
+    
+    except ProviderError as e:
+        logger.error(f"Error generating AI response: {e}")
+        raise
+    
+    except Exception as e:
+        logger.error(f"Error generating AI response: {e}")
+        raise Exception(f"Failed to generate AI response: {str(e)}")
+
+async def stream_ai_response(prompt: str, user_name: str = "User",
+                             history: Optional[List[Dict[str, str]]] = None) -> AsyncIterator[str]:
+    """
+    Stream a response from OpenAI as it is generated.
+    
+    Args:
+        prompt: The user's message
+        user_name: The user's name for personalization
+        history: Earlier chat messages with 'role' and 'content' keys, oldest first
+        
+    Yields:
+        str: Successive pieces of the AI-generated response
+    """
+    try:
+        logger.debug("Streaming AI response for prompt: %.50s...", prompt)
+        
+        # Only opening the stream is retried; text already yielded cannot be taken back
+        stream = await call_with_retry("openai", lambda: _get_async_client().chat.completions.create(
+            model=Config.get_openai_model(),
+            messages=_build_messages(prompt, user_name, history),
+            temperature=0.7,
+            max_tokens=500,
+            stream=True,
+        ), _classify_error)
+        async for chunk in iterate_with_timeout("openai", stream):
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    
+    except ProviderError as e:
+        logger.error(f"Error streaming AI response: {e}")
+        raise
+    
+    except Exception as e:
+        logger.error(f"Error streaming AI response: {e}")
+        raise Exception(f"Failed to generate AI response: {str(e)}")
+
 def generate_image(prompt: str) -> Dict[str, str]:
     """
     Generate an image using OpenAI's DALL-E model.
@@ -77,7 +238,7 @@ def generate_image(prompt: str) -> Dict[str, str]:
             f"violent, explicit, or offensive content."
         )
         
-        response = openai.images.generate(
+        response = _get_client().images.generate(
             model="dall-e-3",
             prompt=safe_prompt,
             n=1,
@@ -103,10 +264,8 @@ def analyze_sentiment(text: str) -> Dict[str, Any]:
         Dict: A dictionary containing sentiment analysis results
     """
     try:
-        # The newest OpenAI model is "gpt-4o" which was released May 13, 2024.
-        # do not change this unless explicitly requested by the user
-        response = openai.chat.completions.create(
-            model="gpt-4o",
+        response = _get_client().chat.completions.create(
+            model=Config.get_openai_model(),
             messages=[
                 {
                     "role": "system",
@@ -142,21 +301,54 @@ def summarize_conversation(messages: List[Dict[str, str]]) -> str:
         str: The summary of the conversation
     """
     try:
-        # The newest OpenAI model is "gpt-4o" which was released May 13, 2024.
-        # do not change this unless explicitly requested by the user
         conversation_text = "\n".join([f"{msg['role']}: {msg['content']}" for msg in messages])
         
         prompt = f"Please summarize the following conversation concisely:\n\n{conversation_text}"
         
-        response = openai.chat.completions.create(
-            model="gpt-4o",
+        response = _get_client().chat.completions.create(
+            model=Config.get_openai_model(),
             messages=[{"role": "user", "content": prompt}],
             temperature=0.5,
             max_tokens=200,
         )
         
-        return response.choices[0].message.content
+        return _message_text(response)
     
     except Exception as e:
         logger.error(f"Error summarizing conversation: {e}")
         return "Failed to summarize the conversation."
+
+async def summarize_conversation_async(messages: List[Dict[str, str]]) -> str:
+    """
+    Summarize a conversation using the OpenAI API without blocking the event loop.
+    
+    Unlike summarize_conversation, failures are raised so callers never
+    store an error message as a summary.
+    
+    Args:
+        messages: List of message dictionaries with 'role' and 'content' keys
+        
+    Returns:
+        str: The summary of the conversation
+    """
+    try:
+        conversation_text = "\n".join([f"{msg['role']}: {msg['content']}" for msg in messages])
+        
+        prompt = f"Please summarize the following conversation concisely:\n\n{conversation_text}"
+        
+        response = await call_with_retry("openai", lambda: _get_async_client().chat.completions.create(
+            model=Config.get_openai_model(),
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.5,
+            max_tokens=200,
+        ), _classify_error)
+        
+        return _message_text(response)
+    
+    except ProviderError as e:
+        logger.error(f"Error summarizing conversation: {e}")
+        raise
+    
+    except Exception as e:
+        logger.error(f"Error summarizing conversation: {e}")
+        raise Exception(f"Failed to summarize the conversation: {str(e)}")
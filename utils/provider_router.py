@@ -0,0 +1,230 @@
+"""
+Routing of AI requests across providers by live latency, errors and cost.
+
+Used when AI_PROVIDER is "auto". Providers are ranked by their recent median
+latency, penalized by their recent error rate and scaled by a configured
+cost weight; providers whose circuit breaker is open go last. Requests go to
+the best-ranked provider and fail over down the ranking. With hedging on, if
+the first provider has not answered within its own tail latency, the next
+one is started as well and whichever answers first wins.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from utils.resilience import get_breaker
+
+logger = logging.getLogger("discord_bot")
+
+class ProviderStats:
+    """Recent latencies and outcomes of one provider."""
+    
+    def __init__(self, window: int = 200):
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+    
+    def record(self, latency: float, ok: bool):
+        """
+        Record a finished call.
+        
+        Args:
+            latency: The call's duration in seconds
+            ok: Whether the call succeeded
+        """
+        self.outcomes.append(ok)
+        if ok:
+            self.latencies.append(latency)
+    
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        Get a latency percentile of recent successful calls.
+        
+        Args:
+            q: The percentile, between 0 and 1
+        
+        Returns:
+            float: The latency in seconds, or None without samples
+        """
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+    
+    @property
+    def error_rate(self) -> float:
+        """The fraction of recent calls that failed."""
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+class ProviderRouter:
+    """
+    Chooses providers for AI calls and hedges slow ones.
+    
+    Until a provider has min_samples successful calls its latency is assumed
+    to be default_latency, so a new or idle provider still gets tried.
+    """
+    
+    def __init__(self, providers: List[str], cost_weights: Optional[Dict[str, float]] = None,
+                 hedge: bool = True, hedge_percentile: float = 0.95, hedge_min_delay: float = 0.5,
+                 min_samples: int = 10, default_latency: float = 2.0, error_penalty: float = 4.0):
+        if not providers:
+            raise ValueError("The router needs at least one provider")
+        
+        self.providers = list(providers)
+        self.cost_weights = dict(cost_weights or {})
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.min_samples = min_samples
+        self.default_latency = default_latency
+        self.error_penalty = error_penalty
+        self._stats: Dict[str, ProviderStats] = {name: ProviderStats() for name in self.providers}
+        
+        # Metrics
+        self.failovers = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+    
+    def record_outcome(self, name: str, ok: bool):
+        """
+        Record whether a call made outside call(), e.g. a stream, succeeded.
+        
+        Its latency is not recorded: a stream's timing is not comparable with
+        a whole generated reply, so it would skew ranking and hedge delays.
+        
+        Args:
+            name: The provider name
+            ok: Whether the call succeeded
+        """
+        self._stats[name].outcomes.append(ok)
+    
+    def latency(self, name: str, q: float = 0.5) -> float:
+        """Get a provider's latency percentile, or the default until it has enough samples."""
+        stats = self._stats[name]
+        if len(stats.latencies) < self.min_samples:
+            return self.default_latency
+        return stats.percentile(q)
+    
+    def score(self, name: str) -> float:
+        """
+        Get a provider's routing score; lower is better.
+        
+        Args:
+            name: The provider name
+        
+        Returns:
+            float: Median latency, penalized by error rate and scaled by cost weight
+        """
+        penalty = 1 + self.error_penalty * self._stats[name].error_rate
+        return self.latency(name) * penalty * self.cost_weights.get(name, 1.0)
+    
+    def rank(self) -> List[str]:
+        """
+        Order the providers from best to worst.
+        
+        Returns:
+            List: Provider names, those with an open circuit breaker last
+        """
+        return sorted(self.providers, key=lambda name: (not get_breaker(name).is_available(), self.score(name)))
+    
+    def hedge_delay(self, name: str) -> float:
+        """Get how long to wait for a provider before hedging to the next one."""
+        return max(self.hedge_min_delay, self.latency(name, self.hedge_percentile))
+    
+    async def call(self, func: Callable[[str], Awaitable[Any]], hedge: Optional[bool] = None) -> Any:
+        """
+        Call the best provider, hedging and failing over down the ranking.
+        
+        Args:
+            func: Makes the call to the named provider
+            hedge: Whether to hedge slow calls (defaults to the router's setting)
+        
+        Returns:
+            Any: The first successful result
+        
+        Raises:
+            Exception: The last provider's error if every provider fails
+        """
+        hedge = self.hedge if hedge is None else hedge
+        ranking = self.rank()
+        pending: Dict[asyncio.Task, str] = {}
+        hedged = set()
+        error: Optional[BaseException] = None
+        
+        def start(name: str):
+            pending[asyncio.create_task(self._timed(name, func))] = name
+        
+        start(ranking.pop(0))
+        try:
+            while pending:
+                timeout = None
+                if hedge and ranking and len(pending) == 1:
+                    timeout = self.hedge_delay(next(iter(pending.values())))
+                
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # The first provider is slower than usual; race the next one against it
+                    self.hedges += 1
+                    logger.debug(f"Hedging slow {next(iter(pending.values()))} request to {ranking[0]}")
+                    hedged.add(ranking[0])
+                    start(ranking.pop(0))
+                    continue
+                
+                for task in done:
+                    name = pending.pop(task)
+                    if task.exception() is None:
+                        if name in hedged:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+                    logger.warning(f"AI provider {name} failed: {error}")
+                
+                if not pending and ranking:
+                    self.failovers += 1
+                    start(ranking.pop(0))
+        finally:
+            for task in pending:
+                task.cancel()
+        
+        raise error
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get routing metrics.
+        
+        Returns:
+            Dict: Per-provider latency, error rate and score, plus hedge and failover counts
+        """
+        providers = {}
+        for name, stats in self._stats.items():
+            providers[name] = {
+                "p50": stats.percentile(0.5),
+                "p95": stats.percentile(0.95),
+                "error_rate": stats.error_rate,
+                "score": self.score(name),
+                "breaker": get_breaker(name).state,
+            }
+        return {
+            "providers": providers,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "failovers": self.failovers,
+        }
+    
+    async def _timed(self, name: str, func: Callable[[str], Awaitable[Any]]) -> Any:
+        """Call a provider, recording its latency and outcome."""
+        start = time.perf_counter()
+        try:
+            result = await func(name)
+        except asyncio.CancelledError:
+            # A call that lost a hedge race says nothing about the provider's
+            # health or latency; its partial time would pull the percentiles down
+            raise
+        except Exception:
+            self._stats[name].record(time.perf_counter() - start, False)
+            raise
+        self._stats[name].record(time.perf_counter() - start, True)
+        return result
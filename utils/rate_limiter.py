@@ -0,0 +1,339 @@
+"""
+Admission control for AI requests.
+
+Every AI request passes through token buckets for its user, its guild and
+the provider before it is sent. Requests over a guild or provider limit are
+either rejected straight away (shed mode) or queued per guild and released
+in weighted round-robin order (queue mode), so one busy guild cannot use up
+the provider quota while others wait.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger("discord_bot")
+
+class RateLimited(Exception):
+    """Raised when a request is not admitted."""
+    
+    def __init__(self, scope: str, retry_after: float):
+        super().__init__(f"Rate limited by the {scope} limit, retry after {retry_after:.1f}s")
+        self.scope = scope
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """Refills at rate tokens per second up to capacity; each request takes one token."""
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+    
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+    
+    def wait_time(self, now: float) -> float:
+        """
+        Get how long until a token is available.
+        
+        Args:
+            now: The current time.monotonic() value
+        
+        Returns:
+            float: Seconds to wait, or 0 if a token is available now
+        """
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+    
+    def consume(self, now: float):
+        """Take one token."""
+        self._refill(now)
+        self.tokens -= 1
+    
+    def is_full(self, now: float) -> bool:
+        """Check whether the bucket has fully refilled (and can be forgotten)."""
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+class _Waiter:
+    """A queued request waiting for guild and provider tokens."""
+    
+    __slots__ = ("provider", "future", "enqueued_at")
+    
+    def __init__(self, provider: str, future: asyncio.Future, enqueued_at: float):
+        self.provider = provider
+        self.future = future
+        self.enqueued_at = enqueued_at
+
+class AdmissionController:
+    """
+    Token buckets per user, guild and provider in front of AI requests.
+    
+    The per-user limit always sheds: a user over their own limit is told to
+    slow down rather than queued. Guild and provider limits shed or queue
+    depending on mode. Queued guilds are served in round-robin order, each
+    getting up to its weight (default 1) admissions per round.
+    """
+    
+    MODES = ("queue", "shed")
+    
+    def __init__(self, user_rate: float, user_burst: int, guild_rate: float, guild_burst: int,
+                 provider_rate: float, provider_burst: int, mode: str = "queue",
+                 max_queue: int = 20, queue_timeout: float = 30.0,
+                 weights: Optional[Dict[str, int]] = None):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown admission mode: {mode}")
+        
+        self.user_limit = (user_rate, user_burst)
+        self.guild_limit = (guild_rate, guild_burst)
+        self.provider_limit = (provider_rate, provider_burst)
+        self.mode = mode
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.weights = dict(weights or {})
+        
+        self._users: Dict[str, TokenBucket] = {}
+        self._guilds: Dict[str, TokenBucket] = {}
+        self._providers: Dict[str, TokenBucket] = {}
+        self._queues: Dict[str, Deque[_Waiter]] = {}
+        # Queued requests per provider, so new requests cannot jump ahead of them
+        self._provider_waiters: Dict[str, int] = {}
+        self._ready: Deque[str] = deque()
+        self._credits: Dict[str, int] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        
+        # Metrics
+        self.admitted = 0
+        self.queued = 0
+        self.shed = 0
+        self.timed_out = 0
+        self.max_wait = 0.0
+        self._waits: Deque[float] = deque(maxlen=1000)
+    
+    @property
+    def queue_depth(self) -> int:
+        """The number of requests waiting for admission."""
+        return sum(len(queue) for queue in self._queues.values())
+    
+    async def acquire(self, user_id: str, guild_id: str, provider: str) -> float:
+        """
+        Wait until a request may be sent to the provider.
+        
+        Args:
+            user_id: The Discord user ID
+            guild_id: The Discord guild ID, or "DM" for direct messages
+            provider: The AI provider name
+        
+        Returns:
+            float: Seconds the request spent queued
+        
+        Raises:
+            RateLimited: If the request is shed or times out in the queue
+        """
+        now = time.monotonic()
+        user_bucket = self._bucket(self._users, user_id, self.user_limit)
+        wait = user_bucket.wait_time(now)
+        if wait > 0:
+            self.shed += 1
+            raise RateLimited("user", wait)
+        
+        # Fast path: nothing queued ahead of us, in this guild or on this
+        # provider's limit, and the shared buckets have tokens
+        if guild_id not in self._queues and not self._provider_waiters.get(provider):
+            scope, wait = self._shared_wait(guild_id, provider, now)
+            if not wait:
+                user_bucket.consume(now)
+                self._grant(guild_id, provider, now)
+                self._record_wait(0.0)
+                return 0.0
+            if self.mode == "shed":
+                self.shed += 1
+                raise RateLimited(scope, wait)
+        
+        queue = self._queues.setdefault(guild_id, deque())
+        if len(queue) >= self.max_queue:
+            self.shed += 1
+            raise RateLimited("queue", self.queue_timeout)
+        
+        # The user's token is spent when queued, so queued spam still counts
+        user_bucket.consume(now)
+        waiter = _Waiter(provider, asyncio.get_running_loop().create_future(), now)
+        if not queue:
+            self._ready.append(guild_id)
+        queue.append(waiter)
+        self._provider_waiters[provider] = self._provider_waiters.get(provider, 0) + 1
+        self.queued += 1
+        self._ensure_dispatcher()
+        
+        try:
+            waited = await asyncio.wait_for(waiter.future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            self.shed += 1
+            raise RateLimited("queue", self.queue_timeout)
+        
+        self._record_wait(waited)
+        return waited
+    
+    def set_weight(self, guild_id: str, weight: int):
+        """
+        Set how many queued requests a guild may have admitted per round.
+        
+        Args:
+            guild_id: The Discord guild ID
+            weight: The guild's share (at least 1)
+        """
+        self.weights[guild_id] = max(1, weight)
+    
+    async def close(self):
+        """Stop the dispatcher and reject every queued request."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        
+        for queue in self._queues.values():
+            for waiter in queue:
+                if not waiter.future.done():
+                    waiter.future.set_exception(RateLimited("queue", self.queue_timeout))
+        self._queues.clear()
+        self._provider_waiters.clear()
+        self._ready.clear()
+        self._credits.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the admission metrics.
+        
+        Returns:
+            Dict: Admission counters, queue depth and queue-wait times in seconds
+        """
+        waits = sorted(self._waits)
+        return {
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "shed": self.shed,
+            "timed_out": self.timed_out,
+            "queue_depth": self.queue_depth,
+            "wait_avg": sum(waits) / len(waits) if waits else 0.0,
+            "wait_p95": waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0,
+            "wait_max": self.max_wait,
+        }
+    
+    def _bucket(self, buckets: Dict[str, TokenBucket], key: str, limit: Tuple[float, int]) -> TokenBucket:
+        """Get the bucket for a key, creating a full one on first use."""
+        bucket = buckets.get(key)
+        if bucket is None:
+            if len(buckets) >= 10000:
+                self._prune(buckets)
+            bucket = buckets[key] = TokenBucket(*limit)
+        return bucket
+    
+    @staticmethod
+    def _prune(buckets: Dict[str, TokenBucket]):
+        """Forget full buckets, which behave exactly like new ones."""
+        now = time.monotonic()
+        for key in [key for key, bucket in buckets.items() if bucket.is_full(now)]:
+            del buckets[key]
+    
+    def _shared_wait(self, guild_id: str, provider: str, now: float) -> Tuple[str, float]:
+        """Get the limit that blocks a request and how long until it clears."""
+        wait = self._bucket(self._guilds, guild_id, self.guild_limit).wait_time(now)
+        if wait:
+            return "guild", wait
+        wait = self._bucket(self._providers, provider, self.provider_limit).wait_time(now)
+        if wait:
+            return "provider", wait
+        return "", 0.0
+    
+    def _grant(self, guild_id: str, provider: str, now: float):
+        """Take the guild and provider tokens for an admitted request."""
+        self._guilds[guild_id].consume(now)
+        self._providers[provider].consume(now)
+        self.admitted += 1
+    
+    def _dequeue(self, queue: Deque[_Waiter]) -> _Waiter:
+        """Remove the first request from a guild's queue."""
+        waiter = queue.popleft()
+        remaining = self._provider_waiters[waiter.provider] - 1
+        if remaining:
+            self._provider_waiters[waiter.provider] = remaining
+        else:
+            del self._provider_waiters[waiter.provider]
+        return waiter
+    
+    def _record_wait(self, waited: float):
+        """Record how long an admitted request waited."""
+        self._waits.append(waited)
+        self.max_wait = max(self.max_wait, waited)
+    
+    def _ensure_dispatcher(self):
+        """Start the dispatcher if it is not running, or wake it for a new request."""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._dispatch())
+        else:
+            self._wakeup.set()
+    
+    async def _dispatch(self):
+        """Admit queued requests in weighted round-robin order until the queues are empty."""
+        while self._ready:
+            now = time.monotonic()
+            delay = None
+            
+            for _ in range(len(self._ready)):
+                guild_id = self._ready.popleft()
+                queue = self._queues[guild_id]
+                # Admissions left in this guild's turn, kept if the provider limit interrupts it
+                credit = self._credits.pop(guild_id, 0) or self.weights.get(guild_id, 1)
+                scope = ""
+                
+                while queue and credit:
+                    waiter = queue[0]
+                    if waiter.future.done():
+                        # Timed out or cancelled while queued
+                        self._dequeue(queue)
+                        continue
+                    
+                    scope, wait = self._shared_wait(guild_id, waiter.provider, now)
+                    if wait:
+                        delay = wait if delay is None else min(delay, wait)
+                        break
+                    
+                    self._dequeue(queue)
+                    self._grant(guild_id, waiter.provider, now)
+                    waiter.future.set_result(now - waiter.enqueued_at)
+                    credit -= 1
+                
+                if not queue:
+                    del self._queues[guild_id]
+                elif scope == "provider" and credit:
+                    # The shared provider limit blocks everyone; resume the round from this guild
+                    self._credits[guild_id] = credit
+                    self._ready.appendleft(guild_id)
+                    break
+                else:
+                    self._ready.append(guild_id)
+            
+            if delay is None:
+                # Some requests were admitted; give the others another round straight away
+                await asyncio.sleep(0)
+                continue
+            
+            # Sleep until a bucket refills or a new request arrives
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
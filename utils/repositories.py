@@ -0,0 +1,277 @@
+"""
+Async queries the bot process makes, run on the engine from utils.async_db.
+
+Every function opens its own short session, so callers never hold a
+connection across an await on Discord or an AI provider.
+"""
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import IntegrityError
+
+from models import ChannelSummary, Conversation, MetricsSnapshot, ResponseCacheEntry, Server, ShardStatus
+from utils.async_db import get_engine, session_scope
+from utils.config import Config
+
+# Servers
+
+async def load_servers(since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """
+    Load every active server, or every server (active or not) updated after a point in time.
+    
+    Args:
+        since: Only return servers updated after this time
+    
+    Returns:
+        List: The server records' fields
+    """
+    statement = select(Server)
+    if since is None:
+        statement = statement.where(Server.is_active.is_(True))
+    else:
+        statement = statement.where(Server.updated_at > since)
+    
+    async with session_scope() as session:
+        result = await session.scalars(statement)
+        return [server.to_dict() for server in result]
+
+async def get_server(discord_server_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Get a server record by its Discord guild ID.
+    
+    Args:
+        discord_server_id: The Discord guild ID, or "DM" for direct messages
+    
+    Returns:
+        Dict: The server record's fields or None if it does not exist
+    """
+    async with session_scope() as session:
+        server = await session.scalar(select(Server).where(Server.discord_server_id == discord_server_id))
+        return server.to_dict() if server else None
+
+async def upsert_server(discord_server_id: str, name: str, reactivate: bool = False) -> Dict[str, Any]:
+    """
+    Insert a server record unless it already exists, then return it.
+    
+    Args:
+        discord_server_id: The Discord guild ID, or "DM" for direct messages
+        name: The server name
+        reactivate: Whether an existing record should be marked active and renamed
+    
+    Returns:
+        Dict: The server record's fields
+    """
+    now = datetime.utcnow()
+    values = {
+        "discord_server_id": discord_server_id,
+        "name": name,
+        "user_id": 1,  # Assuming admin user ID is 1
+        "prefix": Config.get_command_prefix(),
+        "ai_enabled": True,
+        "is_active": True,
+        "joined_at": now,
+        "updated_at": now,
+    }
+    
+    dialect = get_engine().dialect.name
+    async with session_scope() as session:
+        if dialect in ("postgresql", "sqlite"):
+            if dialect == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            
+            statement = dialect_insert(Server).values(**values)
+            if reactivate:
+                statement = statement.on_conflict_do_update(
+                    index_elements=["discord_server_id"],
+                    set_={"name": name, "is_active": True, "updated_at": now}
+                )
+            else:
+                statement = statement.on_conflict_do_nothing(index_elements=["discord_server_id"])
+            await session.execute(statement)
+        else:
+            # Generic fallback: insert and treat a unique violation as "already exists"
+            try:
+                async with session.begin_nested():
+                    session.add(Server(**values))
+            except IntegrityError:
+                # Another process inserted the record first; other errors propagate
+                pass
+    
+    return await get_server(discord_server_id)
+
+async def deactivate_server(discord_server_id: str):
+    """
+    Mark a server record inactive.
+    
+    Args:
+        discord_server_id: The Discord guild ID
+    """
+    async with session_scope() as session:
+        server = await session.scalar(select(Server).where(Server.discord_server_id == discord_server_id))
+        if server:
+            server.is_active = False
+
+# Conversations
+
+async def insert_conversations(rows: List[Dict[str, Any]]):
+    """
+    Bulk-insert conversation rows in one statement.
+    
+    Args:
+        rows: Column values for each Conversation
+    """
+    async with session_scope() as session:
+        await session.execute(insert(Conversation), rows)
+
+async def load_recent_turns(channel_id: str, limit: int) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Load a channel's summary and its most recent unsummarized turns.
+    
+    Args:
+        channel_id: The Discord channel ID
+        limit: The maximum number of turns
+    
+    Returns:
+        Tuple: The summary (or None) and the turns, oldest first
+    """
+    async with session_scope() as session:
+        summary = None
+        statement = select(Conversation).where(Conversation.channel_id == channel_id)
+        
+        row = await session.scalar(select(ChannelSummary).where(ChannelSummary.channel_id == channel_id))
+        if row:
+            summary = {"summary": row.summary, "summarized_until": row.summarized_until}
+            if row.summarized_until:
+                statement = statement.where(Conversation.timestamp > row.summarized_until)
+        
+        rows = list(await session.scalars(
+            statement
+            .order_by(Conversation.timestamp.desc(), Conversation.id.desc())
+            .limit(limit)
+        ))
+        turns = [
+            {
+                "username": row.username,
+                "message": row.message,
+                "response": row.response or "",
+                "timestamp": row.timestamp
+            }
+            for row in reversed(rows)
+        ]
+        return summary, turns
+
+async def save_channel_summary(channel_id: str, summary: str, summarized_until: Optional[datetime]):
+    """
+    Store a channel's rolling summary.
+    
+    Args:
+        channel_id: The Discord channel ID
+        summary: The summary text
+        summarized_until: The timestamp of the newest turn the summary covers
+    """
+    async with session_scope() as session:
+        row = await session.scalar(select(ChannelSummary).where(ChannelSummary.channel_id == channel_id))
+        if row is None:
+            row = ChannelSummary(channel_id=channel_id)
+            session.add(row)
+        row.summary = summary
+        row.summarized_until = summarized_until
+
+# Response cache
+
+async def load_cached_response(key: str, ttl: int) -> Optional[str]:
+    """
+    Read a cached response, deleting it if it has expired.
+    
+    Args:
+        key: The cache key
+        ttl: The entry lifetime in seconds
+    
+    Returns:
+        str: The cached response or None on a miss
+    """
+    async with session_scope() as session:
+        entry = await session.scalar(select(ResponseCacheEntry).where(ResponseCacheEntry.cache_key == key))
+        if entry is None:
+            return None
+        if entry.created_at < datetime.utcnow() - timedelta(seconds=ttl):
+            await session.execute(delete(ResponseCacheEntry).where(ResponseCacheEntry.id == entry.id))
+            return None
+        return entry.response
+
+async def store_cached_response(key: str, response: str):
+    """
+    Write a cached response, replacing any existing entry.
+    
+    Args:
+        key: The cache key
+        response: The AI-generated response
+    """
+    try:
+        async with session_scope() as session:
+            entry = await session.scalar(select(ResponseCacheEntry).where(ResponseCacheEntry.cache_key == key))
+            if entry is None:
+                entry = ResponseCacheEntry(cache_key=key)
+                session.add(entry)
+            entry.response = response
+            entry.created_at = datetime.utcnow()
+    except IntegrityError:
+        # Another request stored the same key first
+        pass
+
+# Shard status
+
+async def save_shard_statuses(statuses: List[Dict[str, Any]], host: str, pid: int):
+    """
+    Write shard statuses, replacing each shard's previous row.
+    
+    Args:
+        statuses: Status fields per shard, as returned by ShardMonitor.snapshot
+        host: The host running the shards
+        pid: The process running the shards
+    """
+    now = datetime.utcnow()
+    async with session_scope() as session:
+        rows = await session.scalars(
+            select(ShardStatus).where(ShardStatus.shard_id.in_([status["shard_id"] for status in statuses]))
+        )
+        existing = {row.shard_id: row for row in rows}
+        for status in statuses:
+            row = existing.get(status["shard_id"])
+            if row is None:
+                row = ShardStatus(shard_id=status["shard_id"])
+                session.add(row)
+            for key, value in status.items():
+                setattr(row, key, value)
+            row.host = host
+            row.pid = pid
+            row.updated_at = now
+
+# Metrics
+
+async def save_metrics_snapshot(instance: str, families: List[Dict[str, Any]], ttl: float):
+    """
+    Write a process's collected metrics, replacing its previous snapshot.
+    
+    Snapshots of other processes that have expired are deleted, so processes
+    that stopped drop out of /metrics.
+    
+    Args:
+        instance: The process name, as returned by utils.metrics.instance_name
+        families: The collected metric families
+        ttl: How long the snapshot stays current, in seconds
+    """
+    now = datetime.utcnow()
+    async with session_scope() as session:
+        await session.execute(delete(MetricsSnapshot).where(MetricsSnapshot.expires_at < now))
+        row = await session.scalar(select(MetricsSnapshot).where(MetricsSnapshot.instance == instance))
+        if row is None:
+            row = MetricsSnapshot(instance=instance)
+            session.add(row)
+        row.payload = json.dumps(families)
+        row.expires_at = now + timedelta(seconds=ttl)
+        row.updated_at = now
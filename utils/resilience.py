@@ -0,0 +1,282 @@
+"""
+Retries, deadlines and circuit breaking for AI provider calls.
+
+Both provider helpers send their async calls through call_with_retry. Each
+helper supplies a classifier that turns the SDK's exception into a
+ProviderError, which says whether the failure is worth retrying and how long
+the provider asked us to wait. Retryable failures are retried with jittered
+exponential backoff within an overall deadline, and repeated failures open
+the provider's circuit breaker so new requests fail fast until it recovers.
+Streams are read through iterate_with_timeout, so a stream that stops
+sending fails instead of holding its provider slot forever.
+"""
+import asyncio
+import logging
+import random
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+from utils.config import Config
+
+logger = logging.getLogger("discord_bot")
+
+class ProviderError(Exception):
+    """A failed provider call."""
+    
+    def __init__(self, message: str, retryable: bool = False, retry_after: Optional[float] = None,
+                 status: Optional[int] = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+        self.status = status
+
+class CircuitOpenError(ProviderError):
+    """Raised instead of calling a provider whose circuit breaker is open."""
+    
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(
+            f"The {provider} provider is temporarily unavailable, retry after {retry_after:.0f}s",
+            retryable=False,
+            retry_after=retry_after
+        )
+        self.provider = provider
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header given in seconds.
+    
+    Args:
+        value: The header value, if any
+    
+    Returns:
+        float: The delay in seconds, or None if missing or not a number
+    """
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None
+
+def is_retryable_status(status: Optional[int]) -> bool:
+    """Check whether an HTTP status means the same request may succeed later."""
+    return status in (408, 409, 429) or (status is not None and status >= 500)
+
+class CircuitBreaker:
+    """
+    Stops calls to a provider after repeated failures.
+    
+    After failure_threshold consecutive retryable failures the circuit opens
+    and calls fail immediately. Once reset_timeout has passed, one trial call
+    is let through (half-open): success closes the circuit, failure opens it
+    again.
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probing = False
+    
+    def before_call(self):
+        """
+        Check that a call may be made.
+        
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with a trial call in flight
+        """
+        if self.state == self.CLOSED:
+            return
+        
+        remaining = self.opened_at + self.reset_timeout - time.monotonic()
+        if self.state == self.OPEN and remaining <= 0:
+            self.state = self.HALF_OPEN
+        
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return
+        raise CircuitOpenError(self.name, max(remaining, 1.0))
+    
+    def is_available(self) -> bool:
+        """Check whether a call would be let through, without claiming a trial call."""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            return time.monotonic() >= self.opened_at + self.reset_timeout
+        return not self._probing
+    
+    def record_success(self):
+        """Record a successful call, closing the circuit."""
+        if self.state != self.CLOSED:
+            logger.info(f"Circuit breaker for {self.name} closed")
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+    
+    def record_failure(self):
+        """Record a retryable failure, opening the circuit at the threshold."""
+        self.failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+                logger.warning(f"Circuit breaker for {self.name} opened after {self.failures} failures")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+    
+    def release(self):
+        """Let another trial through after a half-open call ended without a verdict."""
+        self._probing = False
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the breaker's state.
+        
+        Returns:
+            Dict: State, whether it is open, consecutive failures and how often the circuit opened
+        """
+        return {
+            "state": self.state,
+            "is_open": self.state == self.OPEN,
+            "failures": self.failures,
+            "times_opened": self.times_opened,
+        }
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """
+    Get the circuit breaker for a provider, creating it on first use.
+    
+    Args:
+        name: The provider name
+    
+    Returns:
+        CircuitBreaker: The provider's breaker
+    """
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = CircuitBreaker(
+            name,
+            failure_threshold=Config.get_ai_breaker_threshold(),
+            reset_timeout=Config.get_ai_breaker_reset_timeout()
+        )
+        _breakers[name] = breaker
+    return breaker
+
+def breaker_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Get the state of every provider's circuit breaker.
+    
+    Returns:
+        Dict: Each breaker's stats, keyed by provider name
+    """
+    return {name: breaker.stats() for name, breaker in _breakers.items()}
+
+def backoff_delay(attempt: int, base: float, cap: float, retry_after: Optional[float] = None) -> float:
+    """
+    Get the delay before a retry, using full jitter.
+    
+    Args:
+        attempt: The number of attempts made so far (1 for the first retry)
+        base: The base delay in seconds
+        cap: The maximum backoff in seconds
+        retry_after: The delay the provider asked for, which is always honoured
+    
+    Returns:
+        float: Seconds to wait
+    """
+    delay = random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+async def call_with_retry(provider: str, func: Callable[[], Awaitable[Any]],
+                          classify: Callable[[Exception], ProviderError]) -> Any:
+    """
+    Call a provider with per-attempt timeouts, retries and circuit breaking.
+    
+    Args:
+        provider: The provider name, used to pick the circuit breaker
+        func: Makes one attempt at the call
+        classify: Converts an exception raised by func into a ProviderError
+    
+    Returns:
+        Any: The result of the first successful attempt
+    
+    Raises:
+        ProviderError: If the call fails, the deadline passes or the circuit is open
+    """
+    breaker = get_breaker(provider)
+    attempts = Config.get_ai_retry_attempts()
+    timeout = Config.get_ai_request_timeout()
+    deadline = time.monotonic() + Config.get_ai_request_deadline()
+    
+    attempt = 0
+    while True:
+        attempt += 1
+        breaker.before_call()
+        
+        remaining = deadline - time.monotonic()
+        try:
+            result = await asyncio.wait_for(func(), min(timeout, remaining))
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except asyncio.TimeoutError as e:
+            error, cause = ProviderError(f"{provider} request timed out", retryable=True), e
+        except Exception as e:
+            error, cause = classify(e), e
+        else:
+            breaker.record_success()
+            return result
+        
+        if not error.retryable:
+            # The request itself was bad; the provider is healthy
+            breaker.release()
+            raise error from cause
+        
+        delay = backoff_delay(attempt, Config.get_ai_retry_base_delay(), Config.get_ai_retry_max_delay(),
+                              error.retry_after)
+        # A failed trial call is not retried, so it reopens the circuit straight away
+        if attempt >= attempts or breaker.state != breaker.CLOSED or time.monotonic() + delay >= deadline:
+            # One failure per call, however many attempts it took
+            breaker.record_failure()
+            raise error from cause
+        
+        logger.warning(f"{provider} request failed ({error}), retrying in {delay:.1f}s "
+                       f"(attempt {attempt}/{attempts})")
+        await asyncio.sleep(delay)
+
+async def iterate_with_timeout(provider: str, stream: AsyncIterator[Any]) -> AsyncIterator[Any]:
+    """
+    Yield a provider stream's items, failing if the next one takes too long.
+    
+    Each item gets the per-attempt timeout (AI_REQUEST_TIMEOUT) to arrive.
+    
+    Args:
+        provider: The provider name, for the error message
+        stream: The stream returned by the provider's SDK
+    
+    Yields:
+        Any: The stream's items
+    
+    Raises:
+        ProviderError: If the provider sends nothing for longer than the timeout
+    """
+    timeout = Config.get_ai_request_timeout()
+    iterator = stream.__aiter__()
+    while True:
+        try:
+            item = await asyncio.wait_for(iterator.__anext__(), timeout)
+        except StopAsyncIteration:
+            return
+        except asyncio.TimeoutError as e:
+            raise ProviderError(f"{provider} stream sent nothing for {timeout:g}s", retryable=True) from e
+        yield item
@@ -0,0 +1,180 @@
+"""
+Cache for AI responses to repeated prompts.
+
+Responses are keyed on the normalized prompt, provider, model and bot
+persona, so identical FAQ-style questions are answered from the cache instead
+of a full LLM round-trip. Only requests sent without conversation context are
+cached, and their replies are generated without the asking user's name (see
+utils.ai_provider), so one entry serves every user. The in-process tier is an LRU with a
+TTL; an optional database tier lets cached answers survive restarts.
+"""
+import hashlib
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from utils.config import Config
+
+logger = logging.getLogger("discord_bot")
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Normalize a prompt so trivially different phrasings share a cache entry.
+    
+    Args:
+        prompt: The user's message
+    
+    Returns:
+        str: The lower-cased prompt with collapsed whitespace and no trailing punctuation
+    """
+    return _WHITESPACE_RE.sub(" ", prompt).strip().rstrip("?!. ").lower()
+
+def make_cache_key(prompt: str, provider: str, model: str, persona: str) -> str:
+    """
+    Build the cache key for a prompt.
+    
+    Args:
+        prompt: The user's message
+        provider: The AI provider name
+        model: The provider's model name
+        persona: The bot name the response was generated for
+    
+    Returns:
+        str: A hex digest identifying the request
+    """
+    raw = "\x1f".join((provider, model, persona, normalize_prompt(prompt)))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class LRUCache:
+    """A size-bounded least-recently-used cache whose entries expire after a TTL."""
+    
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, key: str) -> Optional[str]:
+        """
+        Get a cached value, dropping it if it has expired.
+        
+        Args:
+            key: The cache key
+        
+        Returns:
+            str: The cached value or None if missing or expired
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        
+        self._entries.move_to_end(key)
+        return value
+    
+    def set(self, key: str, value: str):
+        """
+        Store a value, evicting the least recently used entry if the cache is full.
+        
+        Args:
+            key: The cache key
+            value: The value to cache
+        """
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+    
+    def clear(self):
+        """Remove all entries."""
+        self._entries.clear()
+
+class ResponseCache:
+    """Two-tier AI response cache with hit/miss counters."""
+    
+    def __init__(self, max_size: int, ttl: int, persistent: bool = False):
+        self.ttl = ttl
+        self.persistent = persistent
+        self.memory = LRUCache(max_size, ttl)
+        self.memory_hits = 0
+        self.database_hits = 0
+        self.misses = 0
+    
+    async def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response, checking memory first and then the database.
+        
+        Args:
+            key: The cache key
+        
+        Returns:
+            str: The cached response or None on a miss
+        """
+        response = self.memory.get(key)
+        if response is not None:
+            self.memory_hits += 1
+            return response
+        
+        if self.persistent:
+            try:
+                from utils import repositories
+                response = await repositories.load_cached_response(key, self.ttl)
+            except Exception as e:
+                logger.error(f"Response cache database error: {e}")
+                response = None
+            
+            if response is not None:
+                self.database_hits += 1
+                self.memory.set(key, response)
+                return response
+        
+        self.misses += 1
+        return None
+    
+    async def set(self, key: str, response: str):
+        """
+        Store a response in every enabled tier.
+        
+        Args:
+            key: The cache key
+            response: The AI-generated response
+        """
+        self.memory.set(key, response)
+        
+        if self.persistent:
+            try:
+                from utils import repositories
+                await repositories.store_cached_response(key, response)
+            except Exception as e:
+                logger.error(f"Response cache database error: {e}")
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the cache counters.
+        
+        Returns:
+            Dict: Hit, miss and size counters
+        """
+        return {
+            "memory_hits": self.memory_hits,
+            "database_hits": self.database_hits,
+            "misses": self.misses,
+            "size": len(self.memory),
+        }
+
+# Shared cache instance used by the AI provider interface
+response_cache = ResponseCache(
+    max_size=Config.get_response_cache_size(),
+    ttl=Config.get_response_cache_ttl(),
+    persistent=Config.is_response_cache_persistent()
+)
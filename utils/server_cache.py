@@ -0,0 +1,163 @@
+"""
+In-memory cache of Server records keyed by Discord guild ID.
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from utils import repositories
+from utils.singleflight import SingleFlight
+
+logger = logging.getLogger("discord_bot")
+
+class ServerCache:
+    """
+    Keeps a warm copy of every Server row so the message path needs no query.
+    
+    The cache is preloaded when the bot starts, kept current from guild
+    join/remove events, and refreshed periodically with rows whose
+    updated_at changed, which is how edits made from the dashboard process
+    reach the bot. Missing guilds are created with an upsert so racing first
+    messages cannot create duplicate rows.
+    """
+    
+    def __init__(self, refresh_interval: float = 30.0):
+        self.refresh_interval = refresh_interval
+        self._servers: Dict[str, Dict[str, Any]] = {}
+        self._synced_at: Optional[datetime] = None
+        self._pending = SingleFlight()
+        self._task: Optional[asyncio.Task] = None
+    
+    def __len__(self) -> int:
+        return len(self._servers)
+    
+    def get(self, discord_server_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a cached server record without touching the database.
+        
+        Args:
+            discord_server_id: The Discord guild ID, or "DM" for direct messages
+        
+        Returns:
+            Dict: The server record's fields or None if not cached
+        """
+        return self._servers.get(discord_server_id)
+    
+    async def get_or_create(self, discord_server_id: str, name: str) -> Dict[str, Any]:
+        """
+        Get a server record, creating it in the database on first use.
+        
+        Args:
+            discord_server_id: The Discord guild ID, or "DM" for direct messages
+            name: The server name to use if the record is created
+        
+        Returns:
+            Dict: The server record's fields
+        """
+        server = self._servers.get(discord_server_id)
+        if server is not None:
+            return server
+        
+        server = await self._pending.do(
+            discord_server_id,
+            lambda: repositories.upsert_server(discord_server_id, name)
+        )
+        self._servers[discord_server_id] = server
+        return server
+    
+    async def preload(self):
+        """Load every server record into the cache."""
+        started = datetime.utcnow()
+        servers = await repositories.load_servers()
+        self._servers = {server["discord_server_id"]: server for server in servers}
+        self._synced_at = self._latest_update(servers, None, started)
+        logger.info(f"Preloaded {len(self._servers)} servers into the cache")
+    
+    async def refresh(self):
+        """Reload server records that changed since the last sync."""
+        started = datetime.utcnow()
+        servers = await repositories.load_servers(self._synced_at)
+        for server in servers:
+            if server["is_active"]:
+                self._servers[server["discord_server_id"]] = server
+            else:
+                self._servers.pop(server["discord_server_id"], None)
+        self._synced_at = self._latest_update(servers, self._synced_at, started)
+        if servers:
+            logger.debug(f"Refreshed {len(servers)} changed servers in the cache")
+    
+    async def guild_joined(self, guild):
+        """
+        Create or reactivate the record for a guild the bot joined.
+        
+        Args:
+            guild: The Discord guild (server)
+        """
+        server = await repositories.upsert_server(str(guild.id), guild.name, reactivate=True)
+        self._servers[server["discord_server_id"]] = server
+    
+    async def guild_removed(self, guild):
+        """
+        Mark a guild's record inactive and drop it from the cache.
+        
+        Args:
+            guild: The Discord guild (server)
+        """
+        self._servers.pop(str(guild.id), None)
+        await repositories.deactivate_server(str(guild.id))
+    
+    def invalidate(self, discord_server_id: Optional[str] = None):
+        """
+        Drop one cached record, or all of them, so they are reloaded on next use.
+        
+        Args:
+            discord_server_id: The guild ID to drop, or None to clear the cache
+        """
+        if discord_server_id is None:
+            self._servers.clear()
+            self._synced_at = None
+        else:
+            self._servers.pop(discord_server_id, None)
+    
+    def start(self):
+        """Start periodically refreshing changed records."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refresh_loop())
+    
+    async def stop(self):
+        """Stop the refresh task."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _refresh_loop(self):
+        """Refresh the cache every refresh interval until cancelled."""
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Failed to refresh the server cache: {e}")
+    
+    @staticmethod
+    def _latest_update(servers: List[Dict[str, Any]], current: Optional[datetime],
+                       started: datetime) -> datetime:
+        """
+        Get the newest updated_at among the given records and the current sync point.
+        
+        Rows added before updated_at existed have none, so when nothing has a
+        timestamp the time the load started is used instead; otherwise every
+        refresh would reload the whole table.
+        """
+        latest = current
+        for server in servers:
+            if server["updated_at"]:
+                updated_at = datetime.fromisoformat(server["updated_at"])
+                if latest is None or updated_at > latest:
+                    latest = updated_at
+        return latest or started
@@ -0,0 +1,114 @@
+"""
+Per-shard health reporting for the bot's gateway connections.
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from utils import repositories
+
+logger = logging.getLogger("discord_bot")
+
+class ShardMonitor:
+    """
+    Tracks latency, guild count and event rate for each shard this process runs.
+    
+    The event rate counts the messages each shard delivers, attributed by the
+    guild's shard ID. Snapshots are saved to the ShardStatus table every
+    report interval so the dashboard can show every shard, including those
+    run by other processes or hosts.
+    """
+    
+    def __init__(self, bot, report_interval: float = 30.0):
+        self.bot = bot
+        self.report_interval = report_interval
+        self.host = socket.gethostname()
+        self._events: Counter = Counter()
+        self._events_since = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+    
+    @property
+    def shard_count(self) -> int:
+        """The total number of shards across every process."""
+        return self.bot.shard_count or 1
+    
+    @property
+    def shard_ids(self) -> List[int]:
+        """The shards this process runs."""
+        shards = getattr(self.bot, "shards", None)
+        if shards:
+            return sorted(shards)
+        return [self.bot.shard_id or 0]
+    
+    def record_event(self, guild):
+        """
+        Count a gateway event against the shard of the guild it came from.
+        
+        Args:
+            guild: The Discord guild, or None for direct messages (counted on shard 0)
+        """
+        self._events[guild.shard_id if guild else 0] += 1
+    
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """
+        Get the current status of each shard this process runs.
+        
+        Returns:
+            List: Shard ID, connection state, latency, guild count and event rate per shard
+        """
+        elapsed = max(time.monotonic() - self._events_since, 1e-6)
+        guilds = Counter(guild.shard_id for guild in self.bot.guilds)
+        shards = getattr(self.bot, "shards", None)
+        
+        statuses = []
+        for shard_id in self.shard_ids:
+            if shards:
+                shard = shards[shard_id]
+                latency, connected = shard.latency, not shard.is_closed()
+            else:
+                latency, connected = self.bot.latency, not self.bot.is_closed()
+            statuses.append({
+                "shard_id": shard_id,
+                "shard_count": self.shard_count,
+                "is_connected": connected,
+                # Latency is infinite until the first heartbeat is acknowledged
+                "latency_ms": round(latency * 1000, 1) if latency != float("inf") else None,
+                "guild_count": guilds.get(shard_id, 0),
+                "event_rate": round(self._events.get(shard_id, 0) / elapsed, 2),
+            })
+        return statuses
+    
+    def start(self):
+        """Start saving snapshots every report interval."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._report_loop())
+    
+    async def stop(self):
+        """Stop the report task."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def report(self):
+        """Save a snapshot and start a new event-rate window."""
+        statuses = self.snapshot()
+        self._events.clear()
+        self._events_since = time.monotonic()
+        await repositories.save_shard_statuses(statuses, self.host, os.getpid())
+    
+    async def _report_loop(self):
+        """Report every report interval until cancelled."""
+        while True:
+            await asyncio.sleep(self.report_interval)
+            try:
+                await self.report()
+            except Exception as e:
+                logger.error(f"Failed to save shard status: {e}")
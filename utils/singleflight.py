@@ -0,0 +1,64 @@
+"""
+Deduplication of identical concurrent calls.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger("discord_bot")
+
+class SingleFlight:
+    """
+    Makes concurrent callers with the same key share a single call.
+    
+    The first caller for a key starts the call as its own task; callers that
+    arrive while it is in flight await the same task instead of starting a
+    new one. Cancelling one waiter does not cancel the shared call for the
+    others.
+    """
+    
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.shared = 0
+    
+    def __len__(self) -> int:
+        return len(self._calls)
+    
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run func, or join the in-flight call with the same key.
+        
+        Args:
+            key: Identifies calls that are interchangeable
+            func: Starts the call when no identical call is in flight
+        
+        Returns:
+            Any: The result of the shared call
+        """
+        task = self._calls.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.shared += 1
+            logger.debug("Joining in-flight call %.12s", key)
+        
+        return await asyncio.shield(task)
+    
+    def _forget(self, key: str, task: asyncio.Task):
+        """
+        Remove a finished call so later callers start a fresh one.
+        
+        Args:
+            key: The call's key
+            task: The finished task
+        """
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        
+        # Mark the exception as retrieved in case every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,99 @@
+"""
+Progressive delivery of streamed AI responses to a Discord channel.
+"""
+import asyncio
+import logging
+from typing import Callable, List, Optional
+
+import discord
+
+from utils.chunking import MESSAGE_LIMIT, take_chunk
+
+logger = logging.getLogger("discord_bot")
+
+class StreamingReply:
+    """
+    Posts a reply as soon as the first text arrives and keeps editing it as
+    more text streams in.
+    
+    Edits are batched so a message is edited at most once per edit interval,
+    which keeps us inside Discord's per-channel edit rate limit. When the text
+    outgrows a single message, it is finalized at the last good boundary
+    (see utils.chunking) and the rest continues in a new one.
+    """
+    
+    def __init__(self, channel, edit_interval: float = 1.0,
+                 on_first_send: Optional[Callable[[], None]] = None):
+        self.channel = channel
+        self.edit_interval = edit_interval
+        self.on_first_send = on_first_send
+        self.messages: List[discord.Message] = []
+        self._parts: List[str] = []
+        self._pending = ""
+        self._current: Optional[discord.Message] = None
+        self._rendered = ""
+        self._last_edit = 0.0
+    
+    @property
+    def text(self) -> str:
+        """The full text received so far."""
+        return "".join(self._parts)
+    
+    async def feed(self, piece: str):
+        """
+        Add a piece of streamed text, flushing it to Discord when due.
+        
+        Args:
+            piece: The next piece of the response
+        """
+        if not piece:
+            return
+        
+        self._parts.append(piece)
+        self._pending += piece
+        
+        # Roll over to a new message at the length boundary
+        while len(self._pending) > MESSAGE_LIMIT:
+            head, self._pending = take_chunk(self._pending)
+            await self._render(head)
+            self._current = None
+            self._rendered = ""
+        
+        loop_time = asyncio.get_running_loop().time()
+        if self._current is None or loop_time - self._last_edit >= self.edit_interval:
+            await self._render(self._pending)
+    
+    async def finish(self) -> str:
+        """
+        Flush any remaining text to Discord.
+        
+        Returns:
+            str: The full streamed response
+        """
+        await self._render(self._pending)
+        return self.text
+    
+    async def _render(self, content: str):
+        """
+        Send or edit the current message so it shows the given content.
+        
+        Args:
+            content: The content the current message should display
+        """
+        if not content.strip() or content == self._rendered:
+            return
+        
+        if self._current is None:
+            self._current = await self.channel.send(content)
+            self.messages.append(self._current)
+            if len(self.messages) == 1 and self.on_first_send:
+                self.on_first_send()
+        else:
+            try:
+                await self._current.edit(content=content)
+            except discord.HTTPException as e:
+                logger.warning(f"Failed to edit streamed message: {e}")
+                return
+        
+        self._rendered = content
+        self._last_edit = asyncio.get_running_loop().time()
@@ -0,0 +1,137 @@
+"""
+Write-behind queue that persists conversations off the event loop.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from utils import repositories
+from utils.metrics import REGISTRY
+
+logger = logging.getLogger("discord_bot")
+
+_flush_seconds = REGISTRY.histogram("db_flush_seconds", "Time to bulk-insert one batch of conversations")
+
+class ConversationWriter:
+    """
+    Collects Conversation rows and bulk-inserts them from a background task.
+    
+    A batch is flushed once it reaches batch_size rows or has waited
+    flush_interval seconds, whichever comes first. The queue is bounded, so
+    producers wait (backpressure) when the database falls behind instead of
+    growing memory without limit.
+    """
+    
+    def __init__(self, max_queue: int = 1000, batch_size: int = 100, flush_interval: float = 2.0):
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        
+        # Metrics
+        self.rows_written = 0
+        self.rows_failed = 0
+        self.flushes = 0
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+    
+    @property
+    def queue_depth(self) -> int:
+        """The number of rows waiting to be written."""
+        return self._queue.qsize() if self._queue else 0
+    
+    def start(self):
+        """Start the background flush task on the running event loop."""
+        if self._task and not self._task.done():
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run())
+        logger.info("Conversation writer started")
+    
+    async def put(self, row: Dict[str, Any]):
+        """
+        Queue a conversation row, waiting if the queue is full.
+        
+        Args:
+            row: Column values for a Conversation
+        """
+        if self._queue is None:
+            raise RuntimeError("Conversation writer is not started")
+        await self._queue.put(row)
+    
+    async def close(self):
+        """Flush every queued row and stop the background task."""
+        if self._task is None:
+            return
+        
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info(f"Conversation writer stopped after writing {self.rows_written} rows")
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the writer's metrics.
+        
+        Returns:
+            Dict: Queue depth, row counts and flush latencies
+        """
+        return {
+            "queue_depth": self.queue_depth,
+            "rows_written": self.rows_written,
+            "rows_failed": self.rows_failed,
+            "flushes": self.flushes,
+            "last_flush_latency": self.last_flush_latency,
+            "max_flush_latency": self.max_flush_latency,
+        }
+    
+    async def _run(self):
+        """Collect batches from the queue and flush them until cancelled."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+            
+            try:
+                await self._flush(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+    
+    async def _flush(self, batch: List[Dict[str, Any]]):
+        """
+        Write a batch of rows in a single bulk insert.
+        
+        Args:
+            batch: Column values for each Conversation
+        """
+        start = time.perf_counter()
+        try:
+            await repositories.insert_conversations(batch)
+        except Exception as e:
+            self.rows_failed += len(batch)
+            logger.error(f"Failed to write {len(batch)} conversations: {e}")
+            return
+        
+        latency = time.perf_counter() - start
+        _flush_seconds.observe(latency)
+        self.rows_written += len(batch)
+        self.flushes += 1
+        self.last_flush_latency = latency
+        self.max_flush_latency = max(self.max_flush_latency, latency)
+        logger.debug("Wrote %d conversations in %.1fms", len(batch), latency * 1000)
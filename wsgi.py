@@ -0,0 +1,14 @@
+"""
+WSGI entry point for the web dashboard.
+
+Serve it with several workers, e.g. `gunicorn -c gunicorn.conf.py wsgi:app`.
+Importing this module never starts the Discord bot; the bot runs in its own
+process (see main.py) and shares state with the dashboard through the database.
+"""
+from utils.logger import setup_logger
+
+setup_logger()
+
+from app import app  # noqa: E402 -- logging must be set up before the app logs anything
+
+__all__ = ["app"]